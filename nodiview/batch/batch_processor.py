@@ -2,13 +2,417 @@
 Batch processing helpers.
 """
 
+import multiprocessing
 import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain, islice
 from pathlib import Path
+from .manifest import BatchManifest, settings_fingerprint
+from .memory import estimate_footprint
 from ..converter.image_converter import ImageConverter
 from ..optimizer.jpeg_optimizer import JPEGOptimizer
+from ..optimizer.pipeline import ImagePipeline
 from ..optimizer.png_optimizer import PNGOptimizer
+from ..optimizer.pyramid import PyramidExporter, pyramid_suffix
 from ..optimizer.gif_optimizer import GIFOptimizer
+from ..optimizer.renditions import MANIFEST_SUFFIX, RenditionGenerator
 from ..optimizer.resize import ImageResizer
+from ..utils.duplicates import HASH_ALGORITHMS, BKTree, HashIndex, image_signature
+from ..utils.stats import StageTimer, peak_memory, reset_peak_memory
+
+# Inputs hashed together before their jobs are scheduled in duplicate mode
+HASH_CHUNK = 64
+
+
+class _ConvertTask:
+    """Convert single files with one reusable converter."""
+
+    def __init__(
+        self,
+        output_format,
+        quality=85,
+        optimize=True,
+        target_size=None,
+        auto_quality=None,
+        max_dimension=None,
+    ):
+        self.output_format = output_format
+        self.converter = ImageConverter()
+        self.converter.set_quality(quality)
+        self.converter.set_optimize(optimize)
+        self.converter.set_target_size(target_size)
+        self.converter.set_auto_quality(auto_quality is not None, auto_quality)
+        self.converter.set_max_dimension(max_dimension)
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        result = self.converter.convert(input_file, output_file, self.output_format)
+        self.last_stats = self.converter.last_stats
+        return result
+
+    def set_workers(self, workers):
+        """Set the number of threads the converter starts per file."""
+        self.converter.set_workers(workers)
+
+    def stream(self, input_file, output_file):
+        """Convert with a sequentially decoded source to bound memory use."""
+        pipeline = ImagePipeline().convert(self.converter, self.output_format)
+        result = pipeline.run(input_file, output_file)
+        self.last_stats = pipeline.last_stats
+        return result
+
+
+class _OptimizeTask:
+    """Optimize single files with one reusable optimizer per format."""
+
+    def __init__(
+        self,
+        jpeg_quality=85,
+        jpeg_chroma="medium",
+        png_compression=6,
+        gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        jpeg_lossless=False,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
+    ):
+        self.jpeg_optimizer = JPEGOptimizer()
+        self.jpeg_optimizer.set_quality(jpeg_quality)
+        self.jpeg_optimizer.set_chroma_subsampling(jpeg_chroma)
+        self.jpeg_optimizer.set_target_size(target_size)
+        self.jpeg_optimizer.set_auto_quality(auto_quality is not None, auto_quality)
+        self.jpeg_optimizer.set_lossless(jpeg_lossless)
+
+        self.png_optimizer = PNGOptimizer()
+        self.png_optimizer.set_compression_level(png_compression)
+        self.png_optimizer.set_effort(png_effort)
+        if png_palette is not None:
+            self.png_optimizer.set_reduce_palette(True)
+            self.png_optimizer.set_palette_quality(png_palette)
+
+        self.gif_optimizer = GIFOptimizer()
+        self.gif_optimizer.set_reduce_palette(gif_reduce_palette)
+        if gif_global_palette is not None:
+            self.gif_optimizer.set_global_palette(True)
+            self.gif_optimizer.set_dither_method(gif_global_palette)
+            # Dateien laufen bereits parallel, keine Prozesse pro Frame starten
+            self.gif_optimizer.set_workers(1)
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        optimizer = self.optimizer_for(input_file)
+        if optimizer is None:
+            self.last_stats = StageTimer()
+            self.last_stats.error = "Unsupported format"
+            return None
+        result = optimizer.optimize(input_file, output_file)
+        self.last_stats = optimizer.last_stats
+        return result
+
+    def set_workers(self, workers):
+        """Set the number of threads or processes the optimizers start per file."""
+        self.jpeg_optimizer.set_workers(workers)
+        self.png_optimizer.set_workers(workers)
+        self.gif_optimizer.set_workers(workers)
+
+    def stream(self, input_file, output_file):
+        """Optimize with a sequentially decoded source to bound memory use."""
+        optimizer = self.optimizer_for(input_file)
+        if optimizer is None:
+            return self(input_file, output_file)
+        pipeline = ImagePipeline().optimize(optimizer)
+        result = pipeline.run(input_file, output_file)
+        self.last_stats = pipeline.last_stats
+        return result
+
+    def optimizer_for(self, input_file):
+        """Return the optimizer matching the file extension or None."""
+        # Optimiere je nach Format
+        ext = os.path.splitext(input_file)[1].lower()
+        if ext in (".jpg", ".jpeg"):
+            return self.jpeg_optimizer
+        if ext == ".png":
+            return self.png_optimizer
+        if ext == ".gif":
+            return self.gif_optimizer
+        return None
+
+
+class _ResizeTask:
+    """Resize single files with one reusable resizer."""
+
+    def __init__(
+        self, width=None, height=None, scale=None, filter_name="lanczos3", fit=None,
+        crop="centre",
+    ):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.resizer = ImageResizer()
+        self.resizer.set_filter(filter_name)
+        if fit is not None:
+            self.resizer.set_thumbnail(True)
+            self.resizer.set_fit(fit)
+        self.resizer.set_crop(crop)
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        result = self.resizer.resize(
+            input_file, output_file, self.width, self.height, self.scale
+        )
+        self.last_stats = self.resizer.last_stats
+        return result
+
+    def stream(self, input_file, output_file):
+        """Resize with a sequentially decoded source written straight to disk."""
+        self.resizer.set_streaming(True)
+        try:
+            return self(input_file, output_file)
+        finally:
+            self.resizer.set_streaming(False)
+
+
+class _PipelineTask:
+    """Resize and optimize or convert single files in one decode/encode pass."""
+
+    def __init__(
+        self,
+        width=None,
+        height=None,
+        scale=None,
+        filter_name="lanczos3",
+        output_format=None,
+        quality=85,
+        jpeg_chroma="medium",
+        png_compression=6,
+        gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
+        fit=None,
+        crop="centre",
+    ):
+        self.resize_task = _ResizeTask(width, height, scale, filter_name, fit, crop)
+        self.optimize_task = _OptimizeTask(
+            quality,
+            jpeg_chroma,
+            png_compression,
+            gif_reduce_palette,
+            target_size,
+            auto_quality,
+            png_effort=png_effort,
+            png_palette=png_palette,
+            gif_global_palette=gif_global_palette,
+        )
+        self.convert_task = None
+        if output_format:
+            self.convert_task = _ConvertTask(
+                output_format, quality, target_size=target_size, auto_quality=auto_quality
+            )
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        resize = self.resize_task
+        pipeline = ImagePipeline().resize(
+            resize.resizer, resize.width, resize.height, resize.scale
+        )
+        if self.convert_task is not None:
+            pipeline.convert(self.convert_task.converter, self.convert_task.output_format)
+        else:
+            optimizer = self.optimize_task.optimizer_for(input_file)
+            if optimizer is None:
+                self.last_stats = StageTimer()
+                self.last_stats.error = "Unsupported format"
+                return None
+            pipeline.optimize(optimizer)
+        result = pipeline.run(input_file, output_file)
+        self.last_stats = pipeline.last_stats
+        return result
+
+    def set_workers(self, workers):
+        """Set the number of threads or processes the encoders start per file."""
+        self.optimize_task.set_workers(workers)
+        if self.convert_task is not None:
+            self.convert_task.set_workers(workers)
+
+    def stream(self, input_file, output_file):
+        """The pipeline already decodes sequentially."""
+        return self(input_file, output_file)
+
+
+class _RenditionTask:
+    """Write several widths and formats of single files from one decode."""
+
+    # The result is a manifest; bytes_after counts all written renditions
+    writes_many = True
+
+    def __init__(self, widths, formats=("JPEG",), quality=85, filter_name="lanczos3"):
+        self.generator = RenditionGenerator()
+        self.generator.set_widths(widths)
+        self.generator.set_formats(formats)
+        self.generator.set_quality(quality)
+        self.generator.set_filter(filter_name)
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        output_dir, name = os.path.split(output_file)
+        base_name = name[: -len(MANIFEST_SUFFIX)]
+        result = self.generator.generate(input_file, output_dir, base_name)
+        self.last_stats = self.generator.last_stats
+        return result
+
+    def set_workers(self, workers):
+        """Set the number of threads the rendition encoders start per file."""
+        self.generator.jpeg_optimizer.set_workers(workers)
+        self.generator.png_optimizer.set_workers(workers)
+        self.generator.converter.set_workers(workers)
+
+    def stream(self, input_file, output_file):
+        """Renditions already decode via shrink-on-load thumbnails."""
+        return self(input_file, output_file)
+
+
+class _PyramidTask:
+    """Write deep-zoom tile pyramids of single files."""
+
+    # The result is a .dzi, .zip or directory; bytes_after counts all tiles
+    writes_many = True
+
+    def __init__(
+        self, layout="dzi", tile_size=254, overlap=1, tile_format="JPEG",
+        container="directory", quality=85, jpeg_chroma="medium", resource_id=None,
+    ):
+        self.exporter = PyramidExporter()
+        self.exporter.set_layout(layout)
+        self.exporter.set_tile_size(tile_size)
+        self.exporter.set_overlap(overlap)
+        self.exporter.set_tile_format(tile_format)
+        self.exporter.set_container(container)
+        self.exporter.set_quality(quality)
+        self.exporter.jpeg_optimizer.set_chroma_subsampling(jpeg_chroma)
+        self.exporter.set_resource_id(resource_id)
+        self.suffix = pyramid_suffix(self.exporter.layout, self.exporter.container)
+        self.last_stats = None
+
+    def __call__(self, input_file, output_file):
+        output_dir, name = os.path.split(output_file)
+        base_name = name[: len(name) - len(self.suffix)]
+        result = self.exporter.export(input_file, output_dir, base_name)
+        self.last_stats = self.exporter.last_stats
+        return result
+
+    def stream(self, input_file, output_file):
+        """Pyramids are always built from a sequential read."""
+        return self(input_file, output_file)
+
+
+def _file_size(path):
+    """Return the size of a file or None if it cannot be read."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _new_record(input_file, output_file=None):
+    """Create a result record for one input file."""
+    record = {
+        "input": input_file,
+        "output": output_file,
+        "bytes_before": _file_size(input_file),
+        "bytes_after": _file_size(output_file) if output_file else None,
+        "elapsed": 0.0,
+        "error": None,
+        "skipped": False,
+        "duplicate_of": None,
+        "sequential": False,
+        "peak_memory": None,
+    }
+    record.update(StageTimer().as_dict())
+    return record
+
+
+def _process_job(task, input_file, output_file, sequential=False):
+    """
+    Process one file and describe the outcome.
+
+    Args:
+        task: Task instance to run.
+        input_file: Source path.
+        output_file: Destination path.
+        sequential: Run the task's sequential-access variant (oversized images).
+
+    Returns:
+        Result record with input, output, bytes before/after, elapsed, error,
+        per-stage times, backend and peak memory.
+    """
+    record = _new_record(input_file)
+    record["sequential"] = sequential
+    reset_peak_memory()
+    start = time.perf_counter()
+    try:
+        run = task.stream if sequential else task
+        result = run(input_file, output_file)
+        stats = task.last_stats
+        if stats is not None:
+            record.update(stats.as_dict())
+        if result:
+            record["output"] = result
+            if stats is not None and getattr(task, "writes_many", False):
+                record["bytes_after"] = stats.bytes_written
+            else:
+                record["bytes_after"] = _file_size(result)
+        else:
+            record["error"] = (stats.error if stats else None) or "Processing failed"
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed"] = time.perf_counter() - start
+    record["peak_memory"] = peak_memory()
+    return record
+
+
+def _same_file(first, second):
+    """Return whether two paths name the same existing file."""
+    try:
+        return os.path.samefile(first, second)
+    except OSError:
+        return os.path.abspath(first) == os.path.abspath(second)
+
+
+def _hard_link(source, target):
+    """Replace target with a hard link to source, copying across file systems."""
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return
+    temp_path = target + ".nodiview-link"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+
+# Task instance of the current worker process, created once by _init_worker
+_worker_task = None
+
+
+def _init_worker(task_class, settings):
+    """Create the task of a worker process once so it is reused for every file."""
+    global _worker_task
+    _worker_task = task_class(**settings)
+    # Dateien laufen bereits parallel, keine Threads oder Prozesse pro Datei starten
+    if hasattr(_worker_task, "set_workers"):
+        _worker_task.set_workers(1)
+
+
+def _run_worker_task(input_file, output_file, sequential=False):
+    """Process one file inside a worker process."""
+    return _process_job(_worker_task, input_file, output_file, sequential)
 
 
 class BatchProcessor:
@@ -16,9 +420,27 @@ class BatchProcessor:
 
     def __init__(self):
         self.progress_callback = None
+        self.workers = 1
+        self.max_in_flight = None
+        self.incremental = False
+        self.source_root = None
+        self.report = None
+        self.memory_budget = None
+        self.duplicates = None
+        self.duplicate_distance = 4
+        self.hash_algorithm = "dhash"
+        self.hash_index_path = None
 
     def convert_batch(
-        self, input_files, output_dir, output_format, quality=85, optimize=True
+        self,
+        input_files,
+        output_dir,
+        output_format,
+        quality=85,
+        optimize=True,
+        target_size=None,
+        auto_quality=None,
+        max_dimension=None,
     ):
         """
         Convert several images to the same format.
@@ -29,35 +451,22 @@ class BatchProcessor:
             output_format: Target format.
             quality: Quality for lossy formats.
             optimize: Enable encoder optimizations.
+            target_size: Optional maximum size in bytes for JPEG/WebP output;
+                quality then acts as the upper bound of a quality search.
+            auto_quality: Optional SSIM threshold; picks the lowest JPEG/WebP
+                quality per image that reaches it instead of using quality.
+            max_dimension: Optional maximum width and height in pixels;
+                larger images are shrunk while they are decoded.
 
         Returns:
             List of generated files.
         """
-        converter = ImageConverter()
-        converter.set_quality(quality)
-        converter.set_optimize(optimize)
-
-        converted_files = []
-        total = len(input_files)
-
-        for i, input_file in enumerate(input_files):
-            if self.progress_callback:
-                self.progress_callback(i, total, f"Konvertiere {os.path.basename(input_file)}")
-
-            # Bestimme Ausgabedateiname
-            base_name = Path(input_file).stem
-            ext = ImageConverter.SUPPORTED_FORMATS.get(output_format, ["png"])[0]
-            output_file = os.path.join(output_dir, f"{base_name}.{ext}")
-
-            # Konvertiere
-            result = converter.convert(input_file, output_file, output_format)
-            if result:
-                converted_files.append(result)
-
-        if self.progress_callback:
-            self.progress_callback(total, total, "Fertig")
-
-        return converted_files
+        input_files = list(input_files)
+        records = self.iter_convert(
+            input_files, output_dir, output_format, quality, optimize, target_size,
+            auto_quality, max_dimension,
+        )
+        return self._collect(records, input_files, "Konvertiere")
 
     def optimize_batch(
         self,
@@ -67,6 +476,12 @@ class BatchProcessor:
         jpeg_chroma="medium",
         png_compression=6,
         gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        jpeg_lossless=False,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
     ):
         """
         Optimize multiple images according to their format.
@@ -78,51 +493,35 @@ class BatchProcessor:
             jpeg_chroma: JPEG chroma subsampling.
             png_compression: PNG compression level.
             gif_reduce_palette: Toggle GIF palette reduction.
+            target_size: Optional maximum JPEG size in bytes; jpeg_quality then
+                acts as the upper bound of a quality search.
+            auto_quality: Optional SSIM threshold; picks the lowest JPEG quality
+                per image that reaches it instead of using jpeg_quality.
+            jpeg_lossless: Recompress JPEGs without changing their decoded
+                pixels; all other JPEG settings are ignored and files that
+                would not shrink are kept unchanged.
+            png_effort: PNG multi-trial effort (0-3); 0 encodes once with
+                png_compression.
+            png_palette: Optional palette quality (0-100) for lossy palette
+                PNGs; results below the SSIM floor stay truecolor.
+            gif_global_palette: Optional dither method ("floyd-steinberg" or
+                "ordered") to map all frames of an animated GIF onto one
+                shared palette.
 
         Returns:
             List of optimized files.
-        """
-        optimized_files = []
-        total = len(input_files)
-
-        for i, input_file in enumerate(input_files):
-            if self.progress_callback:
-                self.progress_callback(
-                    i, total, f"Optimiere {os.path.basename(input_file)}"
-                )
-
-            # Bestimme Format
-            ext = os.path.splitext(input_file)[1].lower()
-
-            # Bestimme Ausgabedatei
-            if output_dir:
-                output_file = os.path.join(output_dir, os.path.basename(input_file))
-            else:
-                output_file = input_file
-
-            # Optimiere je nach Format
-            result = None
-            if ext in (".jpg", ".jpeg"):
-                optimizer = JPEGOptimizer()
-                optimizer.set_quality(jpeg_quality)
-                optimizer.set_chroma_subsampling(jpeg_chroma)
-                result = optimizer.optimize(input_file, output_file)
-            elif ext == ".png":
-                optimizer = PNGOptimizer()
-                optimizer.set_compression_level(png_compression)
-                result = optimizer.optimize(input_file, output_file)
-            elif ext == ".gif":
-                optimizer = GIFOptimizer()
-                optimizer.set_reduce_palette(gif_reduce_palette)
-                result = optimizer.optimize(input_file, output_file)
-
-            if result:
-                optimized_files.append(result)
-
-        if self.progress_callback:
-            self.progress_callback(total, total, "Fertig")
 
-        return optimized_files
+        Raises:
+            ValueError: If duplicates are hard-linked without an output_dir,
+                which would replace source files.
+        """
+        input_files = list(input_files)
+        records = self.iter_optimize(
+            input_files, output_dir, jpeg_quality, jpeg_chroma, png_compression,
+            gif_reduce_palette, target_size, auto_quality, jpeg_lossless, png_effort,
+            png_palette, gif_global_palette,
+        )
+        return self._collect(records, input_files, "Optimiere")
 
     def resize_batch(
         self,
@@ -132,6 +531,8 @@ class BatchProcessor:
         height=None,
         scale=None,
         filter_name="lanczos3",
+        fit=None,
+        crop="centre",
     ):
         """
         Resize multiple images.
@@ -143,34 +544,750 @@ class BatchProcessor:
             height: Optional height.
             scale: Optional scale factor.
             filter_name: Interpolation filter.
+            fit: Optional thumbnail fit mode (inside, cover, exact or down);
+                images are then shrunk while they are decoded.
+            crop: Part of the image cover keeps (centre, entropy or attention).
 
         Returns:
             List of resized files.
         """
-        resizer = ImageResizer()
-        resizer.set_filter(filter_name)
+        input_files = list(input_files)
+        records = self.iter_resize(
+            input_files, output_dir, width, height, scale, filter_name, fit, crop
+        )
+        return self._collect(records, input_files, "Skaliere")
 
-        resized_files = []
-        total = len(input_files)
+    def process_batch(
+        self,
+        input_files,
+        output_dir,
+        width=None,
+        height=None,
+        scale=None,
+        filter_name="lanczos3",
+        output_format=None,
+        quality=85,
+        jpeg_chroma="medium",
+        png_compression=6,
+        gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
+        fit=None,
+        crop="centre",
+    ):
+        """
+        Resize and then optimize or convert images, decoding each file once.
 
-        for i, input_file in enumerate(input_files):
-            if self.progress_callback:
-                self.progress_callback(
-                    i, total, f"Skaliere {os.path.basename(input_file)}"
+        Args:
+            input_files: Sequence of files.
+            output_dir: Destination directory.
+            width: Optional width.
+            height: Optional height.
+            scale: Optional scale factor.
+            filter_name: Interpolation filter.
+            output_format: Target format or None to optimize in the source format.
+            quality: Quality for JPEG and other lossy formats.
+            jpeg_chroma: JPEG chroma subsampling.
+            png_compression: PNG compression level.
+            gif_reduce_palette: Toggle GIF palette reduction.
+            target_size: Optional maximum JPEG/WebP size in bytes; quality then
+                acts as the upper bound of a quality search.
+            auto_quality: Optional SSIM threshold; picks the lowest JPEG/WebP
+                quality per image that reaches it instead of using quality.
+            png_effort: PNG multi-trial effort (0-3); 0 encodes once with
+                png_compression.
+            png_palette: Optional palette quality (0-100) for lossy palette
+                PNGs; results below the SSIM floor stay truecolor.
+            gif_global_palette: Optional dither method ("floyd-steinberg" or
+                "ordered") to map all frames of an animated GIF onto one
+                shared palette.
+            fit: Optional thumbnail fit mode (inside, cover, exact or down);
+                images are then shrunk while they are decoded.
+            crop: Part of the image cover keeps (centre, entropy or attention).
+
+        Returns:
+            List of processed files.
+        """
+        input_files = list(input_files)
+        records = self.iter_process(
+            input_files, output_dir, width, height, scale, filter_name, output_format,
+            quality, jpeg_chroma, png_compression, gif_reduce_palette, target_size,
+            auto_quality, png_effort, png_palette, gif_global_palette, fit, crop,
+        )
+        return self._collect(records, input_files, "Verarbeite")
+
+    def renditions_batch(
+        self, input_files, output_dir, widths, formats=("JPEG",), quality=85,
+        filter_name="lanczos3",
+    ):
+        """
+        Write responsive renditions of multiple images.
+
+        Args:
+            input_files: Sequence of files.
+            output_dir: Destination directory.
+            widths: Target widths in pixels.
+            formats: Output formats (keys of ImageConverter.SUPPORTED_FORMATS).
+            quality: Quality for lossy formats.
+            filter_name: Interpolation filter.
+
+        Returns:
+            List of rendition manifest files.
+        """
+        input_files = list(input_files)
+        records = self.iter_renditions(
+            input_files, output_dir, widths, formats, quality, filter_name
+        )
+        return self._collect(records, input_files, "Erzeuge Varianten für")
+
+    def pyramid_batch(
+        self, input_files, output_dir, layout="dzi", tile_size=254, overlap=1,
+        tile_format="JPEG", container="directory", quality=85, jpeg_chroma="medium",
+        resource_id=None,
+    ):
+        """
+        Write deep-zoom tile pyramids of multiple images.
+
+        Args:
+            input_files: Sequence of files.
+            output_dir: Destination directory.
+            layout: "dzi", "iiif", "iiif3" or "zoomify".
+            tile_size: Tile edge length in pixels.
+            overlap: Overlap between neighbouring tiles in pixels.
+            tile_format: "JPEG" or "WebP".
+            container: "directory" or "zip".
+            quality: Tile quality.
+            jpeg_chroma: Chroma subsampling of JPEG tiles.
+            resource_id: Base URL for IIIF info.json.
+
+        Returns:
+            List of .dzi files, zip files or pyramid directories.
+        """
+        input_files = list(input_files)
+        records = self.iter_pyramid(
+            input_files, output_dir, layout, tile_size, overlap, tile_format, container,
+            quality, jpeg_chroma, resource_id,
+        )
+        return self._collect(records, input_files, "Erzeuge Kachelpyramide für")
+
+    def iter_convert(
+        self,
+        input_files,
+        output_dir,
+        output_format,
+        quality=85,
+        optimize=True,
+        target_size=None,
+        auto_quality=None,
+        max_dimension=None,
+    ):
+        """
+        Convert images lazily and yield a result record per finished file.
+
+        Takes the same arguments as convert_batch, but input_files may be any
+        iterable (e.g. a generator over os.scandir). Records are yielded in
+        completion order.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._convert_jobs(input_files, output_dir, output_format)
+        settings = {
+            "output_format": output_format,
+            "quality": quality,
+            "optimize": optimize,
+            "target_size": target_size,
+            "auto_quality": auto_quality,
+            "max_dimension": max_dimension,
+        }
+        for _i, record in self._iter_records(_ConvertTask, settings, jobs):
+            yield record
+
+    def iter_optimize(
+        self,
+        input_files,
+        output_dir=None,
+        jpeg_quality=85,
+        jpeg_chroma="medium",
+        png_compression=6,
+        gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        jpeg_lossless=False,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
+    ):
+        """
+        Optimize images lazily and yield a result record per finished file.
+
+        Takes the same arguments as optimize_batch, but input_files may be any
+        iterable. Records are yielded in completion order.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._optimize_jobs(input_files, output_dir)
+        settings = {
+            "jpeg_quality": jpeg_quality,
+            "jpeg_chroma": jpeg_chroma,
+            "png_compression": png_compression,
+            "gif_reduce_palette": gif_reduce_palette,
+            "target_size": target_size,
+            "auto_quality": auto_quality,
+            "jpeg_lossless": jpeg_lossless,
+            "png_effort": png_effort,
+            "png_palette": png_palette,
+            "gif_global_palette": gif_global_palette,
+        }
+        for _i, record in self._iter_records(_OptimizeTask, settings, jobs):
+            yield record
+
+    def iter_resize(
+        self,
+        input_files,
+        output_dir,
+        width=None,
+        height=None,
+        scale=None,
+        filter_name="lanczos3",
+        fit=None,
+        crop="centre",
+    ):
+        """
+        Resize images lazily and yield a result record per finished file.
+
+        Takes the same arguments as resize_batch, but input_files may be any
+        iterable. Records are yielded in completion order.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._resize_jobs(input_files, output_dir)
+        settings = {
+            "width": width,
+            "height": height,
+            "scale": scale,
+            "filter_name": filter_name,
+            "fit": fit,
+            "crop": crop,
+        }
+        for _i, record in self._iter_records(_ResizeTask, settings, jobs):
+            yield record
+
+    def iter_process(
+        self,
+        input_files,
+        output_dir,
+        width=None,
+        height=None,
+        scale=None,
+        filter_name="lanczos3",
+        output_format=None,
+        quality=85,
+        jpeg_chroma="medium",
+        png_compression=6,
+        gif_reduce_palette=True,
+        target_size=None,
+        auto_quality=None,
+        png_effort=0,
+        png_palette=None,
+        gif_global_palette=None,
+        fit=None,
+        crop="centre",
+    ):
+        """
+        Resize and optimize or convert lazily, yielding a record per finished file.
+
+        Takes the same arguments as process_batch, but input_files may be any
+        iterable. Records are yielded in completion order.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._process_jobs(input_files, output_dir, output_format)
+        settings = {
+            "width": width,
+            "height": height,
+            "scale": scale,
+            "filter_name": filter_name,
+            "output_format": output_format,
+            "quality": quality,
+            "jpeg_chroma": jpeg_chroma,
+            "png_compression": png_compression,
+            "gif_reduce_palette": gif_reduce_palette,
+            "target_size": target_size,
+            "auto_quality": auto_quality,
+            "png_effort": png_effort,
+            "png_palette": png_palette,
+            "gif_global_palette": gif_global_palette,
+            "fit": fit,
+            "crop": crop,
+        }
+        for _i, record in self._iter_records(_PipelineTask, settings, jobs):
+            yield record
+
+    def iter_renditions(
+        self, input_files, output_dir, widths, formats=("JPEG",), quality=85,
+        filter_name="lanczos3",
+    ):
+        """
+        Write responsive renditions lazily, yielding a record per finished file.
+
+        Takes the same arguments as renditions_batch, but input_files may be any
+        iterable. The record output is the manifest path and bytes_after the
+        total size of all renditions.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._rendition_jobs(input_files, output_dir)
+        settings = {
+            "widths": list(widths),
+            "formats": list(formats),
+            "quality": quality,
+            "filter_name": filter_name,
+        }
+        for _i, record in self._iter_records(_RenditionTask, settings, jobs):
+            yield record
+
+    def iter_pyramid(
+        self, input_files, output_dir, layout="dzi", tile_size=254, overlap=1,
+        tile_format="JPEG", container="directory", quality=85, jpeg_chroma="medium",
+        resource_id=None,
+    ):
+        """
+        Write deep-zoom tile pyramids lazily, yielding a record per finished file.
+
+        Takes the same arguments as pyramid_batch, but input_files may be any
+        iterable. The record output is the .dzi file, zip file or pyramid
+        directory and bytes_after the total size of all tiles.
+
+        Yields:
+            Dict with input, output, bytes_before/after, elapsed, per-stage
+            times, backend, peak_memory, error and skipped.
+        """
+        jobs = self._pyramid_jobs(input_files, output_dir, layout, container)
+        settings = {
+            "layout": layout,
+            "tile_size": tile_size,
+            "overlap": overlap,
+            "tile_format": tile_format,
+            "container": container,
+            "quality": quality,
+            "jpeg_chroma": jpeg_chroma,
+            "resource_id": resource_id,
+        }
+        for _i, record in self._iter_records(_PyramidTask, settings, jobs):
+            yield record
+
+    def _convert_jobs(self, input_files, output_dir, output_format):
+        """Yield (input, output) pairs for a conversion."""
+        # Bestimme Ausgabedateinamen
+        ext = ImageConverter.SUPPORTED_FORMATS.get(output_format, ["png"])[0]
+        for input_file in input_files:
+            yield input_file, self._output_path(
+                input_file, output_dir, f"{Path(input_file).stem}.{ext}"
+            )
+
+    def _optimize_jobs(self, input_files, output_dir):
+        """Yield (input, output) pairs for an optimization."""
+        if not output_dir and self.duplicates == "link":
+            raise ValueError("Linking duplicates requires an output directory")
+        for input_file in input_files:
+            if output_dir:
+                yield input_file, self._output_path(
+                    input_file, output_dir, os.path.basename(input_file)
                 )
+            else:
+                yield input_file, input_file
+
+    def _resize_jobs(self, input_files, output_dir):
+        """Yield (input, output) pairs for a resize."""
+        for input_file in input_files:
+            yield input_file, self._output_path(
+                input_file, output_dir, os.path.basename(input_file)
+            )
+
+    def _rendition_jobs(self, input_files, output_dir):
+        """Yield (input, manifest) pairs for rendition generation."""
+        for input_file in input_files:
+            yield input_file, self._output_path(
+                input_file, output_dir, Path(input_file).stem + MANIFEST_SUFFIX
+            )
 
-            output_file = os.path.join(output_dir, os.path.basename(input_file))
-            result = resizer.resize(input_file, output_file, width, height, scale)
+    def _pyramid_jobs(self, input_files, output_dir, layout, container):
+        """Yield (input, pyramid path) pairs for a pyramid export."""
+        suffix = pyramid_suffix(layout, container)
+        for input_file in input_files:
+            yield input_file, self._output_path(
+                input_file, output_dir, Path(input_file).stem + suffix
+            )
+
+    def _output_path(self, input_file, output_dir, name):
+        """Place name in output_dir, mirroring the input tree below source_root."""
+        if self.source_root:
+            relative_dir = os.path.relpath(os.path.dirname(input_file), self.source_root)
+            if relative_dir != os.curdir and not relative_dir.startswith(os.pardir):
+                output_dir = os.path.join(output_dir, relative_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, name)
+
+    def _process_jobs(self, input_files, output_dir, output_format):
+        """Yield (input, output) pairs for a fused resize and optimize/convert run."""
+        if output_format:
+            return self._convert_jobs(input_files, output_dir, output_format)
+        return self._resize_jobs(input_files, output_dir)
+
+    def _collect(self, records, input_files, message):
+        """
+        Drain an iter_* generator and collect the generated files.
+
+        Args:
+            records: Result records of an iter_* method over input_files.
+            input_files: List of the input paths.
+            message: Progress message prefix.
+
+        Returns:
+            List of generated files in input order.
+        """
+        total = len(input_files)
+        results = [None] * total
+        # Eingaben können mehrfach vorkommen, daher je Pfad alle Positionen merken
+        positions = {}
+        for i, input_file in enumerate(input_files):
+            positions.setdefault(input_file, []).append(i)
 
-            if result:
-                resized_files.append(result)
+        for done, record in enumerate(records, start=1):
+            results[positions[record["input"]].pop(0)] = record["output"]
+            if self.progress_callback:
+                name = os.path.basename(record["input"])
+                self.progress_callback(done, total, f"{message} {name}")
 
         if self.progress_callback:
             self.progress_callback(total, total, "Fertig")
 
-        return resized_files
+        return [result for result in results if result]
+
+    def _iter_records(self, task_class, settings, jobs):
+        """
+        Process (input, output) pairs and feed the records into the report.
+
+        Args:
+            task_class: Task class instantiated once per process with settings.
+            settings: Keyword arguments for the task class.
+            jobs: Iterable of (input_file, output_file) tuples, consumed lazily.
+
+        Yields:
+            Tuples of (job index, result record) in completion order.
+        """
+        for i, record in self._iter_deduped(task_class, settings, jobs):
+            if self.report is not None:
+                self.report.add(record)
+            yield i, record
+
+    def _iter_deduped(self, task_class, settings, jobs):
+        """
+        Process jobs, skipping or hard-linking perceptual duplicates of earlier inputs.
+
+        Inputs are hashed in parallel chunks ahead of scheduling. An input
+        within duplicate_distance of an earlier one is not processed; its
+        record is held back until the original finished, so that in link
+        mode the original's output can be hard-linked to its output path.
+
+        Link mode only treats exact duplicates as such (hash distance 0 and
+        the same dimensions and format) and never links over an input that
+        is processed in place.
+        """
+        if not self.duplicates:
+            yield from self._iter_tracked(task_class, settings, jobs)
+            return
+
+        index = HashIndex(self.hash_index_path)
+        # Nur Ausgaben gleichen Formats können sich eine Datei teilen
+        trees = {}
+        originals = {}
+        finished = {}
+        waiting = {}
+        signatures = {}
+
+
+        def hashed(jobs):
+            jobs = iter(jobs)
+            for chunk in iter(lambda: list(islice(jobs, HASH_CHUNK)), []):
+                # Gehasht wird neben den Worker-Prozessen, daher nicht mehr Threads als Worker
+                index.update([input_file for input_file, _output_file in chunk], self.workers)
+                yield from chunk
+
+        def signature(input_file):
+            if input_file not in signatures:
+                signatures[input_file] = image_signature(input_file)
+            return signatures[input_file]
+
+        def exact_original(tree, value, input_file):
+            own = signature(input_file)
+            if own is None:
+                return None
+            for _distance, candidate in tree.search(value, 0):
+                if signature(candidate) == own:
+                    return candidate
+            return None
+
+        def is_duplicate(input_file, output_file):
+            value = index.get(input_file, self.hash_algorithm)
+            if value is None:
+                return False
+            tree = trees.setdefault(os.path.splitext(output_file)[1].lower(), BKTree())
+            if self.duplicates == "link":
+                # Quelle nie durch einen Link auf eine fremde Ausgabe ersetzen
+                if _same_file(input_file, output_file):
+                    return False
+                original = exact_original(tree, value, input_file)
+            else:
+                original = tree.nearest(value, self.duplicate_distance)
+            if original is None:
+                tree.add(value, input_file)
+                return False
+            originals[input_file] = original
+            return True
+
+        try:
+            records = self._iter_tracked(
+                task_class, settings, hashed(jobs), skip=is_duplicate
+            )
+            for i, record in records:
+                original = originals.pop(record["input"], None)
+                if original is not None:
+                    record["duplicate_of"] = original
+                    if original in finished:
+                        yield i, self._resolve_duplicate(record, finished[original])
+                    else:
+                        waiting.setdefault(original, []).append((i, record))
+                    continue
+
+                output = None if record["error"] else record["output"]
+                finished[record["input"]] = output
+                yield i, record
+                for j, duplicate in waiting.pop(record["input"], []):
+                    yield j, self._resolve_duplicate(duplicate, output)
+        finally:
+            index.save()
+
+    def _resolve_duplicate(self, record, original_output):
+        """Hard-link the original's output for a duplicate record, or mark it unwritten."""
+        if (
+            self.duplicates != "link"
+            or not original_output
+            or not record["output"]
+            or _same_file(record["input"], record["output"])
+        ):
+            record["output"] = None
+            record["bytes_after"] = None
+            return record
+        try:
+            _hard_link(original_output, record["output"])
+            record["bytes_after"] = _file_size(record["output"])
+        except OSError as e:
+            print(f"Linking duplicate failed: {e}")
+            record["error"] = str(e)
+        return record
+
+    def _iter_tracked(self, task_class, settings, jobs, skip=None):
+        """Process jobs, consulting and updating the manifest in incremental mode."""
+        if not self.incremental:
+            yield from self._iter_processed(task_class, settings, jobs, skip=skip)
+            return
+
+        fingerprint = settings_fingerprint(task_class.__name__, settings)
+        manifests = {}
+
+        def manifest_for(output_file):
+            directory = os.path.dirname(os.path.abspath(output_file))
+            if directory not in manifests:
+                manifests[directory] = BatchManifest(directory)
+            return manifests[directory]
+
+        def is_current(input_file, output_file):
+            if skip and skip(input_file, output_file):
+                return True
+            return manifest_for(output_file).is_current(input_file, output_file, fingerprint)
+
+        try:
+            records = self._iter_processed(task_class, settings, jobs, skip=is_current)
+            for count, (i, record) in enumerate(records, start=1):
+                if record["output"] and not record["skipped"]:
+                    manifest_for(record["output"]).record(
+                        record["input"], record["output"], fingerprint
+                    )
+                # Sichere den Fortschritt regelmäßig
+                if count % 100 == 0:
+                    for manifest in manifests.values():
+                        manifest.save()
+                yield i, record
+        finally:
+            for manifest in manifests.values():
+                manifest.save()
+
+    def _iter_processed(self, task_class, settings, jobs, skip=None):
+        """
+        Process (input, output) pairs with a bounded number of files in flight.
+
+        With a memory budget, each job's decoded footprint is estimated from
+        its header and jobs are only admitted while the estimates of all
+        files in flight fit the budget. Images larger than the whole budget
+        run alone and in sequential-access mode.
+
+        Args:
+            task_class: Task class instantiated once per process with settings.
+            settings: Keyword arguments for the task class.
+            jobs: Iterable of (input_file, output_file) tuples, consumed lazily.
+            skip: Optional callable(input_file, output_file) that marks jobs as done.
+
+        Yields:
+            Tuples of (job index, result record) in completion order.
+        """
+        workers = self.workers
+        budget = self.memory_budget
+        jobs = iter(jobs)
+        first = list(islice(jobs, 2))
+        # Für eine einzelne Datei lohnt sich kein Prozesspool
+        if len(first) < 2:
+            workers = 1
+        jobs = chain(first, jobs)
+
+        if workers <= 1:
+            task = task_class(**settings)
+            for i, (input_file, output_file) in enumerate(jobs):
+                if skip and skip(input_file, output_file):
+                    record = _new_record(input_file, output_file)
+                    record["skipped"] = True
+                    yield i, record
+                    continue
+                oversized = budget is not None and estimate_footprint(input_file) > budget
+                yield i, _process_job(task, input_file, output_file, oversized)
+            return
+
+        limit = self.max_in_flight or workers * 2
+        # libvips is not fork-safe once its thread pool is running
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(task_class, settings),
+        )
+        pending = {}
+        in_flight = 0
+        running_alone = False
+        # Job that was read but does not fit the memory budget yet
+        held = None
+        try:
+            jobs = enumerate(jobs)
+            while True:
+                while not running_alone and len(pending) < limit:
+                    if held is None:
+                        job = next(jobs, None)
+                        if job is None:
+                            break
+                        i, (input_file, output_file) = job
+                        if skip and skip(input_file, output_file):
+                            record = _new_record(input_file, output_file)
+                            record["skipped"] = True
+                            yield i, record
+                            continue
+                        cost = estimate_footprint(input_file) if budget is not None else 0
+                        held = (i, input_file, output_file, cost)
+
+                    i, input_file, output_file, cost = held
+                    oversized = budget is not None and cost > budget
+                    # Warte, bis genug Speicher frei ist; übergroße Bilder laufen allein
+                    if pending and budget is not None and (oversized or in_flight + cost > budget):
+                        break
+                    future = executor.submit(_run_worker_task, input_file, output_file, oversized)
+                    pending[future] = (i, input_file, cost)
+                    in_flight += cost
+                    running_alone = oversized
+                    held = None
+                if not pending:
+                    break
+
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, input_file, cost = pending.pop(future)
+                    in_flight -= cost
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"Batch worker failed: {e}")
+                        record = _new_record(input_file)
+                        record["error"] = str(e)
+                    yield i, record
+                if not pending:
+                    running_alone = False
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
     def set_progress_callback(self, callback):
         """Register a callback to report progress."""
         self.progress_callback = callback
 
+    def set_workers(self, workers):
+        """Set the number of worker processes (1 runs in-process, 0 uses all CPUs)."""
+        workers = int(workers)
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+
+    def set_max_in_flight(self, max_in_flight):
+        """Limit how many files are queued at once (None uses twice the worker count)."""
+        self.max_in_flight = max(1, int(max_in_flight)) if max_in_flight else None
+
+    def set_incremental(self, incremental):
+        """Skip inputs whose manifest entry in the output directory is still current."""
+        self.incremental = bool(incremental)
+
+    def set_source_root(self, source_root):
+        """Mirror the directory tree below source_root into the output directory."""
+        self.source_root = source_root
+
+    def set_report(self, report):
+        """Feed every result record into a BatchReport (None disables reporting)."""
+        self.report = report
+
+    def set_memory_budget(self, memory_budget):
+        """
+        Limit the estimated decoded memory of all files in flight.
+
+        Args:
+            memory_budget: Budget in bytes, or None to schedule by count only.
+        """
+        self.memory_budget = max(1, int(memory_budget)) if memory_budget else None
+
+    def set_duplicates(self, mode, distance=None, algorithm=None, index_path=None):
+        """
+        Handle perceptual duplicates of earlier inputs instead of processing them.
+
+        Args:
+            mode: None to process everything, "skip" to leave duplicates out
+                or "link" to hard-link the original's output in their place.
+                "link" only applies to exact duplicates (distance 0, same
+                dimensions and format); inputs processed in place are never
+                replaced by a link.
+            distance: Maximum Hamming distance between hashes (0-64).
+            algorithm: "dhash" or "phash".
+            index_path: Hash index file (defaults to the user cache directory).
+        """
+        if mode in (None, "skip", "link"):
+            self.duplicates = mode
+        if distance is not None:
+            self.duplicate_distance = max(0, min(64, int(distance)))
+        if algorithm in HASH_ALGORITHMS:
+            self.hash_algorithm = algorithm
+        self.hash_index_path = index_path
@@ -0,0 +1,469 @@
+"""
+Headless command-line interface for batch processing (no GTK required).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from .batch_processor import BatchProcessor
+from .memory import parse_size
+from .report import BatchReport
+from ..converter.image_converter import ImageConverter
+from ..optimizer.auto_quality import DEFAULT_THRESHOLD
+from ..optimizer.gif_frames import DITHER_METHODS
+from ..optimizer.pyramid import CONTAINERS, LAYOUTS, TILE_FORMATS
+from ..optimizer.resize import ImageResizer
+from ..utils.duplicates import HASH_ALGORITHMS, HashIndex, find_duplicate_groups
+from ..utils.file_utils import is_image_file, iter_image_files
+
+
+def build_parser():
+    """Create the argument parser for nodiview-batch."""
+    parser = argparse.ArgumentParser(
+        prog="nodiview-batch",
+        description="Optimize, convert and resize images without a GUI.",
+    )
+
+    sources = argparse.ArgumentParser(add_help=False)
+    sources.add_argument("inputs", nargs="+", help="Image files or directories")
+    sources.add_argument(
+        "-r", "--recursive", action="store_true", help="Descend into subdirectories"
+    )
+    sources.add_argument(
+        "--include", action="append", default=[], metavar="GLOB",
+        help="Only process files matching GLOB (repeatable)",
+    )
+    sources.add_argument(
+        "--exclude", action="append", default=[], metavar="GLOB",
+        help="Skip files matching GLOB (repeatable)",
+    )
+
+    hashing = argparse.ArgumentParser(add_help=False)
+    hashing.add_argument(
+        "--duplicate-distance", type=int, default=4, metavar="N",
+        help="Maximum Hamming distance between perceptual hashes (default: 4)",
+    )
+    hashing.add_argument(
+        "--hash-algorithm", default="dhash", choices=HASH_ALGORITHMS,
+        help="Perceptual hash used to find duplicates",
+    )
+    hashing.add_argument(
+        "--hash-index", metavar="FILE",
+        help="Hash index file (default: ~/.cache/nodiview/hashes.json)",
+    )
+
+    common = argparse.ArgumentParser(add_help=False, parents=[sources, hashing])
+    common.add_argument("-o", "--output", help="Output directory")
+    common.add_argument(
+        "--flat", action="store_true",
+        help="Write all outputs into the output directory instead of mirroring the tree",
+    )
+    common.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of worker processes (0 = all CPUs, default: 1)",
+    )
+    common.add_argument(
+        "--memory-budget", type=_size, metavar="SIZE",
+        help="Limit the estimated decoded memory of parallel jobs, e.g. 4G; "
+        "larger images run alone with sequential access",
+    )
+    common.add_argument(
+        "--incremental", action="store_true",
+        help="Skip files unchanged since the last run with the same settings",
+    )
+    common.add_argument(
+        "--duplicates", choices=["skip", "link"],
+        help="Skip perceptual duplicates of earlier inputs, or hard-link the earlier "
+        "output for exact duplicates (requires --output)",
+    )
+    common.add_argument(
+        "--json", action="store_true", help="Print a JSON summary instead of text"
+    )
+    common.add_argument(
+        "--report", metavar="FILE", help="Write the JSON summary with throughput figures to FILE"
+    )
+    common.add_argument(
+        "--csv", metavar="FILE", help="Write per-file timings and sizes to a CSV file"
+    )
+
+    resize = argparse.ArgumentParser(add_help=False)
+    resize.add_argument("--width", type=int, help="Target width in pixels")
+    resize.add_argument("--height", type=int, help="Target height in pixels")
+    resize.add_argument("--scale", type=float, help="Scale factor (e.g. 0.5)")
+    resize.add_argument(
+        "--filter", dest="filter_name", default="lanczos3",
+        choices=sorted(ImageResizer.VIPS_FILTERS), help="Interpolation filter",
+    )
+    resize.add_argument(
+        "--fit", choices=list(ImageResizer.THUMBNAIL_FITS),
+        help="Shrink while decoding and fit into --width x --height: inside, cover "
+        "(crop), exact (stretch) or down (never enlarge)",
+    )
+    resize.add_argument(
+        "--crop", default="centre", choices=ImageResizer.CROP_MODES,
+        help="Part of the image --fit cover keeps: centre, entropy (most detail) "
+        "or attention (most salient region)",
+    )
+
+    optimize = argparse.ArgumentParser(add_help=False)
+    optimize.add_argument("--quality", type=int, default=85, help="JPEG quality (1-100)")
+    optimize.add_argument(
+        "--chroma", default="medium", choices=["none", "low", "medium", "high"],
+        help="JPEG chroma subsampling",
+    )
+    optimize.add_argument(
+        "--png-compression", type=int, default=6, help="PNG compression level (0-9)"
+    )
+    optimize.add_argument(
+        "--png-effort", type=int, default=0, choices=range(4), metavar="{0-3}",
+        help="Try several filter, zlib and palette strategies per PNG and keep the "
+        "smallest (0 = single encode)",
+    )
+    optimize.add_argument(
+        "--png-palette", type=int, nargs="?", const=80, metavar="Q",
+        help="Write lossy palette PNGs at this quality (default: 80); images that "
+        "would lose too much stay truecolor",
+    )
+    optimize.add_argument(
+        "--no-gif-palette", action="store_true", help="Disable GIF palette reduction"
+    )
+    optimize.add_argument(
+        "--gif-global-palette", nargs="?", const="floyd-steinberg", choices=DITHER_METHODS,
+        metavar="DITHER",
+        help="Map all frames of animated GIFs onto one shared palette, dithered with "
+        "floyd-steinberg (default) or ordered",
+    )
+
+    lossy = argparse.ArgumentParser(add_help=False)
+    lossy.add_argument(
+        "--target-size", type=_size, metavar="SIZE",
+        help="Maximum JPEG/WebP file size, e.g. 200K; --quality becomes the upper bound",
+    )
+    lossy.add_argument(
+        "--auto-quality", type=float, nargs="?", const=DEFAULT_THRESHOLD, metavar="SSIM",
+        help="Pick the lowest JPEG/WebP quality per image whose SSIM reaches the "
+        f"threshold (default: {DEFAULT_THRESHOLD})",
+    )
+
+    formats = ImageConverter.SUPPORTED_FORMATS
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    optimize_parser = subparsers.add_parser(
+        "optimize", parents=[common, optimize, lossy],
+        help="Optimize JPEG, PNG and GIF files (in place without --output)",
+    )
+    optimize_parser.add_argument(
+        "--lossless", action="store_true",
+        help="Recompress JPEGs without changing their pixels (jpegtran if installed); "
+        "files that would not shrink or stay identical are kept unchanged",
+    )
+
+    convert_parser = subparsers.add_parser(
+        "convert", parents=[common, lossy], help="Convert images to another format"
+    )
+    convert_parser.add_argument("--format", required=True, choices=list(formats))
+    convert_parser.add_argument("--quality", type=int, default=85, help="Quality (1-100)")
+    convert_parser.add_argument(
+        "--max-dimension", type=int, metavar="PX",
+        help="Shrink images whose width or height exceeds PX while decoding",
+    )
+
+    subparsers.add_parser("resize", parents=[common, resize], help="Resize images")
+
+    process_parser = subparsers.add_parser(
+        "process", parents=[common, resize, optimize, lossy],
+        help="Resize and optimize or convert in a single pass",
+    )
+    process_parser.add_argument("--format", choices=list(formats))
+
+    renditions_parser = subparsers.add_parser(
+        "renditions", parents=[common],
+        help="Write several widths/formats per image (responsive srcset) from one decode",
+    )
+    renditions_parser.add_argument(
+        "--widths", required=True, type=_int_list, help="Comma-separated widths, e.g. 320,640,1280"
+    )
+    renditions_parser.add_argument(
+        "--formats", default=["JPEG"], type=_format_list,
+        help="Comma-separated formats, e.g. JPEG,WebP (default: JPEG)",
+    )
+    renditions_parser.add_argument("--quality", type=int, default=85, help="Quality (1-100)")
+    renditions_parser.add_argument(
+        "--filter", dest="filter_name", default="lanczos3",
+        choices=sorted(ImageResizer.VIPS_FILTERS), help="Interpolation filter",
+    )
+
+    pyramid_parser = subparsers.add_parser(
+        "pyramid", parents=[common],
+        help="Write deep-zoom tile pyramids (DZI, IIIF, Zoomify) for web viewers",
+    )
+    pyramid_parser.add_argument("--layout", default="dzi", choices=list(LAYOUTS))
+    pyramid_parser.add_argument(
+        "--tile-size", type=int, default=254, metavar="PX", help="Tile edge length (default: 254)"
+    )
+    pyramid_parser.add_argument(
+        "--overlap", type=int, default=1, metavar="PX",
+        help="Overlap between neighbouring tiles (default: 1)",
+    )
+    pyramid_parser.add_argument("--tile-format", default="JPEG", choices=list(TILE_FORMATS))
+    pyramid_parser.add_argument(
+        "--container", default="directory", choices=list(CONTAINERS),
+        help="Write a directory tree or a single zip file",
+    )
+    pyramid_parser.add_argument("--quality", type=int, default=85, help="Tile quality (1-100)")
+    pyramid_parser.add_argument(
+        "--chroma", default="medium", choices=["none", "low", "medium", "high"],
+        help="JPEG chroma subsampling",
+    )
+    pyramid_parser.add_argument(
+        "--iiif-id", metavar="URL", help="Base URL written into IIIF info.json"
+    )
+
+    duplicates_parser = subparsers.add_parser(
+        "duplicates", parents=[sources, hashing],
+        help="List groups of duplicate and near-duplicate images",
+    )
+    duplicates_parser.add_argument(
+        "--json", action="store_true", help="Print the groups as JSON"
+    )
+
+    return parser
+
+
+def _int_list(value):
+    """Parse a comma-separated list of positive integers."""
+    try:
+        numbers = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    if not numbers or min(numbers) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    return numbers
+
+
+def _size(value):
+    """Parse a byte size such as 512M or 4G."""
+    try:
+        size = parse_size(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return size
+
+
+def _format_list(value):
+    """Parse a comma-separated list of supported format names."""
+    names = {fmt.lower(): fmt for fmt in ImageConverter.SUPPORTED_FORMATS}
+    formats = []
+    for part in value.split(","):
+        fmt = names.get(part.strip().lower())
+        if fmt is None:
+            raise argparse.ArgumentTypeError(f"unsupported format: {part}")
+        formats.append(fmt)
+    return formats
+
+
+def collect_inputs(paths, recursive=False, include=None, exclude=None):
+    """
+    Group input files by the directory their output tree is mirrored from.
+
+    Returns:
+        List of (source_root, file iterator) tuples; source_root is None for
+        files named directly on the command line.
+    """
+    groups = []
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            groups.append((path, iter_image_files(path, recursive, include, exclude)))
+        elif is_image_file(path) and os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Skipping {path}: not an image file or directory", file=sys.stderr)
+    if files:
+        groups.insert(0, (None, iter(files)))
+    return groups
+
+
+def run(args):
+    """Run the batch job described by parsed arguments and return a summary."""
+    processor = BatchProcessor()
+    processor.set_workers(args.jobs)
+    processor.set_incremental(args.incremental)
+    processor.set_memory_budget(args.memory_budget)
+    processor.set_duplicates(
+        args.duplicates, args.duplicate_distance, args.hash_algorithm, args.hash_index
+    )
+    report = BatchReport(csv_path=args.csv)
+    processor.set_report(report)
+
+    try:
+        for source_root, input_files in collect_inputs(
+            args.inputs, args.recursive, args.include, args.exclude
+        ):
+            processor.set_source_root(None if args.flat else source_root)
+            for record in _iter_command(processor, args, input_files):
+                if not args.json:
+                    _print_record(record)
+    finally:
+        report.close()
+
+    if args.report:
+        report.write_json(args.report)
+
+    summary = report.summary()
+    summary["command"] = args.command
+    return summary
+
+
+def find_duplicates(args):
+    """Group the inputs by perceptual hash and return the groups."""
+    input_files = [
+        input_file
+        for _source_root, files in collect_inputs(
+            args.inputs, args.recursive, args.include, args.exclude
+        )
+        for input_file in files
+    ]
+    index = HashIndex(args.hash_index)
+    try:
+        return find_duplicate_groups(
+            input_files, args.duplicate_distance, args.hash_algorithm, index
+        )
+    finally:
+        index.save()
+
+
+def _iter_command(processor, args, input_files):
+    """Dispatch to the BatchProcessor iterator matching the command."""
+    if args.command == "optimize":
+        return processor.iter_optimize(
+            input_files,
+            args.output,
+            jpeg_quality=args.quality,
+            jpeg_chroma=args.chroma,
+            png_compression=args.png_compression,
+            png_effort=args.png_effort,
+            png_palette=args.png_palette,
+            gif_reduce_palette=not args.no_gif_palette,
+            gif_global_palette=args.gif_global_palette,
+            target_size=args.target_size,
+            auto_quality=args.auto_quality,
+            jpeg_lossless=args.lossless,
+        )
+    if args.command == "convert":
+        return processor.iter_convert(
+            input_files, args.output, args.format, quality=args.quality,
+            target_size=args.target_size,
+            auto_quality=args.auto_quality,
+            max_dimension=args.max_dimension,
+        )
+    if args.command == "resize":
+        return processor.iter_resize(
+            input_files, args.output, args.width, args.height, args.scale, args.filter_name,
+            fit=args.fit,
+            crop=args.crop,
+        )
+    if args.command == "renditions":
+        return processor.iter_renditions(
+            input_files, args.output, args.widths, args.formats, args.quality, args.filter_name
+        )
+    if args.command == "pyramid":
+        return processor.iter_pyramid(
+            input_files,
+            args.output,
+            layout=args.layout,
+            tile_size=args.tile_size,
+            overlap=args.overlap,
+            tile_format=args.tile_format,
+            container=args.container,
+            quality=args.quality,
+            jpeg_chroma=args.chroma,
+            resource_id=args.iiif_id,
+        )
+    return processor.iter_process(
+        input_files,
+        args.output,
+        width=args.width,
+        height=args.height,
+        scale=args.scale,
+        filter_name=args.filter_name,
+        output_format=args.format,
+        quality=args.quality,
+        jpeg_chroma=args.chroma,
+        png_compression=args.png_compression,
+        png_effort=args.png_effort,
+        png_palette=args.png_palette,
+        gif_reduce_palette=not args.no_gif_palette,
+        gif_global_palette=args.gif_global_palette,
+        target_size=args.target_size,
+        auto_quality=args.auto_quality,
+        fit=args.fit,
+        crop=args.crop,
+    )
+
+
+def _print_record(record):
+    """Print a one-line description of a result record."""
+    if record["error"]:
+        print(f"FAILED  {record['input']}: {record['error']}")
+    elif record["skipped"] and record.get("duplicate_of"):
+        target = f" -> {record['output']}" if record["output"] else ""
+        print(f"skipped {record['input']}{target} (duplicate of {record['duplicate_of']})")
+    elif record["skipped"]:
+        print(f"skipped {record['input']}")
+    else:
+        quality = f", q={record['quality']}" if record.get("quality") else ""
+        print(
+            f"ok      {record['input']} -> {record['output']} "
+            f"({record['bytes_before'] or 0} -> {record['bytes_after'] or 0} bytes, "
+            f"{record['elapsed']:.2f}s, {record['backend']}{quality})"
+        )
+
+
+def main(argv=None):
+    """Console entry point for nodiview-batch."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "duplicates":
+        groups = find_duplicates(args)
+        if args.json:
+            json.dump(groups, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            for group in groups:
+                print("\n".join(group))
+                print()
+            print(f"{len(groups)} groups, {sum(len(group) for group in groups)} files")
+        return 0
+
+    if args.command != "optimize" and not args.output:
+        parser.error(f"{args.command} requires --output")
+    if args.duplicates == "link" and not args.output:
+        parser.error("--duplicates link requires --output")
+    if args.command == "resize" and args.width is None and args.height is None:
+        if args.scale is None:
+            parser.error("resize requires --width, --height or --scale")
+
+    summary = run(args)
+
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(
+            f"{summary['files']} files: {summary['processed']} processed, "
+            f"{summary['skipped']} skipped, {summary['failed']} failed, "
+            f"{summary['bytes_saved']} bytes saved in {summary['wall_time']:.1f}s "
+            f"({summary['files_per_second']:.1f} files/s, {summary['mb_per_second']:.1f} MB/s)"
+        )
+
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
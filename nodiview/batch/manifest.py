@@ -0,0 +1,116 @@
+"""
+Manifest of processed files for incremental batch runs.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".nodiview-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def settings_fingerprint(task_name, settings):
+    """Return a stable fingerprint for an operation and its settings."""
+    payload = json.dumps([task_name, settings], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Track which inputs of a directory were processed with which settings."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        """Read the manifest from disk, starting empty if it is missing or invalid."""
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("files", {})
+
+    def save(self):
+        """Write the manifest atomically if it changed."""
+        if not self.changed:
+            return
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"version": MANIFEST_VERSION, "files": self.entries}, handle, indent=1)
+            os.replace(temp_path, self.path)
+            self.changed = False
+        except OSError as e:
+            print(f"Saving batch manifest failed: {e}")
+
+    def is_current(self, input_file, output_file, fingerprint):
+        """
+        Check whether an input was already processed into output_file.
+
+        Size and mtime are compared first; the content hash is only computed
+        when the size matches but the mtime differs (e.g. after a copy).
+
+        Args:
+            input_file: Source path.
+            output_file: Expected destination path.
+            fingerprint: Settings fingerprint of the current run.
+
+        Returns:
+            True if the file can be skipped.
+        """
+        entry = self.entries.get(os.path.abspath(input_file))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        if entry.get("output") != os.path.abspath(output_file):
+            return False
+        if not os.path.exists(output_file):
+            return False
+
+        try:
+            stat = os.stat(input_file)
+        except OSError:
+            return False
+        if stat.st_size != entry.get("size"):
+            return False
+        if stat.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+
+        try:
+            if file_digest(input_file) != entry.get("hash"):
+                return False
+        except OSError:
+            return False
+
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self.changed = True
+        return True
+
+    def record(self, input_file, output_file, fingerprint):
+        """Remember that input_file was processed into output_file."""
+        try:
+            stat = os.stat(input_file)
+            digest = file_digest(input_file)
+        except OSError:
+            return
+        self.entries[os.path.abspath(input_file)] = {
+            "output": os.path.abspath(output_file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+            "fingerprint": fingerprint,
+        }
+        self.changed = True
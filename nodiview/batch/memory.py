@@ -0,0 +1,80 @@
+"""
+Decoded-memory estimates for scheduling batch jobs.
+"""
+
+import pyvips
+from PIL import Image
+
+# Bytes per band for libvips band formats
+VIPS_FORMAT_SIZES = {
+    "uchar": 1,
+    "char": 1,
+    "ushort": 2,
+    "short": 2,
+    "uint": 4,
+    "int": 4,
+    "float": 4,
+    "complex": 8,
+    "double": 8,
+    "dpcomplex": 16,
+}
+
+# Bytes per pixel for Pillow modes (unknown modes count as RGBA)
+PIL_MODE_SIZES = {
+    "1": 1,
+    "L": 1,
+    "P": 1,
+    "LA": 2,
+    "PA": 2,
+    "I;16": 2,
+    "RGB": 3,
+    "YCbCr": 3,
+    "LAB": 3,
+    "HSV": 3,
+    "RGBA": 4,
+    "CMYK": 4,
+    "I": 4,
+    "F": 4,
+}
+
+# Source plus one transformed copy are alive while an image is processed
+WORKING_COPIES = 2
+
+
+def estimate_footprint(image_path):
+    """
+    Estimate the memory needed to process an image from its header alone.
+
+    Uses width, height, bands, band format and frame count; pixel data is
+    not decoded.
+
+    Args:
+        image_path: Image file path.
+
+    Returns:
+        Estimated peak bytes, or 0 if the header cannot be read.
+    """
+    try:
+        image = pyvips.Image.new_from_file(image_path)
+        frames = image.get("n-pages") if image.get_typeof("n-pages") != 0 else 1
+        pixel_size = image.bands * VIPS_FORMAT_SIZES.get(image.format, 1)
+        return image.width * image.height * pixel_size * max(1, frames) * WORKING_COPIES
+    except Exception:
+        pass
+
+    try:
+        with Image.open(image_path) as img:
+            frames = getattr(img, "n_frames", 1)
+            pixel_size = PIL_MODE_SIZES.get(img.mode, 4)
+            return img.width * img.height * pixel_size * max(1, frames) * WORKING_COPIES
+    except Exception:
+        return 0
+
+
+def parse_size(value):
+    """Parse a byte size such as 512M, 8G or 1073741824."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    text = str(value).strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
@@ -0,0 +1,122 @@
+"""
+Throughput and latency reports for batch runs.
+"""
+
+import csv
+import json
+import time
+
+from ..utils.stats import STAGES
+
+CSV_FIELDS = [
+    "input",
+    "output",
+    "backend",
+    "quality",
+    "bytes_before",
+    "bytes_after",
+    "elapsed",
+    *(f"{stage}_time" for stage in STAGES),
+    "peak_memory",
+    "skipped",
+    "duplicate_of",
+    "error",
+]
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class BatchReport:
+    """Aggregate batch result records into throughput, latency and savings figures."""
+
+    def __init__(self, csv_path=None):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.peak_memory = 0
+        self.latencies = []
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.backends = {}
+        self.errors = []
+
+        self._csv_file = None
+        self._csv_writer = None
+        if csv_path:
+            self._csv_file = open(csv_path, "w", newline="", encoding="utf-8")
+            self._csv_writer = csv.DictWriter(
+                self._csv_file, fieldnames=CSV_FIELDS, extrasaction="ignore"
+            )
+            self._csv_writer.writeheader()
+
+    def add(self, record):
+        """Account for one result record."""
+        self.files += 1
+        if self._csv_writer:
+            self._csv_writer.writerow(record)
+
+        if record.get("error"):
+            self.failed += 1
+            self.errors.append({"input": record["input"], "error": record["error"]})
+            return
+        if record.get("skipped"):
+            self.skipped += 1
+            return
+
+        self.processed += 1
+        self.bytes_before += record.get("bytes_before") or 0
+        self.bytes_after += record.get("bytes_after") or 0
+        self.peak_memory = max(self.peak_memory, record.get("peak_memory") or 0)
+        self.latencies.append(record.get("elapsed") or 0.0)
+        for stage in STAGES:
+            self.stage_times[stage] += record.get(f"{stage}_time") or 0.0
+        backend = record.get("backend") or "unknown"
+        self.backends[backend] = self.backends.get(backend, 0) + 1
+
+    def summary(self):
+        """Return the aggregate figures as a JSON-serialisable dict."""
+        wall_time = time.perf_counter() - self.start
+        latencies = sorted(self.latencies)
+        saved = self.bytes_before - self.bytes_after
+        return {
+            "files": self.files,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "wall_time": wall_time,
+            "files_per_second": self.processed / wall_time if wall_time else 0.0,
+            "mb_per_second": (
+                self.bytes_before / (1024 * 1024) / wall_time if wall_time else 0.0
+            ),
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "stage_times": dict(self.stage_times),
+            "backends": dict(self.backends),
+            "peak_memory": self.peak_memory or None,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": saved,
+            "saved_percent": saved / self.bytes_before * 100 if self.bytes_before else 0.0,
+            "errors": list(self.errors),
+        }
+
+    def write_json(self, path):
+        """Write the summary to a JSON file."""
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.summary(), handle, indent=2)
+
+    def close(self):
+        """Flush and close the per-file CSV, if any."""
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
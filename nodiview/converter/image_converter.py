@@ -2,8 +2,30 @@
 Image conversion helpers.
 """
 
-from PIL import Image
+from PIL import Image, ImageSequence
+import io
 import os
+import pyvips
+
+from ..optimizer.auto_quality import (
+    ANALYSIS_SIZE,
+    DEFAULT_THRESHOLD,
+    analysis_image,
+    choose_quality,
+    pil_to_vips,
+)
+from ..optimizer.resize import page_height
+from ..optimizer.target_size import search_quality
+from ..utils.stats import StageTimer, measure, write_bytes
+
+
+def _vips_to_pil(image):
+    """Copy an 8-bit sRGB or greyscale version of a pyvips image into a Pillow image."""
+    if image.interpretation not in ("srgb", "b-w") or image.format != "uchar":
+        image = image.colourspace("srgb" if image.bands >= 3 else "b-w")
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[image.bands]
+    memory = image.cast("uchar").write_to_memory()
+    return Image.frombytes(mode, (image.width, image.height), memory)
 
 
 class ImageConverter:
@@ -14,19 +36,57 @@ class ImageConverter:
         "PNG": ["png"],
         "GIF": ["gif"],
         "WebP": ["webp"],
+        "AVIF": ["avif"],
         "TIFF": ["tiff", "tif"],
         "BMP": ["bmp"],
         "ICO": ["ico"],
     }
 
+    # BMP und ICO schreibt libvips nicht selbst
+    VIPS_SAVERS = {
+        "JPEG": "jpegsave",
+        "PNG": "pngsave",
+        "GIF": "gifsave",
+        "WebP": "webpsave",
+        "AVIF": "heifsave",
+        "TIFF": "tiffsave",
+    }
+
+    # Formate mit Qualitätseinstellung
+    LOSSY_FORMATS = ("JPEG", "WebP", "AVIF")
+
+    # Formate, die alle Frames einer Animation speichern
+    ANIMATED_FORMATS = ("GIF", "WebP", "AVIF")
+
+    ENGINES = ("pyvips", "pil")
+
     def __init__(self):
         self.quality = 85
         self.optimize = True
+        self.target_size = None
+        self.target_tolerance = 0.05
+        self.max_iterations = 8
+        self.auto_quality = False
+        self.ssim_threshold = DEFAULT_THRESHOLD
+        self.workers = None
+        self.keep_animation = True
+        self.engine = "pyvips"
+        self.max_dimension = None
+        self.last_quality = None
+        self.last_ssim = None
+        self.last_stats = None
 
     def convert(self, input_path, output_path, output_format=None):
         """
         Convert an image to another format.
 
+        Animated sources keep all frames, their delays and the loop count
+        when the target format can store an animation.
+
+        The pyvips engine decodes sequentially and writes with the libvips
+        savers (BMP and ICO are written by Pillow from the decoded pixels);
+        sources libvips cannot read fall back to Pillow.
+
         Args:
             input_path: Source path.
             output_path: Destination path.
@@ -35,50 +95,487 @@ class ImageConverter:
         Returns:
             Output path or None on failure.
         """
+        timer = self.last_stats = StageTimer(self.engine)
         if not os.path.exists(input_path):
             return None
 
         if output_format is None:
-            ext = os.path.splitext(output_path)[1].lower().lstrip(".")
-            for fmt, exts in self.SUPPORTED_FORMATS.items():
-                if ext in exts:
-                    output_format = fmt
-                    break
+            output_format = self.format_for_path(output_path)
 
-        if output_format is None:
-            output_format = "PNG"  # Standard
+        data = self._encode(input_path, output_format)
+        if data is None:
+            return None
+        write_bytes(output_path, data, timer)
+        return output_path
+
+    def convert_bytes(self, data, output_format):
+        """
+        Convert an encoded image held in memory.
+
+        Args:
+            data: Encoded input image.
+            output_format: Target format (key of SUPPORTED_FORMATS).
+
+        Returns:
+            Tuple of (encoded bytes or None on failure, StageTimer).
+        """
+        timer = self.last_stats = StageTimer(self.engine)
+        return self._encode(data, output_format), timer
 
+    def _encode(self, source, output_format):
+        """Convert a path or buffer with the configured engine, returning bytes or None."""
+        data = self._encode_animation(source, output_format)
+        if data is not None or self.last_stats.error is not None:
+            return data
+        if self.engine == "pyvips":
+            data = self._encode_with_vips(source, output_format)
+            if data is not None or self.last_stats.error is not None:
+                return data
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        return self._encode_with_pil(source, output_format)
+
+    def _load(self, source, **options):
+        """
+        Open a path or buffer sequentially with libvips.
+
+        With max_dimension set, the image is shrunk on load (JPEG and WebP
+        decode at a reduced scale, pyramidal TIFFs from a smaller level).
+
+        Args:
+            source: Input path or encoded bytes.
+            **options: Loader options such as n=-1.
+
+        Returns:
+            pyvips image.
+        """
+        if self.max_dimension:
+            size = self.max_dimension
+            option_string = ",".join(f"{key}={value}" for key, value in options.items())
+            thumbnail_options = {"height": size, "size": "down", "no_rotate": True}
+            if isinstance(source, bytes):
+                return pyvips.Image.thumbnail_buffer(
+                    source, size, option_string=option_string, **thumbnail_options
+                )
+            if option_string:
+                source = f"{source}[{option_string}]"
+            return pyvips.Image.thumbnail(source, size, **thumbnail_options)
+
+        if isinstance(source, bytes):
+            return pyvips.Image.new_from_buffer(source, "", access="sequential", **options)
+        return pyvips.Image.new_from_file(source, access="sequential", **options)
+
+    def _encode_with_vips(self, source, output_format):
+        """
+        Convert a path or buffer with libvips, returning encoded bytes.
+
+        Returns None without an error if libvips cannot read the source, so
+        the caller can fall back to Pillow; on failure last_stats.error is set.
+        """
+        timer = self.last_stats
+        timer.backend = "pyvips"
         try:
-            with Image.open(input_path) as img:
-                if output_format in ("JPEG", "BMP") and img.mode in ("RGBA", "LA", "P"):
-                    if img.mode == "RGBA":
-                        background = Image.new("RGB", img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])
-                        img = background
-                    else:
+            with timer.stage("decode"):
+                try:
+                    image = self._load(source)
+                except pyvips.Error:
+                    # Formate ohne libvips-Loader (z.B. BMP, ICO) liest Pillow
+                    return None
+
+            if output_format in self.VIPS_SAVERS:
+                return self.encode_image(image, output_format, timer)
+
+            with timer.stage("transform"):
+                if output_format == "BMP" and image.hasalpha():
+                    image = image.flatten(background=[255, 255, 255])
+                img = _vips_to_pil(image)
+            with timer.stage("encode"):
+                buffer = io.BytesIO()
+                img.save(buffer, format=output_format)
+            return buffer.getvalue()
+
+        except Exception as e:
+            print(f"pyvips conversion failed: {e}")
+            timer.error = str(e)
+            return None
+
+    def keeps_animation(self, source, output_format):
+        """
+        Return True if converting source would write an animation.
+
+        Only the header of source is read.
+
+        Args:
+            source: Input path or encoded bytes.
+            output_format: Target format (key of SUPPORTED_FORMATS).
+        """
+        if not self.keep_animation or output_format not in self.ANIMATED_FORMATS:
+            return False
+        try:
+            if isinstance(source, bytes):
+                image = pyvips.Image.new_from_buffer(source, "")
+            else:
+                image = pyvips.Image.new_from_file(source)
+        except pyvips.Error:
+            return False
+        return image.get_typeof("n-pages") != 0 and image.get("n-pages") > 1
+
+    def _encode_animation(self, source, output_format):
+        """
+        Convert an animated path or buffer with all of its frames.
+
+        Returns:
+            Encoded bytes, or None if source is not converted as an animation
+            or on failure (then last_stats.error is set).
+        """
+        if self.engine == "pil":
+            return self._encode_animation_with_pil(source, output_format)
+        if not self.keeps_animation(source, output_format):
+            return None
+
+        timer = self.last_stats
+        timer.backend = "pyvips"
+        try:
+            with timer.stage("decode"):
+                # n=-1 lädt alle Frames untereinander in ein hohes Bild
+                image = self._load(source, n=-1)
+            return self.encode_animation(image, output_format, timer)
+
+        except Exception as e:
+            print(f"Animation conversion failed: {e}")
+            timer.error = str(e)
+            return None
+
+    def encode_animation(self, image, output_format, timer=None):
+        """
+        Encode a multi-page pyvips image as an animation.
+
+        Frame delays and the loop count are taken from the "delay" and
+        "loop" metadata that the GIF and WebP loaders set. libvips writes
+        HEIF pages as separate stills, so AVIF animations are encoded by
+        Pillow's AVIF plugin instead. Auto quality is measured on the first
+        frame.
+
+        Args:
+            image: pyvips image loaded with n=-1.
+            output_format: Target format (key of ANIMATED_FORMATS).
+            timer: Optional StageTimer for the decode and encode stages.
+
+        Returns:
+            Encoded bytes.
+        """
+        lossy = output_format in self.LOSSY_FORMATS
+        if output_format == "AVIF":
+            with measure(timer, "decode"):
+                encode = self._encode_frames_with_pil(image)
+        else:
+            if lossy and (self.target_size or self.auto_quality):
+                with measure(timer, "decode"):
+                    # Einmal dekodieren, damit jeder Versuch nur noch kodiert
+                    image = image.copy_memory()
+            options = self._save_options(output_format)
+            if output_format == "WebP" and self.optimize:
+                options["min_size"] = True
+            save_buffer = getattr(image, self.VIPS_SAVERS[output_format] + "_buffer")
+
+            def encode(quality=None):
+                if quality is not None:
+                    return save_buffer(Q=quality, **options)
+                return save_buffer(**options)
+
+        with measure(timer, "encode"):
+            reference = encode_reference = None
+            if lossy and self.auto_quality:
+                first = image.crop(0, 0, image.width, page_height(image))
+                reference = analysis_image(first)
+                encode_reference = self._vips_encoder(reference, output_format)
+
+            quality, data = self._encode_lossy(encode, lossy, reference, encode_reference)
+        if timer is not None:
+            timer.quality = quality
+        return data
+
+    def _encode_frames_with_pil(self, image):
+        """Decode all pages and return an encode(quality=None) callable writing animated AVIF."""
+        frame_height = page_height(image)
+        if image.bands < 3:
+            image = image.colourspace("srgb")
+        canvas = _vips_to_pil(image)
+        frames = [
+            canvas.crop((0, top, image.width, top + frame_height))
+            for top in range(0, image.height, frame_height)
+        ]
+        delays = list(image.get("delay")) if image.get_typeof("delay") else [100] * len(frames)
+        loop = image.get("loop") if image.get_typeof("loop") else 0
+        return self._frames_encoder(frames, delays, loop, "AVIF")
+
+    def _frames_encoder(self, frames, delays, loop, output_format):
+        """Return an encode(quality=None) callable writing Pillow frames as an animation."""
+
+        def encode(quality=None):
+            save_kwargs = {
+                "format": output_format,
+                "save_all": True,
+                "append_images": frames[1:],
+                "duration": delays,
+                "loop": loop,
+            }
+            if quality is not None:
+                save_kwargs["quality"] = quality
+            buffer = io.BytesIO()
+            frames[0].save(buffer, **save_kwargs)
+            return buffer.getvalue()
+
+        return encode
+
+    def _encode_animation_with_pil(self, source, output_format):
+        """
+        Convert an animated path or buffer with Pillow, keeping all frames.
+
+        Used by the Pillow engine. All frames are held in memory; with
+        max_dimension they are shrunk one by one while they are read.
+
+        Returns:
+            Encoded bytes, or None if source is not converted as an animation
+            or on failure (then last_stats.error is set).
+        """
+        if not self.keep_animation or output_format not in self.ANIMATED_FORMATS:
+            return None
+
+        timer = self.last_stats
+        try:
+            if isinstance(source, bytes):
+                source = io.BytesIO(source)
+            with Image.open(source) as img:
+                if getattr(img, "n_frames", 1) < 2:
+                    return None
+                timer.backend = "pil"
+
+                frames = []
+                delays = []
+                with timer.stage("decode"):
+                    for frame in ImageSequence.Iterator(img):
+                        delays.append(frame.info.get("duration", 100))
+                        frame = frame.convert("RGBA")
+                        if self.max_dimension:
+                            frame.thumbnail((self.max_dimension, self.max_dimension))
+                        frames.append(frame)
+                loop = img.info.get("loop", 0)
+
+            encode = self._frames_encoder(frames, delays, loop, output_format)
+            lossy = output_format in self.LOSSY_FORMATS
+
+            def encode_reference(quality):
+                buffer = io.BytesIO()
+                reduced.save(buffer, format=output_format, quality=quality)
+                return buffer.getvalue()
+
+            with timer.stage("encode"):
+                reference = reduced = None
+                if lossy and self.auto_quality:
+                    # Qualität wie bei libvips am ersten Frame messen
+                    reduced = frames[0].copy()
+                    reduced.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+                    reference = pil_to_vips(reduced)
+
+                quality, data = self._encode_lossy(encode, lossy, reference, encode_reference)
+            timer.quality = quality
+            return data
+
+        except Exception as e:
+            print(f"Animation conversion failed: {e}")
+            timer.error = str(e)
+            return None
+
+    def _encode_with_pil(self, source, output_format):
+        """Convert a path or file object with Pillow, returning encoded bytes or None."""
+        timer = self.last_stats
+        timer.backend = "pil"
+        try:
+            with Image.open(source) as img:
+                with timer.stage("decode"):
+                    if self.max_dimension:
+                        # JPEG-Draft dekodiert direkt in reduzierter Größe
+                        img.draft(img.mode, (self.max_dimension, self.max_dimension))
+                    img.load()
+
+                with timer.stage("transform"):
+                    if self.max_dimension:
+                        img.thumbnail((self.max_dimension, self.max_dimension))
+
+                    if output_format in ("JPEG", "BMP") and img.mode in ("RGBA", "LA", "P"):
+                        if img.mode == "RGBA":
+                            background = Image.new("RGB", img.size, (255, 255, 255))
+                            background.paste(img, mask=img.split()[3])
+                            img = background
+                        else:
+                            img = img.convert("RGB")
+                    elif output_format == "JPEG" and img.mode != "RGB":
                         img = img.convert("RGB")
-                elif output_format == "JPEG" and img.mode != "RGB":
-                    img = img.convert("RGB")
 
                 save_kwargs = {
                     "format": output_format,
                 }
 
-                if output_format in ("JPEG", "WebP"):
-                    save_kwargs["quality"] = self.quality
-                    if self.optimize:
-                        save_kwargs["optimize"] = True
+                lossy = output_format in self.LOSSY_FORMATS
+                if lossy and self.optimize:
+                    save_kwargs["optimize"] = True
 
                 if output_format == "JPEG":
                     save_kwargs["progressive"] = False
 
-                img.save(output_path, **save_kwargs)
-                return output_path
+                def encode(quality=None, image=img):
+                    buffer = io.BytesIO()
+                    if quality is not None:
+                        image.save(buffer, quality=quality, **save_kwargs)
+                    else:
+                        image.save(buffer, **save_kwargs)
+                    return buffer.getvalue()
+
+                def encode_reference(quality):
+                    return encode(quality, reduced)
+
+                with timer.stage("encode"):
+                    reference = reduced = None
+                    if lossy and self.auto_quality:
+                        reduced = img.copy()
+                        reduced.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+                        reference = pil_to_vips(reduced)
+
+                    quality, data = self._encode_lossy(
+                        encode, lossy, reference, encode_reference
+                    )
+                timer.quality = quality
+                return data
 
         except Exception as e:
             print(f"Image conversion failed: {e}")
+            timer.error = str(e)
             return None
 
+    def save_image(self, image, output_path, output_format=None, timer=None):
+        """
+        Encode a pyvips image in the given format and write it.
+
+        Args:
+            image: pyvips image.
+            output_path: Destination path.
+            output_format: Target format or None to infer from extension.
+            timer: Optional StageTimer for the encode and write stages.
+        """
+        if output_format is None:
+            output_format = self.format_for_path(output_path)
+        write_bytes(output_path, self.encode_image(image, output_format, timer), timer)
+
+    def encode_image(self, image, output_format, timer=None):
+        """
+        Encode a pyvips image in the given format.
+
+        Args:
+            image: pyvips image.
+            output_format: Target format (key of VIPS_SAVERS).
+            timer: Optional StageTimer for the encode stage.
+
+        Returns:
+            Encoded bytes.
+        """
+        if output_format in ("JPEG", "BMP") and image.hasalpha():
+            image = image.flatten(background=[255, 255, 255])
+
+        options = self._save_options(output_format)
+
+        saver = self.VIPS_SAVERS.get(output_format)
+        if saver is None:
+            raise ValueError(f"libvips cannot write {output_format}")
+        save_buffer = getattr(image, saver + "_buffer")
+        lossy = output_format in self.LOSSY_FORMATS
+
+        if lossy and (self.target_size or self.auto_quality):
+            with measure(timer, "decode"):
+                # Einmal dekodieren, damit jeder Versuch nur noch kodiert
+                image = image.copy_memory()
+                save_buffer = getattr(image, saver + "_buffer")
+
+        def encode(quality=None):
+            if quality is not None:
+                return save_buffer(Q=quality, **options)
+            return save_buffer(**options)
+
+        with measure(timer, "encode"):
+            reference = encode_reference = None
+            if lossy and self.auto_quality:
+                reference = analysis_image(image)
+                encode_reference = self._vips_encoder(reference, output_format)
+
+            quality, data = self._encode_lossy(encode, lossy, reference, encode_reference)
+        if timer is not None:
+            timer.quality = quality
+        return data
+
+    def _save_options(self, output_format):
+        """Return the libvips save options for output_format."""
+        options = {}
+        if output_format == "JPEG" and self.optimize:
+            options["optimize_coding"] = True
+        if output_format == "AVIF":
+            options["compression"] = "av1"
+            # Entspricht Pillows Standard (speed 6); effort 4 ist ein Vielfaches langsamer
+            options["effort"] = 3
+        return options
+
+    def _vips_encoder(self, image, output_format):
+        """Return a callable(quality) encoding image with libvips."""
+        save_buffer = getattr(image, self.VIPS_SAVERS[output_format] + "_buffer")
+        options = self._save_options(output_format)
+
+        def encode(quality):
+            return save_buffer(Q=quality, **options)
+
+        return encode
+
+    def _encode_lossy(self, encode, lossy, reference=None, encode_reference=None):
+        """
+        Encode at the configured, perceptual or target-size quality.
+
+        Args:
+            encode: Callable(quality=None) returning the encoded bytes.
+            lossy: Whether the format takes a quality setting.
+            reference: Reduced pyvips image for auto quality, if enabled.
+            encode_reference: Callable(quality) encoding reference in memory.
+
+        Returns:
+            Tuple of (quality or None, encoded bytes).
+        """
+        if not lossy:
+            self.last_quality = None
+            return None, encode()
+
+        quality = self.quality
+        if reference is not None:
+            quality, self.last_ssim = choose_quality(
+                reference, encode_reference, self.ssim_threshold, workers=self.workers
+            )
+        if self.target_size:
+            quality, data = search_quality(
+                encode,
+                self.target_size,
+                quality,
+                self.target_tolerance,
+                self.max_iterations,
+            )
+        else:
+            data = encode(quality)
+        self.last_quality = quality
+        return quality, data
+
+    def format_for_path(self, output_path):
+        """Infer the target format from a file extension (PNG if unknown)."""
+        ext = os.path.splitext(output_path)[1].lower().lstrip(".")
+        for fmt, exts in self.SUPPORTED_FORMATS.items():
+            if ext in exts:
+                return fmt
+        return "PNG"  # Standard
+
     def get_supported_formats(self):
         """Return the supported formats."""
         return list(self.SUPPORTED_FORMATS.keys())
@@ -91,3 +588,58 @@ class ImageConverter:
         """Toggle encoder optimizations."""
         self.optimize = bool(optimize)
 
+    def set_target_size(self, target_size, tolerance=None, max_iterations=None):
+        """
+        Aim for a maximum file size for JPEG and WebP output.
+
+        The configured quality becomes the upper bound of the search; the
+        chosen quality is available as last_quality afterwards.
+
+        Args:
+            target_size: Maximum size in bytes, or None to disable.
+            tolerance: Accept results this fraction below the target (e.g. 0.05).
+            max_iterations: Maximum number of trial encodes.
+        """
+        self.target_size = max(1, int(target_size)) if target_size else None
+        if tolerance is not None:
+            self.target_tolerance = max(0.0, min(1.0, float(tolerance)))
+        if max_iterations is not None:
+            self.max_iterations = max(1, int(max_iterations))
+
+    def set_auto_quality(self, auto_quality, threshold=None):
+        """
+        Pick the JPEG/WebP quality per image from a perceptual (SSIM) threshold.
+
+        The chosen quality replaces the configured one and is available as
+        last_quality (with its score as last_ssim). Combined with a target
+        size, it becomes the upper bound of the size search.
+
+        Args:
+            auto_quality: Enable or disable auto quality.
+            threshold: Minimum mean SSIM (e.g. 0.98).
+        """
+        self.auto_quality = bool(auto_quality)
+        if threshold is not None:
+            self.ssim_threshold = max(0.0, min(1.0, float(threshold)))
+
+    def set_workers(self, workers):
+        """Set the number of threads scoring auto-quality candidates (None = one per CPU)."""
+        self.workers = None if workers is None else max(1, int(workers))
+
+    def set_keep_animation(self, keep):
+        """Toggle whether animated sources stay animated in GIF, WebP and AVIF output."""
+        self.keep_animation = bool(keep)
+
+    def set_engine(self, engine):
+        """Set the conversion engine ("pyvips" or "pil"); it also encodes animations."""
+        if engine in self.ENGINES:
+            self.engine = engine
+
+    def set_max_dimension(self, max_dimension):
+        """
+        Limit the longest side of converted images (shrink-on-load).
+
+        Args:
+            max_dimension: Maximum width and height in pixels, or None to keep the size.
+        """
+        self.max_dimension = max(1, int(max_dimension)) if max_dimension else None
@@ -48,12 +48,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "Grayscale:": "Graustufen:",
         "Keep EXIF metadata:": "EXIF-Metadaten behalten:",
         "Compression level:": "Kompressionsstufe:",
+        "Try multiple strategies:": "Mehrere Strategien probieren:",
         "Reduce color palette:": "Farbreduzierung:",
         "Keep alpha channel:": "Alpha-Kanal behalten:",
         "Interlaced:": "Interlaced:",
         "Number of colors:": "Anzahl Farben:",
         "Dithering:": "Dithering:",
         "Preserve animation:": "Animation beibehalten:",
+        "Store only changed pixels:": "Nur geänderte Pixel speichern:",
+        "One palette for all frames:": "Eine Palette für alle Frames:",
         "Interpolation filter:": "Interpolationsfilter:",
         "New size:": "Neue Größe:",
         "Width": "Breite",
@@ -120,12 +123,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "Grayscale:": "Escala de grises:",
         "Keep EXIF metadata:": "Mantener metadatos EXIF:",
         "Compression level:": "Nivel de compresión:",
+        "Try multiple strategies:": "Probar varias estrategias:",
         "Reduce color palette:": "Reducir paleta de colores:",
         "Keep alpha channel:": "Mantener canal alfa:",
         "Interlaced:": "Entrelazado:",
         "Number of colors:": "Número de colores:",
         "Dithering:": "Tramado:",
         "Preserve animation:": "Conservar animación:",
+        "Store only changed pixels:": "Guardar solo los píxeles modificados:",
+        "One palette for all frames:": "Una paleta para todos los fotogramas:",
         "Interpolation filter:": "Filtro de interpolación:",
         "New size:": "Nuevo tamaño:",
         "Width": "Ancho",
@@ -192,12 +198,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "Grayscale:": "Niveaux de gris :",
         "Keep EXIF metadata:": "Conserver les métadonnées EXIF :",
         "Compression level:": "Niveau de compression :",
+        "Try multiple strategies:": "Essayer plusieurs stratégies :",
         "Reduce color palette:": "Réduire la palette de couleurs :",
         "Keep alpha channel:": "Conserver le canal alpha :",
         "Interlaced:": "Entrelacé :",
         "Number of colors:": "Nombre de couleurs :",
         "Dithering:": "Tramage :",
         "Preserve animation:": "Conserver l’animation :",
+        "Store only changed pixels:": "N’enregistrer que les pixels modifiés :",
+        "One palette for all frames:": "Une palette pour toutes les images :",
         "Interpolation filter:": "Filtre d’interpolation :",
         "New size:": "Nouvelle taille :",
         "Width": "Largeur",
@@ -264,12 +273,15 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "Grayscale:": "Відтінки сірого:",
         "Keep EXIF metadata:": "Зберігати EXIF дані:",
         "Compression level:": "Рівень стиснення:",
+        "Try multiple strategies:": "Спробувати кілька стратегій:",
         "Reduce color palette:": "Зменшити палітру:",
         "Keep alpha channel:": "Зберегти альфа-канал:",
         "Interlaced:": "Черезрядкове:",
         "Number of colors:": "Кількість кольорів:",
         "Dithering:": "Дізеринг:",
         "Preserve animation:": "Зберегти анімацію:",
+        "Store only changed pixels:": "Зберігати лише змінені пікселі:",
+        "One palette for all frames:": "Одна палітра для всіх кадрів:",
         "Interpolation filter:": "Фільтр інтерполяції:",
         "New size:": "Новий розмір:",
         "Width": "Ширина",
@@ -7,10 +7,40 @@ import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("GdkPixbuf", "2.0")
 
-from gi.repository import Gdk, GdkPixbuf, Gtk
+from gi.repository import Gdk, GdkPixbuf, GLib, Gtk
 from PIL import Image
 import io
 
+# Modes whose alpha channel survives the conversion to RGBA
+ALPHA_MODES = ("RGBA", "LA", "PA", "RGBa")
+
+
+def pixbuf_from_pil(image):
+    """
+    Wrap the decoded pixels of a Pillow image in a pixbuf.
+
+    The pixels are handed to GdkPixbuf as raw RGB or RGBA rows instead of
+    being re-encoded and decoded as PNG. Transparency is kept.
+
+    Args:
+        image: Pillow image.
+
+    Returns:
+        GdkPixbuf.Pixbuf of the first frame.
+    """
+    has_alpha = image.mode in ALPHA_MODES or "transparency" in image.info
+    mode = "RGBA" if has_alpha else "RGB"
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    width, height = image.size
+    # Zeilen liegen dicht hintereinander, Zeilenlänge = Breite * Kanäle;
+    # new_take übernimmt den Puffer von tobytes(), statt ihn wie new zu duplizieren
+    pixels = GLib.Bytes.new_take(image.tobytes())
+    return GdkPixbuf.Pixbuf.new_from_bytes(
+        pixels, GdkPixbuf.Colorspace.RGB, has_alpha, 8, width, height, width * len(mode)
+    )
+
 
 class ImageViewer(Gtk.ScrolledWindow):
     """Widget that displays images and supports zooming."""
@@ -46,27 +76,25 @@ class ImageViewer(Gtk.ScrolledWindow):
         """Load an image from disk."""
         if not filepath:
             return False
-
-        try:
-            pil_image = Image.open(filepath)
+        if self._load(filepath):
             self.current_image_path = filepath
+            return True
+        return False
 
-            if pil_image.mode != "RGB":
-                if pil_image.mode == "RGBA":
-                    background = Image.new("RGB", pil_image.size, (255, 255, 255))
-                    background.paste(pil_image, mask=pil_image.split()[3])
-                    pil_image = background
-                else:
-                    pil_image = pil_image.convert("RGB")
-
-            img_bytes = io.BytesIO()
-            pil_image.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
+    def load_bytes(self, data):
+        """Load an encoded image held in memory."""
+        if not data:
+            return False
+        if self._load(io.BytesIO(data)):
+            self.current_image_path = None
+            return True
+        return False
 
-            loader = GdkPixbuf.PixbufLoader.new_with_type("png")
-            loader.write(img_bytes.getvalue())
-            loader.close()
-            self.original_pixbuf = loader.get_pixbuf()
+    def _load(self, source):
+        """Decode a path or file object into the displayed pixbuf."""
+        try:
+            with Image.open(source) as pil_image:
+                self.original_pixbuf = pixbuf_from_pil(pil_image)
 
             self.current_zoom = 1.0
             self.update_display()
@@ -82,6 +110,11 @@ class ImageViewer(Gtk.ScrolledWindow):
         if not self.original_pixbuf:
             return
 
+        # Bei 100% keine skalierte Kopie des ganzen Bildes anlegen
+        if self.current_zoom == 1.0:
+            self.picture.set_pixbuf(self.original_pixbuf)
+            return
+
         width = int(self.original_pixbuf.get_width() * self.current_zoom)
         height = int(self.original_pixbuf.get_height() * self.current_zoom)
 
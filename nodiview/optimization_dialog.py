@@ -5,8 +5,6 @@ Optimization dialog with preview and conversion tools.
 from __future__ import annotations
 
 import os
-import shutil
-import tempfile
 
 import gi
 
@@ -21,6 +19,7 @@ from .i18n import _
 from .image_viewer import ImageViewer
 from .optimizer.gif_optimizer import GIFOptimizer
 from .optimizer.jpeg_optimizer import JPEGOptimizer
+from .optimizer.pipeline import ImagePipeline
 from .optimizer.png_optimizer import PNGOptimizer
 from .optimizer.resize import ImageResizer
 
@@ -32,6 +31,14 @@ FORMAT_CHOICES = [
     ("tiff", "TIFF"),
 ]
 
+EXTENSION_MAP = {
+    "jpeg": ".jpg",
+    "png": ".png",
+    "gif": ".gif",
+    "webp": ".webp",
+    "tiff": ".tiff",
+}
+
 
 class OptimizationDialog(Adw.Window):
     """Dialog window for optimization, resizing, and conversion."""
@@ -42,8 +49,8 @@ class OptimizationDialog(Adw.Window):
         self.set_resizable(True)
 
         self.image_path = image_path
-        self.preview_path = None
-        self.temp_dir = tempfile.mkdtemp()
+        # Die Vorschau bleibt im Speicher, es werden keine temporären Dateien geschrieben
+        self.preview_data = None
 
         # Create toolbar view with header bar for window controls
         toolbar_view = Adw.ToolbarView()
@@ -441,7 +448,7 @@ class OptimizationDialog(Adw.Window):
 
     def on_fullscreen_preview_btn(self, button):
         """Show preview in fullscreen."""
-        if not self.preview_path or not os.path.exists(self.preview_path):
+        if not self.preview_data:
             return
 
         dialog = Adw.Window(transient_for=self, modal=True, title=_("Preview - Fullscreen"))
@@ -459,7 +466,7 @@ class OptimizationDialog(Adw.Window):
         scrolled.set_vexpand(True)
         scrolled.set_hexpand(True)
         viewer = ImageViewer()
-        viewer.load_image(self.preview_path)
+        viewer.load_bytes(self.preview_data)
         scrolled.set_child(viewer)
         box.append(scrolled)
 
@@ -648,9 +655,9 @@ class OptimizationDialog(Adw.Window):
             child = self.preview_info.get_first_child()
             self.preview_info.remove(child)
 
-        if self.preview_path and os.path.exists(self.preview_path):
-            filename = os.path.basename(self.preview_path)
-            preview_size = os.path.getsize(self.preview_path)
+        if self.preview_data:
+            filename = self._preview_name()
+            preview_size = len(self.preview_data)
             original_size = os.path.getsize(self.image_path)
 
             name_label = Gtk.Label(label=_("File: {}").format(filename))
@@ -781,6 +788,7 @@ class OptimizationDialog(Adw.Window):
             page, _("Keep alpha channel:"), default=True
         )
         self.png_interlaced_switch = self._toggle_row(page, _("Interlaced:"))
+        self.png_trials_switch = self._toggle_row(page, _("Try multiple strategies:"))
 
         return page
 
@@ -816,6 +824,12 @@ class OptimizationDialog(Adw.Window):
         self.gif_keep_animation_switch = self._toggle_row(
             page, _("Preserve animation:"), default=True
         )
+        self.gif_delta_switch = self._toggle_row(
+            page, _("Store only changed pixels:"), default=True
+        )
+        self.gif_global_palette_switch = self._toggle_row(
+            page, _("One palette for all frames:"), default=False
+        )
 
         return page
 
@@ -887,11 +901,11 @@ class OptimizationDialog(Adw.Window):
 
         return {}
 
-    def _apply_resize(self, input_path):
-        """Apply resize to the image."""
+    def _apply_resize(self, pipeline):
+        """Add the resize stage to the pipeline."""
         resize_params = self._determine_resize()
         if not resize_params:
-            return input_path
+            return pipeline
 
         # Get maintain_aspect from params and remove it
         maintain_aspect = resize_params.pop("maintain_aspect", True)
@@ -900,27 +914,17 @@ class OptimizationDialog(Adw.Window):
         resizer.set_filter(self.resize_filter_combo.get_active_id())
         resizer.set_maintain_aspect_ratio(maintain_aspect)
 
-        # Determine output extension (keep original extension for resize)
-        resized_path = os.path.join(self.temp_dir, "resized" + os.path.splitext(input_path)[1])
-        result = resizer.resize(input_path, resized_path, **resize_params)
+        return pipeline.resize(resizer, **resize_params)
 
-        if result and os.path.exists(resized_path):
-            return resized_path
-        return input_path
-
-    def _optimize_by_format(self, source_path, format_code):
-        """Optimize image based on selected format."""
-        extension_map = {
-            "jpeg": ".jpg",
-            "png": ".png",
-            "gif": ".gif",
-            "webp": ".webp",
-            "tiff": ".tiff",
-        }
-        extension = extension_map.get(format_code, ".jpg")
-        preview_file = os.path.join(self.temp_dir, "preview" + extension)
+    def _preview_name(self):
+        """Return the default file name of the optimized image."""
+        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
+        ext = EXTENSION_MAP.get(self.current_format, ".jpg")
+        return f"{base_name}_optimized{ext}"
 
-        # Resize is already applied before calling this function
+    def _optimize_by_format(self, pipeline, source_data, format_code):
+        """Optimize image based on selected format and return the encoded bytes."""
+        # Resize runs in the same pipeline, so the source is decoded only once
 
         try:
             if format_code == "jpeg":
@@ -930,51 +934,49 @@ class OptimizationDialog(Adw.Window):
                 optimizer.set_progressive(self.progressive_switch.get_active())
                 optimizer.set_grayscale(self.grayscale_switch.get_active())
                 optimizer.set_keep_exif(self.keep_exif_switch.get_active())
-                result = optimizer.optimize(source_path, preview_file)
+                result, _stats = pipeline.optimize(optimizer).run_bytes(source_data)
                 if not result:
                     # Fallback: use converter
                     converter = ImageConverter()
                     converter.set_quality(int(self.quality_scale.get_value()))
-                    converter.convert(source_path, preview_file, "JPEG")
+                    result, _stats = pipeline.convert(converter, "JPEG").run_bytes(source_data)
             elif format_code == "png":
                 optimizer = PNGOptimizer()
                 optimizer.set_compression_level(int(self.png_compression_scale.get_value()))
                 optimizer.set_reduce_palette(self.png_reduce_palette_switch.get_active())
                 optimizer.set_keep_alpha(self.png_keep_alpha_switch.get_active())
                 optimizer.set_interlaced(self.png_interlaced_switch.get_active())
-                result = optimizer.optimize(source_path, preview_file)
+                if self.png_trials_switch.get_active():
+                    optimizer.set_effort(2)
+                result, _stats = pipeline.optimize(optimizer).run_bytes(source_data)
                 if not result:
                     # Fallback: use converter
                     converter = ImageConverter()
-                    converter.convert(source_path, preview_file, "PNG")
+                    result, _stats = pipeline.convert(converter, "PNG").run_bytes(source_data)
             elif format_code == "gif":
                 optimizer = GIFOptimizer()
                 optimizer.set_reduce_palette(self.gif_reduce_palette_switch.get_active())
                 optimizer.set_palette_colors(int(self.gif_colors_scale.get_value()))
                 optimizer.set_dither(self.gif_dither_switch.get_active())
                 optimizer.set_keep_animation(self.gif_keep_animation_switch.get_active())
-                result = optimizer.optimize(source_path, preview_file)
+                optimizer.set_delta_frames(self.gif_delta_switch.get_active())
+                optimizer.set_global_palette(self.gif_global_palette_switch.get_active())
+                result, _stats = pipeline.optimize(optimizer).run_bytes(source_data)
                 if not result:
                     # Fallback: use converter
                     converter = ImageConverter()
-                    converter.convert(source_path, preview_file, "GIF")
+                    result, _stats = pipeline.convert(converter, "GIF").run_bytes(source_data)
             else:
                 # Convert to other formats (WebP, TIFF, etc.)
                 converter = ImageConverter()
-                format_name = format_code.upper()
-                if format_name == "JPEG":
-                    format_name = "JPEG"
+                format_name = dict(FORMAT_CHOICES).get(format_code, format_code.upper())
                 converter.set_quality(85)  # Default quality for lossy formats
-                result = converter.convert(source_path, preview_file, format_name)
+                result, _stats = pipeline.convert(converter, format_name).run_bytes(source_data)
                 if not result:
                     print(f"Failed to convert to {format_name}")
+                    return None
 
-            # Verify file was created
-            if not os.path.exists(preview_file):
-                print(f"Preview file was not created: {preview_file}")
-                return None
-
-            return preview_file
+            return result
         except Exception as e:
             print(f"Error optimizing image: {e}")
             import traceback
@@ -983,23 +985,21 @@ class OptimizationDialog(Adw.Window):
 
     def process_image(self):
         """Process the image with current settings."""
-        # Apply resize first, then optimize/convert
-        resized_path = self._apply_resize(self.image_path)
-        return self._optimize_by_format(resized_path, self.current_format)
+        # Resize and optimize/convert in a single decode/encode pass
+        pipeline = self._apply_resize(ImagePipeline())
+        with open(self.image_path, "rb") as handle:
+            source_data = handle.read()
+        return self._optimize_by_format(pipeline, source_data, self.current_format)
 
     def on_preview_clicked(self, _button):
         """Generate a preview image."""
         try:
-            self.preview_path = self.process_image()
-            if self.preview_path and os.path.exists(self.preview_path):
-                # Verify file is not empty
-                if os.path.getsize(self.preview_path) > 0:
-                    self.preview_viewer.load_image(self.preview_path)
-                    self._update_preview_info()
-                else:
-                    print(f"Preview file is empty: {self.preview_path}")
+            self.preview_data = self.process_image()
+            if self.preview_data:
+                self.preview_viewer.load_bytes(self.preview_data)
+                self._update_preview_info()
             else:
-                print(f"Preview generation failed or file not found: {self.preview_path}")
+                print("Preview generation failed")
         except Exception as e:
             print(f"Error generating preview: {e}")
             import traceback
@@ -1008,16 +1008,7 @@ class OptimizationDialog(Adw.Window):
     def on_save_clicked(self, _button):
         """Save the optimized image."""
         dialog = Gtk.FileDialog(modal=True, title=_("Save"))
-        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
-        extension_map = {
-            "jpeg": ".jpg",
-            "png": ".png",
-            "gif": ".gif",
-            "webp": ".webp",
-            "tiff": ".tiff",
-        }
-        ext = extension_map.get(self.current_format, ".jpg")
-        dialog.set_initial_name(f"{base_name}_optimized{ext}")
+        dialog.set_initial_name(self._preview_name())
         dialog.save(self, None, self.on_save_dialog_response)
 
     def on_save_dialog_response(self, dialog, result):
@@ -1028,14 +1019,9 @@ class OptimizationDialog(Adw.Window):
                 return
             output_path = file.get_path()
             self.on_preview_clicked(None)
-            if self.preview_path and os.path.exists(self.preview_path):
-                shutil.copy2(self.preview_path, output_path)
+            if self.preview_data:
+                with open(output_path, "wb") as handle:
+                    handle.write(self.preview_data)
                 self.close()
-        except GLib.Error as exc:
+        except (GLib.Error, OSError) as exc:
             print(f"Save failed: {exc}")
-
-    def close(self):
-        """Clean up temporary files."""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-        super().close()
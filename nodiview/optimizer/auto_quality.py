@@ -0,0 +1,121 @@
+"""
+Perceptual auto-quality selection based on SSIM.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pyvips
+
+# Longest side of the image the candidates are encoded and compared at
+ANALYSIS_SIZE = 1024
+
+# Qualities tried in parallel, lowest first
+CANDIDATE_QUALITIES = tuple(range(30, 100, 5))
+
+# Mean SSIM a candidate must reach to be accepted
+DEFAULT_THRESHOLD = 0.98
+
+# SSIM stabilisation constants for 8-bit data
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _luminance(image):
+    """Return the luminance of a pyvips image as a float image."""
+    if image.hasalpha():
+        image = image.flatten(background=[255] * (image.bands - 1))
+    if image.bands >= 3:
+        image = image.colourspace("b-w")
+    return image[0].cast("float")
+
+
+def ssim(reference, candidate):
+    """
+    Compute the mean structural similarity of two equally sized images.
+
+    Everything is evaluated as libvips image operations (Gaussian windows,
+    sigma 1.5) on the luminance channel.
+
+    Args:
+        reference: Original pyvips image.
+        candidate: Decoded pyvips image to compare.
+
+    Returns:
+        Mean SSIM between -1.0 and 1.0 (1.0 means identical).
+    """
+    x = _luminance(reference)
+    y = _luminance(candidate)
+
+    def blur(image):
+        return image.gaussblur(1.5, precision="float")
+
+    mu_x = blur(x)
+    mu_y = blur(y)
+    mu_xx = mu_x * mu_x
+    mu_yy = mu_y * mu_y
+    mu_xy = mu_x * mu_y
+    sigma_xx = blur(x * x) - mu_xx
+    sigma_yy = blur(y * y) - mu_yy
+    sigma_xy = blur(x * y) - mu_xy
+
+    ssim_map = ((mu_xy * 2 + _C1) * (sigma_xy * 2 + _C2)) / (
+        (mu_xx + mu_yy + _C1) * (sigma_xx + sigma_yy + _C2)
+    )
+    return ssim_map.avg()
+
+
+def analysis_image(image, size=ANALYSIS_SIZE):
+    """Return an in-memory copy of a pyvips image reduced to size on its longest side."""
+    scale = size / max(image.width, image.height)
+    if scale < 1:
+        image = image.resize(scale, kernel="lanczos3")
+    return image.copy_memory()
+
+
+def pil_to_vips(img):
+    """Wrap an 8-bit Pillow image as a pyvips image."""
+    if img.mode not in ("L", "LA", "RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    return pyvips.Image.new_from_memory(
+        img.tobytes(), img.width, img.height, len(img.getbands()), "uchar"
+    )
+
+
+def choose_quality(
+    reference, encode, threshold=DEFAULT_THRESHOLD, qualities=CANDIDATE_QUALITIES, workers=None
+):
+    """
+    Pick the lowest quality whose encode stays above an SSIM threshold.
+
+    All candidates are encoded in memory and scored concurrently; libvips
+    releases the GIL, so threads run in parallel.
+
+    Args:
+        reference: Reduced pyvips image (see analysis_image) to encode and compare.
+        encode: Callable(quality) returning reference encoded at that quality.
+        threshold: Minimum mean SSIM.
+        qualities: Candidate qualities.
+        workers: Number of threads (defaults to the CPU count).
+
+    Returns:
+        Tuple of (quality, SSIM score). If no candidate reaches the
+        threshold, the highest quality is returned.
+    """
+    qualities = sorted(set(qualities))
+
+    def score(quality):
+        decoded = pyvips.Image.new_from_buffer(encode(quality), "")
+        return ssim(reference, decoded)
+
+    workers = workers or min(len(qualities), os.cpu_count() or 1)
+    if workers <= 1:
+        scores = [score(quality) for quality in qualities]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            scores = list(executor.map(score, qualities))
+
+    for quality, value in zip(qualities, scores):
+        if value >= threshold:
+            return quality, value
+    return qualities[-1], scores[-1]
@@ -0,0 +1,262 @@
+"""
+Frame-level GIF helpers: inter-frame deltas and an incremental writer.
+"""
+
+from PIL import GifImagePlugin, Image, ImageChops
+
+# GIF disposal methods
+DISPOSE_NONE = 1  # Frame bleibt stehen, der nächste zeichnet darüber
+DISPOSE_BACKGROUND = 2  # Frame-Rechteck wird vor dem nächsten gelöscht
+
+DITHER_METHODS = ("floyd-steinberg", "ordered")
+
+# Frames sampled for the histogram of a global palette
+PALETTE_SAMPLE_FRAMES = 16
+
+# Longest side of a sampled frame; nearest-neighbour reduction keeps the original colours
+PALETTE_SAMPLE_SIZE = 512
+
+# 4x4 Bayer matrix and the range of its offsets for ordered dithering
+_BAYER = (0, 8, 2, 10, 12, 4, 14, 6, 3, 11, 1, 9, 15, 7, 13, 5)
+_ORDERED_SPREAD = 32
+
+
+def _binary(mask):
+    """Turn every non-zero value of an L image into 255."""
+    return mask.point(lambda value: 255 if value else 0)
+
+
+def visible_mask(frame):
+    """Return an L mask of the pixels a GIF would draw (alpha >= 128)."""
+    return frame.getchannel("A").point(lambda value: 255 if value >= 128 else 0)
+
+
+def changed_mask(previous, current):
+    """
+    Return an L mask of the pixels that differ between two RGBA frames.
+
+    Fully transparent pixels count as equal whatever their colour is.
+    """
+    previous_visible = visible_mask(previous)
+    current_visible = visible_mask(current)
+    difference = ImageChops.difference(previous.convert("RGB"), current.convert("RGB"))
+    red, green, blue = difference.split()
+    changed = _binary(ImageChops.lighter(ImageChops.lighter(red, green), blue))
+    # Farbunterschiede zählen nur dort, wo beide Frames sichtbar sind
+    changed = ImageChops.multiply(changed, ImageChops.multiply(previous_visible, current_visible))
+    return ImageChops.lighter(changed, ImageChops.difference(previous_visible, current_visible))
+
+
+def cleared_box(previous, current):
+    """Return the bounding box of pixels visible in previous but transparent in current."""
+    current_hidden = ImageChops.invert(visible_mask(current))
+    return ImageChops.multiply(visible_mask(previous), current_hidden).getbbox()
+
+
+def redraw_mask(frame, box):
+    """Return a full-size L mask of the visible pixels of frame inside box."""
+    mask = Image.new("L", frame.size, 0)
+    mask.paste(visible_mask(frame).crop(box), box[:2])
+    return mask
+
+
+def union_box(first, second):
+    """Return the smallest box containing two (left, upper, right, lower) boxes."""
+    return (
+        min(first[0], second[0]),
+        min(first[1], second[1]),
+        max(first[2], second[2]),
+        max(first[3], second[3]),
+    )
+
+
+def quantize_frame(frame, colors=256, draw_mask=None, adaptive=True, dither=True):
+    """
+    Convert an RGBA frame to a palette image with an optional transparent index.
+
+    Args:
+        frame: RGBA image.
+        colors: Maximum palette size including the transparent entry.
+        draw_mask: Optional L mask; pixels outside it become transparent.
+        adaptive: Compute an adaptive palette (otherwise the web palette).
+        dither: Use Floyd-Steinberg dithering.
+
+    Returns:
+        Tuple of (P image, transparency index or None).
+    """
+    visible = visible_mask(frame)
+    if draw_mask is not None:
+        visible = ImageChops.multiply(visible, draw_mask)
+    has_transparency = visible.getextrema()[0] == 0
+    if has_transparency:
+        colors -= 1
+
+    rgb = frame.convert("RGB")
+    dither_mode = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+    if adaptive:
+        paletted = rgb.quantize(colors, dither=dither_mode)
+    else:
+        paletted = rgb.convert("P", palette=Image.Palette.WEB, dither=dither_mode)
+
+    if not has_transparency:
+        return paletted, None
+
+    # Erster freier Palettenplatz hinter den genutzten Farben wird transparent
+    used = paletted.getextrema()[1] + 1
+    palette = paletted.getpalette()[: used * 3]
+    palette += [0] * (used * 3 - len(palette)) + [0, 0, 0]
+    paletted.putpalette(palette)
+    paletted.paste(used, mask=ImageChops.invert(visible))
+    return paletted, used
+
+
+def build_global_palette(img, colors=256, samples=PALETTE_SAMPLE_FRAMES):
+    """
+    Compute one palette for all frames of an animation.
+
+    Evenly spaced frames are reduced, stacked into one image and quantized
+    with median cut, so the colour histogram is built by Pillow in C.
+
+    Args:
+        img: Opened animated Pillow image (left at an arbitrary frame).
+        colors: Palette size including the entry reserved for transparency.
+        samples: Maximum number of frames to sample.
+
+    Returns:
+        1x1 P image carrying the palette (at most colors - 1 entries).
+    """
+    count = getattr(img, "n_frames", 1)
+    samples = max(1, min(samples, count))
+    indices = sorted({round(i * (count - 1) / max(1, samples - 1)) for i in range(samples)})
+
+    tiles = []
+    for index in indices:
+        img.seek(index)
+        tile = img.convert("RGB")
+        tile.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE), Image.Resampling.NEAREST)
+        tiles.append(tile)
+
+    mosaic = Image.new("RGB", (tiles[0].width, tiles[0].height * len(tiles)))
+    for row, tile in enumerate(tiles):
+        mosaic.paste(tile, (0, row * tiles[0].height))
+
+    quantized = mosaic.quantize(
+        colors - 1, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE
+    )
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(quantized.getpalette())
+    return palette
+
+
+def _ordered_pattern(size, origin=(0, 0)):
+    """Return an L image tiling the Bayer offsets, aligned to the canvas origin."""
+    pattern = Image.new("L", (4, 4))
+    pattern.putdata([value * _ORDERED_SPREAD // 16 for value in _BAYER])
+    width, height = size[0] + 4, size[1] + 4
+    # Kachel verdoppeln statt sie pixelweise einzufügen
+    while pattern.width < width:
+        wider = Image.new("L", (pattern.width * 2, pattern.height))
+        wider.paste(pattern, (0, 0))
+        wider.paste(pattern, (pattern.width, 0))
+        pattern = wider
+    while pattern.height < height:
+        taller = Image.new("L", (pattern.width, pattern.height * 2))
+        taller.paste(pattern, (0, 0))
+        taller.paste(pattern, (0, pattern.height))
+        pattern = taller
+    left, top = origin[0] % 4, origin[1] % 4
+    return pattern.crop((left, top, left + size[0], top + size[1]))
+
+
+def map_frame(frame, palette, draw_mask=None, dither="floyd-steinberg", origin=(0, 0)):
+    """
+    Map an RGBA frame onto a fixed palette.
+
+    The entry after the palette colours is used for transparent pixels, so
+    every mapped frame carries the same palette. Runs in worker processes.
+
+    Args:
+        frame: RGBA image.
+        palette: P image from build_global_palette.
+        draw_mask: Optional L mask; pixels outside it become transparent.
+        dither: "floyd-steinberg", "ordered" or None.
+        origin: Position of frame on the canvas (keeps ordered dithering stable).
+
+    Returns:
+        Tuple of (P image, transparency index or None).
+    """
+    visible = visible_mask(frame)
+    if draw_mask is not None:
+        visible = ImageChops.multiply(visible, draw_mask)
+
+    rgb = frame.convert("RGB")
+    dither_mode = Image.Dither.NONE
+    if dither == "ordered":
+        pattern = _ordered_pattern(frame.size, origin)
+        rgb = ImageChops.add(
+            rgb, Image.merge("RGB", (pattern,) * 3), offset=-_ORDERED_SPREAD // 2
+        )
+    elif dither:
+        dither_mode = Image.Dither.FLOYDSTEINBERG
+
+    paletted = rgb.quantize(palette=palette, dither=dither_mode)
+    entries = palette.getpalette()
+    transparency = len(entries) // 3
+    paletted.putpalette(entries + [0, 0, 0])
+
+    if visible.getextrema()[0] != 0:
+        return paletted, None
+    paletted.paste(transparency, mask=ImageChops.invert(visible))
+    return paletted, transparency
+
+
+class GIFFrameWriter:
+    """Write GIF frames one at a time to a binary file object."""
+
+    def __init__(self, handle, loop=0):
+        """
+        Args:
+            handle: Writable binary file object.
+            loop: Loop count (0 = forever) or None for no loop extension.
+        """
+        self.handle = handle
+        self.loop = loop
+        self.frames = 0
+        self.palette = None
+
+    def add_frame(self, frame, offset=(0, 0), duration=100, disposal=DISPOSE_NONE,
+                  transparency=None):
+        """
+        Append a palette frame.
+
+        The first frame defines the canvas size and the global palette, so
+        it must cover the whole canvas. Later frames carry a local palette
+        unless theirs matches the global one.
+
+        Args:
+            frame: P image.
+            offset: Position of the frame on the canvas.
+            duration: Display time in milliseconds.
+            disposal: What happens to the frame before the next one is drawn.
+            transparency: Palette index drawn as transparent, or None.
+        """
+        if self.frames == 0:
+            frame.info["version"] = b"89a"
+            info = {"loop": self.loop} if self.loop is not None else {}
+            header, _used = GifImagePlugin.getheader(frame, info=info)
+            for chunk in header:
+                self.handle.write(chunk)
+            self.palette = frame.getpalette()
+
+        params = {"duration": duration, "disposal": disposal}
+        if transparency is not None:
+            params["transparency"] = transparency
+        if self.frames and frame.getpalette() != self.palette:
+            params["include_color_table"] = True
+        for chunk in GifImagePlugin.getdata(frame, offset, **params):
+            self.handle.write(chunk)
+        self.frames += 1
+
+    def close(self):
+        """Write the GIF trailer."""
+        self.handle.write(b";")
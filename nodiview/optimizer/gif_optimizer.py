@@ -2,8 +2,31 @@
 GIF optimization helpers.
 """
 
-from PIL import Image
+from PIL import Image, ImageChops
 import io
+import multiprocessing
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ..utils.stats import StageTimer
+from .gif_frames import (
+    DISPOSE_BACKGROUND,
+    DISPOSE_NONE,
+    DITHER_METHODS,
+    GIFFrameWriter,
+    build_global_palette,
+    changed_mask,
+    cleared_box,
+    map_frame,
+    quantize_frame,
+    redraw_mask,
+    union_box,
+)
+
+# Below this many frames, starting worker processes costs more than it saves
+PARALLEL_MIN_FRAMES = 32
 
 
 class GIFOptimizer:
@@ -14,11 +37,20 @@ class GIFOptimizer:
         self.palette_colors = 256
         self.dither = True
         self.keep_animation = True
+        self.delta_frames = True
+        self.global_palette = False
+        self.dither_method = "floyd-steinberg"
+        self.workers = None
+        self.last_stats = None
 
     def optimize(self, image_path, output_path=None):
         """
         Optimize a GIF file.
 
+        Animations are streamed: frames are decoded, quantized and written
+        one at a time into a temporary file next to the output, so memory
+        use depends on the frame size, not on the number of frames.
+
         Args:
             image_path: Input file.
             output_path: Output destination or None to overwrite.
@@ -29,46 +61,63 @@ class GIFOptimizer:
         if output_path is None:
             output_path = image_path
 
+        timer = self.last_stats = StageTimer("pil")
+        # Erst nach dem Schreiben ersetzen, die Quelle wird währenddessen noch gelesen
+        temp_path = output_path + ".tmp"
         try:
-            with Image.open(image_path) as img:
-                is_animated = getattr(img, "is_animated", False)
-
-                if is_animated and self.keep_animation:
-                    frames = []
-                    durations = []
-
-                    try:
-                        while True:
-                            frame = img.copy()
-                            if self.reduce_palette:
-                                frame = frame.convert(
-                                    "P",
-                                    palette=Image.Palette.ADAPTIVE,
-                                    colors=self.palette_colors,
-                                )
-                            else:
-                                frame = frame.convert("P")
-
-                            frames.append(frame)
-                            durations.append(img.info.get("duration", 100))
-
-                            img.seek(img.tell() + 1)
-                    except EOFError:
-                        pass
-
-                    if frames:
-                        frames[0].save(
-                            output_path,
-                            format="GIF",
-                            save_all=True,
-                            append_images=frames[1:],
-                            duration=durations,
-                            loop=img.info.get("loop", 0),
-                            optimize=True,
-                            dither=Image.Dither.FLOYDSTEINBERG if self.dither else Image.Dither.NONE,
-                        )
+            with open(temp_path, "wb") as handle:
+                if not self._encode(image_path, handle):
+                    return None
+            with timer.stage("write"):
+                if os.path.exists(output_path):
+                    shutil.copymode(output_path, temp_path)
+                os.replace(temp_path, output_path)
+            timer.bytes_written = os.path.getsize(output_path)
+            return output_path
+        except OSError as e:
+            print(f"GIF optimization failed: {e}")
+            timer.error = str(e)
+            return None
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
-                else:
+    def optimize_bytes(self, data):
+        """
+        Optimize an encoded GIF held in memory.
+
+        Args:
+            data: Encoded input image.
+
+        Returns:
+            Tuple of (GIF bytes or None on failure, StageTimer).
+        """
+        timer = self.last_stats = StageTimer("pil")
+        buffer = io.BytesIO()
+        if not self._encode(io.BytesIO(data), buffer):
+            return None, timer
+        return buffer.getvalue(), timer
+
+    def _encode(self, source, handle):
+        """
+        Re-encode a path or file object as optimized GIF.
+
+        Args:
+            source: Input path or file object.
+            handle: Writable binary file object for the output.
+
+        Returns:
+            True on success, None on failure.
+        """
+        timer = self.last_stats
+        try:
+            with Image.open(source) as img:
+                if getattr(img, "is_animated", False) and self.keep_animation:
+                    return self._encode_animation(img, handle)
+
+                with timer.stage("decode"):
+                    img.load()
+                with timer.stage("transform"):
                     if self.reduce_palette:
                         img = img.convert(
                             "P",
@@ -78,24 +127,185 @@ class GIFOptimizer:
                     else:
                         img = img.convert("P")
 
-                    save_kwargs = {
-                        "format": "GIF",
-                        "optimize": True,
-                    }
+                save_kwargs = {
+                    "format": "GIF",
+                    "optimize": True,
+                }
 
-                    if self.dither:
-                        save_kwargs["dither"] = Image.Dither.FLOYDSTEINBERG
-                    else:
-                        save_kwargs["dither"] = Image.Dither.NONE
-
-                    img.save(output_path, **save_kwargs)
+                if self.dither:
+                    save_kwargs["dither"] = Image.Dither.FLOYDSTEINBERG
+                else:
+                    save_kwargs["dither"] = Image.Dither.NONE
 
-                return output_path
+                with timer.stage("encode"):
+                    img.save(handle, **save_kwargs)
+                return True
 
         except Exception as e:
             print(f"GIF optimization failed: {e}")
+            timer.error = str(e)
             return None
 
+    def _encode_animation(self, img, handle):
+        """
+        Stream an animation frame by frame into handle.
+
+        Only the current composited frame and the one before it are kept.
+        Each frame's duration is read right after seeking to it, and its
+        disposal method is chosen once the next frame is known.
+
+        Every frame is cropped to the bounding box of the pixels that
+        changed since the previous frame. Frames stay in place (disposal 1)
+        unless the next frame turns visible pixels transparent; then their
+        box is grown over those pixels and cleared (disposal 2), and the next
+        frame redraws whatever stays visible there. Identical frames are
+        merged by adding up their durations. With delta_frames, unchanged
+        pixels inside a frame's box are written as transparent.
+
+        With global_palette, one palette is built from sampled frames and
+        the frames are mapped onto it in a process pool; a bounded number
+        of mapped frames is in flight and they are written in order.
+
+        Args:
+            img: Opened animated Pillow image.
+            handle: Writable binary file object.
+
+        Returns:
+            True on success, None if there are no frames.
+        """
+        timer = self.last_stats
+        writer = GIFFrameWriter(handle, img.info.get("loop"))
+        full_frame = (0, 0) + img.size
+        frame_count = getattr(img, "n_frames", 1)
+        # Frame wartet, bis seine Disposal-Methode durch den nächsten feststeht
+        pending = None
+
+        palette = None
+        if self.global_palette:
+            with timer.stage("transform"):
+                palette = build_global_palette(img, self.palette_colors)
+        executor = self._frame_pool(frame_count) if palette is not None else None
+        # Abgeschickte Frames in Schreibreihenfolge
+        queue = deque()
+
+        try:
+            for index in range(frame_count):
+                with timer.stage("decode"):
+                    img.seek(index)
+                    canvas = img.convert("RGBA")
+                duration = img.info.get("duration", 100)
+
+                with timer.stage("transform"):
+                    box = full_frame
+                    draw_mask = None
+                    if pending is not None:
+                        previous = pending["canvas"]
+                        changed = changed_mask(previous, canvas)
+                        if changed.getbbox() is None:
+                            pending["duration"] += duration
+                            continue
+                        draw_mask = changed
+                        cleared = cleared_box(previous, canvas)
+                        if cleared is not None:
+                            pending["disposal"] = DISPOSE_BACKGROUND
+                            pending["box"] = union_box(pending["box"], cleared)
+                            # Was im gelöschten Rechteck sichtbar bleibt, neu zeichnen
+                            draw_mask = ImageChops.lighter(
+                                changed, redraw_mask(canvas, pending["box"])
+                            )
+                        box = draw_mask.getbbox()
+                        if not self.delta_frames:
+                            draw_mask = None
+
+                if draw_mask is None:
+                    draw_mask = Image.new("L", canvas.size, 255)
+
+                if pending is not None:
+                    self._submit_pending(writer, queue, executor, palette, pending)
+                pending = {
+                    "canvas": canvas,
+                    "box": box,
+                    "mask": draw_mask,
+                    "duration": duration,
+                    "disposal": DISPOSE_NONE,
+                }
+
+            if pending is None:
+                return None
+            self._submit_pending(writer, queue, executor, palette, pending)
+            self._drain(writer, queue, 0)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        with timer.stage("encode"):
+            writer.close()
+        return True
+
+    def _worker_count(self):
+        """Return the configured number of worker processes."""
+        return self.workers or os.cpu_count() or 1
+
+    def _frame_pool(self, frame_count):
+        """Return a process pool for mapping frames, or None to map them inline."""
+        workers = self._worker_count()
+        if workers <= 1 or frame_count < PARALLEL_MIN_FRAMES:
+            return None
+        try:
+            return ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        except (OSError, ValueError) as e:
+            print(f"Parallel frame mapping unavailable: {e}")
+            return None
+
+    def _submit_pending(self, writer, queue, executor, palette, pending):
+        """
+        Quantize a frame held back by _encode_animation and write it.
+
+        With a worker pool the frame is only queued; finished frames at the
+        head of the queue are written, and the caller blocks once too many
+        frames are in flight.
+        """
+        timer = self.last_stats
+        box = pending["box"]
+        frame = pending["canvas"].crop(box)
+        mask = pending["mask"].crop(box)
+        if palette is not None:
+            dither = self.dither_method if self.dither else None
+            task = (map_frame, frame, palette, mask, dither, box[:2])
+        else:
+            colors = self.palette_colors if self.reduce_palette else 256
+            task = (quantize_frame, frame, colors, mask, self.reduce_palette, self.dither)
+        # Nur was der Writer braucht, nicht das ganze Canvas festhalten
+        meta = (box[:2], pending["duration"], pending["disposal"])
+
+        if executor is None:
+            with timer.stage("transform"):
+                result = task[0](*task[1:])
+            self._write_frame(writer, result, meta)
+            return
+
+        queue.append((executor.submit(*task), meta))
+        self._drain(writer, queue, self._worker_count() * 2)
+
+    def _drain(self, writer, queue, limit):
+        """Write queued frames in order until at most limit are left in flight."""
+        timer = self.last_stats
+        while queue and (len(queue) > limit or queue[0][0].done()):
+            future, meta = queue.popleft()
+            # Warten auf die Worker zählt als Transform-Zeit
+            with timer.stage("transform"):
+                result = future.result()
+            self._write_frame(writer, result, meta)
+
+    def _write_frame(self, writer, result, meta):
+        """Append a quantized frame with its offset, duration and disposal."""
+        frame, transparency = result
+        offset, duration, disposal = meta
+        with self.last_stats.stage("encode"):
+            writer.add_frame(frame, offset, duration, disposal, transparency)
+
     def set_reduce_palette(self, reduce):
         """Toggle palette reduction."""
         self.reduce_palette = bool(reduce)
@@ -112,3 +322,19 @@ class GIFOptimizer:
         """Toggle whether to keep animation."""
         self.keep_animation = bool(keep)
 
+    def set_delta_frames(self, delta):
+        """Toggle inter-frame delta encoding of animations."""
+        self.delta_frames = bool(delta)
+
+    def set_global_palette(self, enabled):
+        """Toggle one shared palette for all frames of an animation."""
+        self.global_palette = bool(enabled)
+
+    def set_dither_method(self, method):
+        """Set the dithering used with a global palette ("floyd-steinberg" or "ordered")."""
+        if method in DITHER_METHODS:
+            self.dither_method = method
+
+    def set_workers(self, workers):
+        """Set the number of frame-mapping processes (None = one per CPU)."""
+        self.workers = None if workers is None else max(1, int(workers))
@@ -3,8 +3,21 @@ JPEG optimization helpers.
 """
 
 import pyvips
-from PIL import Image
+from PIL import Image, ImageChops
 import io
+import os
+import shutil
+import subprocess
+
+from ..utils.stats import StageTimer, measure, write_bytes
+from .auto_quality import (
+    ANALYSIS_SIZE,
+    DEFAULT_THRESHOLD,
+    analysis_image,
+    choose_quality,
+    pil_to_vips,
+)
+from .target_size import search_quality
 
 
 class JPEGOptimizer:
@@ -23,6 +36,17 @@ class JPEGOptimizer:
         self.progressive = False
         self.grayscale = False
         self.keep_exif = True
+        self.target_size = None
+        self.target_tolerance = 0.05
+        self.max_iterations = 8
+        self.auto_quality = False
+        self.ssim_threshold = DEFAULT_THRESHOLD
+        self.workers = None
+        self.lossless = False
+        self.last_quality = None
+        self.last_ssim = None
+        self.last_saved = None
+        self.last_stats = None
 
     def optimize(self, image_path, output_path=None):
         """
@@ -38,75 +62,340 @@ class JPEGOptimizer:
         if output_path is None:
             output_path = image_path
 
+        if self.lossless:
+            return self._optimize_lossless(image_path, output_path)
+
+        timer = self.last_stats = StageTimer("pyvips")
         try:
-            image = pyvips.Image.new_from_file(image_path)
+            with timer.stage("decode"):
+                image = pyvips.Image.new_from_file(image_path)
+            with timer.stage("transform"):
+                image = self.process_image(image)
+            self.save_image(image, output_path, timer)
+
+            return output_path
 
-            if self.grayscale:
-                image = image.colourspace("b-w")
+        except Exception as e:
+            print(f"JPEG optimization failed: {e}")
+            timer.error = str(e)
+            return self._optimize_with_pil(image_path, output_path)
 
-            options = {
-                "Q": self.quality,
-                "optimize_coding": True,
-                "trellis_quant": True,
-                "overshoot_deringing": True,
-                "optimize_scans": True,
-            }
+    def optimize_bytes(self, data):
+        """
+        Optimize an encoded image held in memory.
 
-            subsampling = self.CHROMA_SUBSAMPLING.get(
-                self.chroma_subsampling, "4:2:0"
-            )
-            options["subsample_mode"] = subsampling
+        Args:
+            data: Encoded input image.
 
-            if self.progressive:
-                options["interlace"] = True
+        Returns:
+            Tuple of (JPEG bytes or None on failure, StageTimer).
+        """
+        if self.lossless:
+            timer = self.last_stats = StageTimer("pil")
+            return self.encode_lossless(data, timer), timer
 
-            if not self.keep_exif:
+        timer = self.last_stats = StageTimer("pyvips")
+        try:
+            with timer.stage("decode"):
+                image = pyvips.Image.new_from_buffer(data, "")
+            with timer.stage("transform"):
+                image = self.process_image(image)
+            return self.encode_image(image, timer), timer
+
+        except Exception as e:
+            print(f"JPEG optimization failed: {e}")
+            timer.error = str(e)
+            return self._encode_with_pil(io.BytesIO(data)), timer
+
+    def process_image(self, image):
+        """Apply the pixel transformations of this optimizer to a pyvips image."""
+        if self.grayscale:
+            image = image.colourspace("b-w")
+
+        if not self.keep_exif:
+            image = image.copy()
+            if image.get_typeof("exif-data") != 0:
                 image = image.copy()
-                if image.get_typeof("exif-data") != 0:
-                    image = image.copy()
 
-            image.write_to_file(output_path, **options)
+        return image
 
-            return output_path
+    def save_options(self, quality=None):
+        """Return the pyvips jpegsave options for the current settings."""
+        options = {
+            "Q": quality or self.quality,
+            "optimize_coding": True,
+            "trellis_quant": True,
+            "overshoot_deringing": True,
+            "optimize_scans": True,
+        }
+
+        # libvips kennt nur ein/aus; 4:2:2 und 4:1:1 werden als 4:2:0 geschrieben
+        subsampling = self.CHROMA_SUBSAMPLING.get(
+            self.chroma_subsampling, "4:2:0"
+        )
+        options["subsample_mode"] = "off" if subsampling == "4:4:4" else "on"
+
+        if self.progressive:
+            options["interlace"] = True
+
+        return options
+
+    def save_image(self, image, output_path, timer=None):
+        """Encode a pyvips image as JPEG with the current settings and write it."""
+        write_bytes(output_path, self.encode_image(image, timer), timer)
+
+    def encode_image(self, image, timer=None):
+        """
+        Encode a pyvips image as JPEG with the current settings.
+
+        With auto quality, the lowest quality reaching the SSIM threshold
+        is picked first. With a target size, the quality is then searched
+        with in-memory encodes of one decoded copy of the image.
+
+        Returns:
+            The winning encode as bytes.
+        """
+        if image.hasalpha():
+            image = image.flatten(background=[255, 255, 255])
+
+        if self.target_size or self.auto_quality:
+            with measure(timer, "decode"):
+                # Einmal dekodieren, damit jeder Versuch nur noch kodiert
+                image = image.copy_memory()
+
+        quality = self.quality
+        if self.auto_quality:
+            with measure(timer, "encode"):
+                reference = analysis_image(image)
+                quality, self.last_ssim = choose_quality(
+                    reference,
+                    lambda q: reference.jpegsave_buffer(**self.save_options(q)),
+                    self.ssim_threshold,
+                    workers=self.workers,
+                )
+
+        if self.target_size:
+            with measure(timer, "encode"):
+                quality, data = search_quality(
+                    lambda q: image.jpegsave_buffer(**self.save_options(q)),
+                    self.target_size,
+                    quality,
+                    self.target_tolerance,
+                    self.max_iterations,
+                )
+        else:
+            with measure(timer, "encode"):
+                data = image.jpegsave_buffer(**self.save_options(quality))
+
+        self.last_quality = quality
+        if timer is not None:
+            timer.quality = quality
+        return data
+
+    def encode_lossless(self, data, timer=None):
+        """
+        Recompress JPEG data without changing its decoded pixels.
+
+        With jpegtran on the PATH the DCT coefficients are copied unchanged;
+        only the entropy coding (optimized Huffman tables, progressive scans
+        if enabled) and the metadata are rewritten. Without it, Pillow
+        re-encodes with the source quantization tables (quality="keep"),
+        which decodes and re-encodes the pixels; that result is only used if
+        it decodes to exactly the same pixels as the input. The result is
+        never larger than the input.
+
+        Args:
+            data: Encoded JPEG input.
+            timer: Optional StageTimer.
+
+        Returns:
+            The recompressed bytes, the unchanged input if recompression
+            does not make it smaller or would change pixels, or None if the
+            input is not a JPEG.
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.format != "JPEG":
+                    raise ValueError("lossless mode needs a JPEG input")
+
+            result = self._transcode_with_jpegtran(data, timer)
+            if result is None:
+                result = self._recompress_with_pil(data, timer)
 
         except Exception as e:
-            print(f"JPEG optimization failed: {e}")
-            return self._optimize_with_pil(image_path, output_path)
+            print(f"Lossless JPEG optimization failed: {e}")
+            if timer is not None:
+                timer.error = str(e)
+            return None
+
+        if timer is not None:
+            timer.quality = "keep"
+        # Nicht kleiner oder nicht pixelgleich: Original unverändert behalten
+        if result is None or len(result) >= len(data):
+            self.last_saved = 0
+            return data
+        self.last_saved = len(data) - len(result)
+        return result
+
+    def _transcode_with_jpegtran(self, data, timer=None):
+        """Rewrite the entropy coding with jpegtran, or return None if it is unavailable."""
+        jpegtran = shutil.which("jpegtran")
+        if jpegtran is None:
+            return None
+
+        # Farbprofil immer übernehmen, EXIF nur auf Wunsch
+        command = [jpegtran, "-copy", "all" if self.keep_exif else "icc", "-optimize"]
+        if self.progressive:
+            command.append("-progressive")
+        with measure(timer, "encode"):
+            process = subprocess.run(command, input=data, capture_output=True)
+        if process.returncode != 0 or not process.stdout:
+            print(f"jpegtran failed: {process.stderr.decode(errors='replace').strip()}")
+            return None
+        if timer is not None:
+            timer.backend = "jpegtran"
+        return process.stdout
+
+    def _recompress_with_pil(self, data, timer=None):
+        """
+        Re-encode with the source quantization tables using Pillow.
+
+        Returns:
+            The re-encoded bytes, or None if they decode to other pixels.
+        """
+        with Image.open(io.BytesIO(data)) as img:
+            with measure(timer, "decode"):
+                img.load()
+
+            save_kwargs = {"format": "JPEG", "quality": "keep", "optimize": True}
+            if self.progressive:
+                save_kwargs["progressive"] = True
+            if img.info.get("icc_profile"):
+                save_kwargs["icc_profile"] = img.info["icc_profile"]
+            if self.keep_exif and img.info.get("exif"):
+                save_kwargs["exif"] = img.info["exif"]
+
+            with measure(timer, "encode"):
+                buffer = io.BytesIO()
+                img.save(buffer, **save_kwargs)
+            result = buffer.getvalue()
+
+            with measure(timer, "decode"):
+                with Image.open(io.BytesIO(result)) as recompressed:
+                    recompressed.load()
+                    # Schon eine Abweichung macht den Durchgang verlustbehaftet
+                    identical = (
+                        recompressed.mode == img.mode
+                        and recompressed.size == img.size
+                        and ImageChops.difference(recompressed, img).getbbox() is None
+                    )
+        return result if identical else None
+
+    def _optimize_lossless(self, image_path, output_path):
+        """Recompress a JPEG file losslessly, keeping the original if nothing is saved."""
+        timer = self.last_stats = StageTimer("pil")
+        try:
+            with timer.stage("decode"):
+                with open(image_path, "rb") as handle:
+                    data = handle.read()
+        except OSError as e:
+            print(f"Lossless JPEG optimization failed: {e}")
+            timer.error = str(e)
+            return None
+
+        result = self.encode_lossless(data, timer)
+        if result is None:
+            return None
+
+        if result is data and os.path.exists(output_path) and os.path.samefile(
+            image_path, output_path
+        ):
+            # Datei bleibt unangetastet (inkl. Zeitstempel)
+            timer.bytes_written = len(data)
+            return output_path
+
+        write_bytes(output_path, result, timer)
+        return output_path
 
     def _optimize_with_pil(self, image_path, output_path):
         """Fallback optimizer using Pillow."""
+        data = self._encode_with_pil(image_path)
+        if data is None:
+            return None
+        write_bytes(output_path, data, self.last_stats)
+        return output_path
+
+    def _encode_with_pil(self, source):
+        """Encode a path or file object as JPEG with Pillow, returning bytes or None."""
+        timer = self.last_stats
+        timer.backend = "pil"
         try:
-            with Image.open(image_path) as img:
-                if img.mode != "RGB":
-                    img = img.convert("RGB")
+            with Image.open(source) as img:
+                with timer.stage("decode"):
+                    img.load()
+
+                with timer.stage("transform"):
+                    if img.mode != "RGB":
+                        img = img.convert("RGB")
 
-                if self.grayscale:
-                    img = img.convert("L").convert("RGB")
+                    if self.grayscale:
+                        img = img.convert("L").convert("RGB")
+
+                    if not self.keep_exif:
+                        exif = img.getexif()
+                        if exif:
+                            data = list(img.getdata())
+                            img_no_exif = Image.new(img.mode, img.size)
+                            img_no_exif.putdata(data)
+                            img = img_no_exif
 
                 save_kwargs = {
                     "format": "JPEG",
-                    "quality": self.quality,
                     "optimize": True,
                 }
 
                 if self.progressive:
                     save_kwargs["progressive"] = True
 
-                if not self.keep_exif:
-                    exif = img.getexif()
-                    if exif:
-                        data = list(img.getdata())
-                        img_no_exif = Image.new(img.mode, img.size)
-                        img_no_exif.putdata(data)
-                        img = img_no_exif
+                def encode(quality):
+                    return self._encode_pil(img, quality, save_kwargs)
+
+                with timer.stage("encode"):
+                    quality = self.quality
+                    if self.auto_quality:
+                        reduced = img.copy()
+                        reduced.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+                        quality, self.last_ssim = choose_quality(
+                            pil_to_vips(reduced),
+                            lambda q: self._encode_pil(reduced, q, save_kwargs),
+                            self.ssim_threshold,
+                            workers=self.workers,
+                        )
+                    if self.target_size:
+                        quality, data = search_quality(
+                            encode,
+                            self.target_size,
+                            quality,
+                            self.target_tolerance,
+                            self.max_iterations,
+                        )
+                    else:
+                        data = encode(quality)
 
-                img.save(output_path, **save_kwargs)
-                return output_path
+                self.last_quality = timer.quality = quality
+                return data
 
         except Exception as e:
             print(f"PIL JPEG optimization failed: {e}")
+            timer.error = str(e)
             return None
 
+    def _encode_pil(self, img, quality, save_kwargs):
+        """Encode a Pillow image into an in-memory JPEG."""
+        buffer = io.BytesIO()
+        img.save(buffer, quality=quality, **save_kwargs)
+        return buffer.getvalue()
+
     def set_quality(self, quality):
         """Set the JPEG quality (1-100)."""
         self.quality = max(1, min(100, int(quality)))
@@ -128,3 +417,50 @@ class JPEGOptimizer:
         """Control whether EXIF metadata should be preserved."""
         self.keep_exif = bool(keep_exif)
 
+    def set_lossless(self, lossless):
+        """
+        Enable lossless recompression of JPEG inputs (decoded pixels stay identical).
+
+        Quality, chroma subsampling, grayscale, target size and auto quality
+        are ignored in this mode; the bytes saved by the last run are
+        available as last_saved.
+        """
+        self.lossless = bool(lossless)
+
+    def set_target_size(self, target_size, tolerance=None, max_iterations=None):
+        """
+        Aim for a maximum file size instead of a fixed quality.
+
+        The configured quality becomes the upper bound of the search; the
+        chosen quality is available as last_quality afterwards.
+
+        Args:
+            target_size: Maximum size in bytes, or None to disable.
+            tolerance: Accept results this fraction below the target (e.g. 0.05).
+            max_iterations: Maximum number of trial encodes.
+        """
+        self.target_size = max(1, int(target_size)) if target_size else None
+        if tolerance is not None:
+            self.target_tolerance = max(0.0, min(1.0, float(tolerance)))
+        if max_iterations is not None:
+            self.max_iterations = max(1, int(max_iterations))
+
+    def set_workers(self, workers):
+        """Set the number of threads scoring auto-quality candidates (None = one per CPU)."""
+        self.workers = None if workers is None else max(1, int(workers))
+
+    def set_auto_quality(self, auto_quality, threshold=None):
+        """
+        Pick the quality per image from a perceptual (SSIM) threshold.
+
+        The chosen quality replaces the configured one and is available as
+        last_quality (with its score as last_ssim). Combined with a target
+        size, it becomes the upper bound of the size search.
+
+        Args:
+            auto_quality: Enable or disable auto quality.
+            threshold: Minimum mean SSIM (e.g. 0.98).
+        """
+        self.auto_quality = bool(auto_quality)
+        if threshold is not None:
+            self.ssim_threshold = max(0.0, min(1.0, float(threshold)))
@@ -0,0 +1,310 @@
+"""
+Single-decode pipeline for resizing, optimizing and converting images.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pyvips
+
+from ..utils.stats import StageTimer, write_bytes
+from .resize import is_animated, loader_suffix
+
+
+class ImagePipeline:
+    """Chain resize, optimization and conversion stages over one pyvips image."""
+
+    def __init__(self):
+        self.resizer = None
+        self.resize_args = {}
+        self.optimizer = None
+        self.converter = None
+        self.output_format = None
+        self.last_stats = None
+
+    def resize(self, resizer, width=None, height=None, scale=None):
+        """
+        Add a resize stage.
+
+        Args:
+            resizer: Configured ImageResizer.
+            width: New width in pixels.
+            height: New height in pixels.
+            scale: Scale factor (e.g. 0.5 for 50%).
+
+        Returns:
+            The pipeline, for chaining.
+        """
+        self.resizer = resizer
+        self.resize_args = {"width": width, "height": height, "scale": scale}
+        return self
+
+    def optimize(self, optimizer):
+        """Encode with a configured JPEG, PNG or GIF optimizer."""
+        self.optimizer = optimizer
+        self.converter = None
+        return self
+
+    def convert(self, converter, output_format=None):
+        """Encode with a configured ImageConverter."""
+        self.converter = converter
+        self.output_format = output_format
+        self.optimizer = None
+        return self
+
+    def run(self, input_path, output_path):
+        """
+        Decode the input once, apply all stages and encode once.
+
+        Falls back to running the stages one after another through their
+        file-based APIs if libvips cannot handle one of them (e.g. GIF
+        optimization, BMP/ICO output).
+
+        Args:
+            input_path: Source path.
+            output_path: Destination path.
+
+        Returns:
+            Output path or None on failure.
+        """
+        if not os.path.exists(input_path):
+            return None
+
+        self.last_stats = StageTimer()
+        if self._can_fuse() and not self._converter_decodes(input_path, output_path):
+            try:
+                return self._run_fused(input_path, output_path)
+            except Exception as e:
+                print(f"Fused pipeline failed: {e}")
+                self.last_stats.error = str(e)
+
+        return self._run_staged(input_path, output_path)
+
+    def run_bytes(self, data, suffix=None):
+        """
+        Run all stages on an encoded image held in memory.
+
+        Args:
+            data: Encoded input image.
+            suffix: Output format as file suffix for resize-only pipelines
+                (defaults to the input format).
+
+        Returns:
+            Tuple of (encoded bytes or None on failure, StageTimer).
+        """
+        self.last_stats = StageTimer()
+        if self._can_fuse() and not self._converter_decodes(data):
+            try:
+                return self._run_fused_bytes(data, suffix), self.last_stats
+            except Exception as e:
+                print(f"Fused pipeline failed: {e}")
+                self.last_stats.error = str(e)
+
+        return self._run_staged_bytes(data, suffix), self.last_stats
+
+    def _can_fuse(self):
+        """Return True if every stage can work on a pyvips image."""
+        if self.optimizer is not None:
+            # Verlustfreies JPEG braucht den Original-Datenstrom, nicht die Pixel
+            if getattr(self.optimizer, "lossless", False) and self.resizer is None:
+                return False
+            return hasattr(self.optimizer, "encode_image")
+        return self.converter is not None or self.resizer is not None
+
+    def _converter_decodes(self, source, output_path=None):
+        """
+        Return True if the converter should decode source on its own.
+
+        The fused path decodes a convert-only pipeline as a single page at
+        full size, so animations and shrink-on-load conversions are left to
+        the converter's own loader. The Pillow engine encodes animations
+        itself, also after a resize.
+        """
+        if self.converter is None:
+            return False
+        output_format = self._output_format(output_path)
+        if self.resizer is not None:
+            return self.converter.engine == "pil" and self.converter.keeps_animation(
+                source, output_format
+            )
+        if self.converter.max_dimension:
+            return True
+        return self.converter.keeps_animation(source, output_format)
+
+    def _output_format(self, output_path=None):
+        """Return the converter's target format for output_path."""
+        if self.output_format is not None or self.converter is None:
+            return self.output_format
+        return self.converter.format_for_path(output_path) if output_path else "PNG"
+
+    def _animated(self, source, suffix, output_format):
+        """Return True if the fused path has to keep every frame of source."""
+        if self.optimizer is not None:
+            return False
+        if self.converter is not None:
+            return self.converter.keeps_animation(source, output_format)
+        return is_animated(source, suffix)
+
+    def _run_fused(self, input_path, output_path):
+        """Run all stages lazily on a single sequentially decoded image."""
+        timer = self.last_stats
+        timer.backend = "pyvips"
+        suffix = os.path.splitext(output_path)[1]
+        output_format = self._output_format(output_path)
+        animated = self._animated(input_path, suffix, output_format)
+        with timer.stage("decode"):
+            image, resized = self._decode(input_path, animated)
+
+        image = self._transform(image, resized)
+        if image is None:
+            return None
+
+        # Sequential reads stream from the source, so never write over it directly
+        target_path = output_path
+        if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+            directory, name = os.path.split(os.path.abspath(output_path))
+            handle, target_path = tempfile.mkstemp(
+                dir=directory, prefix=".", suffix=os.path.splitext(name)[1]
+            )
+            os.close(handle)
+
+        try:
+            data = self._encode(image, suffix, output_format, animated)
+            write_bytes(target_path, data, timer)
+            if target_path != output_path:
+                shutil.copymode(output_path, target_path)
+                os.replace(target_path, output_path)
+        finally:
+            if target_path != output_path and os.path.exists(target_path):
+                os.remove(target_path)
+
+        return output_path
+
+    def _run_fused_bytes(self, data, suffix=None):
+        """Run all stages lazily on a single image decoded from memory."""
+        timer = self.last_stats
+        timer.backend = "pyvips"
+        output_format = self._output_format()
+        animated = self._animated(data, suffix, output_format)
+        with timer.stage("decode"):
+            image, resized = self._decode(data, animated)
+
+        output_suffix = suffix or loader_suffix(image)
+        image = self._transform(image, resized)
+        if image is None:
+            return None
+        return self._encode(image, output_suffix, output_format, animated)
+
+    def _decode(self, source, animated=False):
+        """
+        Open a path or buffer sequentially.
+
+        A resizer in thumbnail mode shrinks the image while it is decoded.
+        Animations are loaded with all frames for random access instead,
+        since the resizer shrinks them frame by frame.
+
+        Returns:
+            Tuple of (pyvips image, whether it is already resized).
+        """
+        if animated:
+            # n=-1 lädt alle Frames untereinander in ein hohes Bild
+            if isinstance(source, bytes):
+                return pyvips.Image.new_from_buffer(source, "", n=-1), False
+            return pyvips.Image.new_from_file(source, n=-1), False
+        if self.resizer is not None and self.resizer.thumbnail:
+            image = self.resizer.load_thumbnail(source, **self.resize_args)
+            if image is not None:
+                return image, True
+        if isinstance(source, bytes):
+            return pyvips.Image.new_from_buffer(source, "", access="sequential"), False
+        return pyvips.Image.new_from_file(source, access="sequential"), False
+
+    def _transform(self, image, resized=False):
+        """Apply the resize and optimizer stages, or return None if there is nothing to do."""
+        with self.last_stats.stage("transform"):
+            if self.resizer is not None and not resized:
+                resized = self.resizer.resize_image(image, **self.resize_args)
+                if resized is None and self.optimizer is None and self.converter is None:
+                    return None
+                if resized is not None:
+                    image = resized
+
+            if self.optimizer is not None:
+                image = self.optimizer.process_image(image)
+        return image
+
+    def _encode(self, image, suffix, output_format, animated=False):
+        """Encode the final image with the optimizer, the converter or by suffix."""
+        timer = self.last_stats
+        if self.optimizer is not None:
+            return self.optimizer.encode_image(image, timer)
+        if self.converter is not None and animated:
+            return self.converter.encode_animation(image, output_format, timer)
+        if self.converter is not None:
+            return self.converter.encode_image(image, output_format, timer)
+        with timer.stage("encode"):
+            return image.write_to_buffer(suffix)
+
+    def _resize_requested(self):
+        """Return True if the pipeline has a resize stage with a target size."""
+        if self.resizer is None:
+            return False
+        return any(value is not None for value in self.resize_args.values())
+
+    def _run_staged(self, input_path, output_path):
+        """Run the stages one after another with an intermediate file."""
+        timer = self.last_stats
+        if self.optimizer is None and self.converter is None:
+            if self.resizer is None:
+                return None
+            result = self.resizer.resize(input_path, output_path, **self.resize_args)
+            timer.merge(self.resizer.last_stats)
+            return result
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = input_path
+            if self._resize_requested():
+                resized_path = os.path.join(
+                    temp_dir, "resized" + os.path.splitext(input_path)[1]
+                )
+                result = self.resizer.resize(input_path, resized_path, **self.resize_args)
+                timer.merge(self.resizer.last_stats)
+                # Ohne Skalierung nicht stillschweigend das Original weiterverarbeiten
+                if not result:
+                    timer.error = timer.error or "Resize failed"
+                    return None
+                source_path = resized_path
+
+            encoder = self.optimizer or self.converter
+            if self.optimizer is not None:
+                result = self.optimizer.optimize(source_path, output_path)
+            else:
+                result = self.converter.convert(source_path, output_path, self.output_format)
+            timer.merge(encoder.last_stats)
+            return result
+
+    def _run_staged_bytes(self, data, suffix=None):
+        """Run the stages one after another on in-memory buffers."""
+        timer = self.last_stats
+        if self.optimizer is None and self.converter is None:
+            if self.resizer is None:
+                return None
+            result, stats = self.resizer.resize_bytes(data, suffix=suffix, **self.resize_args)
+            timer.merge(stats)
+            return result
+
+        if self._resize_requested():
+            resized, stats = self.resizer.resize_bytes(data, **self.resize_args)
+            timer.merge(stats)
+            if resized is None:
+                timer.error = timer.error or "Resize failed"
+                return None
+            data = resized
+
+        if self.optimizer is not None:
+            result, stats = self.optimizer.optimize_bytes(data)
+        else:
+            result, stats = self.converter.convert_bytes(data, self.output_format or "PNG")
+        timer.merge(stats)
+        return result
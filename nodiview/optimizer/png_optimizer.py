@@ -5,6 +5,29 @@ PNG optimization helpers.
 import pyvips
 from PIL import Image
 import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.stats import StageTimer, measure, write_bytes
+from .auto_quality import ssim
+
+# Palette bit depths supported by pngsave
+PALETTE_BITDEPTHS = (1, 2, 4, 8)
+
+# Trial strategies per effort level: row filters, zlib levels and bit depths
+EFFORT_LEVELS = {
+    1: {"filters": ("none", "all"), "compression": (9,), "bitdepths": (8,)},
+    2: {
+        "filters": ("none", "sub", "up", "paeth", "all"),
+        "compression": (9,),
+        "bitdepths": (8, 4, 2, 1),
+    },
+    3: {
+        "filters": ("none", "sub", "up", "avg", "paeth", "all"),
+        "compression": (9, 8, 6),
+        "bitdepths": (8, 4, 2, 1),
+    },
+}
 
 
 class PNGOptimizer:
@@ -13,8 +36,18 @@ class PNGOptimizer:
     def __init__(self):
         self.compression_level = 6  # 0-9
         self.reduce_palette = False
+        self.palette_quality = 80  # libimagequant Q, 0-100
+        self.palette_effort = 7  # 1-10
+        self.palette_dither = 1.0  # 0-1
+        self.palette_bitdepth = 8
+        self.palette_floor = 0.95  # minimum SSIM, None = no check
         self.keep_alpha = True
         self.interlaced = False
+        self.effort = 0  # 0 = single encode, 1-3 = multi-trial
+        self.workers = None
+        self.last_trial = None
+        self.last_ssim = None
+        self.last_stats = None
 
     def optimize(self, image_path, output_path=None):
         """
@@ -30,45 +63,260 @@ class PNGOptimizer:
         if output_path is None:
             output_path = image_path
 
+        timer = self.last_stats = StageTimer("pyvips")
         try:
-            image = pyvips.Image.new_from_file(image_path)
+            with timer.stage("decode"):
+                image = pyvips.Image.new_from_file(image_path)
+            with timer.stage("transform"):
+                image = self.process_image(image)
+            self.save_image(image, output_path, timer)
 
-            if not self.keep_alpha and image.has_alpha():
-                image = image.flatten()
-
-            if self.reduce_palette:
-                image = image.colourspace("srgb")
-                image = image.quantize(256, "uniform", dither=0.5)
+            return output_path
 
-            options = {
-                "compression": self.compression_level,
-            }
+        except Exception as e:
+            print(f"PNG optimization failed: {e}")
+            timer.error = str(e)
+            return self._optimize_with_pil(image_path, output_path)
 
-            if self.interlaced:
-                options["interlace"] = True
+    def optimize_bytes(self, data):
+        """
+        Optimize an encoded image held in memory.
 
-            image.write_to_file(output_path, **options)
+        Args:
+            data: Encoded input image.
 
-            return output_path
+        Returns:
+            Tuple of (PNG bytes or None on failure, StageTimer).
+        """
+        timer = self.last_stats = StageTimer("pyvips")
+        try:
+            with timer.stage("decode"):
+                image = pyvips.Image.new_from_buffer(data, "")
+            with timer.stage("transform"):
+                image = self.process_image(image)
+            return self.encode_image(image, timer), timer
 
         except Exception as e:
             print(f"PNG optimization failed: {e}")
-            return self._optimize_with_pil(image_path, output_path)
+            timer.error = str(e)
+            return self._encode_with_pil(io.BytesIO(data)), timer
+
+    def process_image(self, image):
+        """Apply the pixel transformations of this optimizer to a pyvips image."""
+        if not self.keep_alpha and image.hasalpha():
+            image = image.flatten(background=[255, 255, 255])
+
+        return image
+
+    def save_options(self):
+        """Return the pyvips pngsave options for the current settings."""
+        options = {
+            "compression": self.compression_level,
+        }
+
+        if self.interlaced:
+            options["interlace"] = True
+
+        return options
+
+    def save_image(self, image, output_path, timer=None):
+        """Encode a pyvips image as PNG with the current settings and write it."""
+        write_bytes(output_path, self.encode_image(image, timer), timer)
+
+    def palette_options(self):
+        """Return the pyvips pngsave options for lossy palette output."""
+        return {
+            "palette": True,
+            "Q": self.palette_quality,
+            "effort": self.palette_effort,
+            "dither": self.palette_dither,
+            "bitdepth": self.palette_bitdepth,
+        }
+
+    def encode_image(self, image, timer=None):
+        """
+        Encode a pyvips image as PNG with the current settings and return the bytes.
+
+        With reduce_palette, the image is also quantized to a palette. The
+        palette PNG is only kept if it reaches palette_floor and is smaller
+        than the best truecolor encode.
+        With an effort level, several strategies are tried (see _encode_trials).
+        """
+        if not self.effort and not self.reduce_palette:
+            with measure(timer, "encode"):
+                return image.pngsave_buffer(**self.save_options())
+
+        with measure(timer, "decode"):
+            # Einmal dekodieren, alle Versuche kodieren nur noch
+            image = image.copy_memory()
+        if self.effort:
+            with measure(timer, "transform"):
+                image = self._reduce_lossless(image)
+
+        palette = palette_trial = None
+        if self.reduce_palette:
+            palette = self._encode_palette(image, timer)
+            if palette is not None and self.effort:
+                palette = self._encode_trials(image, timer, [self.palette_options()])
+                palette_trial = self.last_trial
+
+        if self.effort:
+            data = self._encode_trials(image, timer)
+        else:
+            with measure(timer, "encode"):
+                data = image.pngsave_buffer(**self.save_options())
+
+        # Verlustbehaftete Palette lohnt nur, wenn sie wirklich kleiner ist
+        if palette is None or len(palette) >= len(data):
+            return data
+        if palette_trial is not None:
+            self.last_trial = palette_trial
+        if timer is not None:
+            timer.quality = self.palette_quality
+        return palette
+
+    def _encode_palette(self, image, timer=None):
+        """
+        Quantize to a palette with libimagequant and check the quantization error.
+
+        Returns:
+            The palette PNG as bytes, or None if its SSIM against the
+            image is below palette_floor.
+        """
+        with measure(timer, "encode"):
+            data = image.pngsave_buffer(**self.save_options(), **self.palette_options())
+
+            self.last_ssim = None
+            if self.palette_floor:
+                reference = image
+                if reference.format == "ushort":
+                    reference = (reference >> 8).cast("uchar")
+                self.last_ssim = ssim(reference, pyvips.Image.new_from_buffer(data, ""))
+
+        if self.last_ssim is not None and self.last_ssim < self.palette_floor:
+            # Zu großer Quantisierungsfehler: lieber Truecolor
+            return None
+        return data
+
+    def _encode_trials(self, image, timer=None, variants=None):
+        """
+        Encode one decoded image with several strategies and keep the smallest.
+
+        Candidates combine row filters, zlib levels, palette or truecolor
+        output and reduced bit depths. Without explicit variants, palette and
+        low bit-depth output are only tried if a quick probe decodes back to
+        identical pixels, so the result is lossless with respect to the image.
+
+        Args:
+            image: Decoded pyvips image.
+            timer: Optional StageTimer.
+            variants: Optional list of colour-type options to use instead of
+                the lossless probes (e.g. the lossy palette options).
+
+        Returns:
+            The smallest PNG as bytes; the winning options are kept in last_trial.
+        """
+        level = EFFORT_LEVELS[self.effort]
+        base = {"interlace": True} if self.interlaced else {}
+        workers = self.workers or os.cpu_count() or 1
+
+        with measure(timer, "encode"), ThreadPoolExecutor(max_workers=workers) as executor:
+            def is_lossless(options):
+                if not options:
+                    return True
+                data = image.pngsave_buffer(compression=1, **options)
+                decoded = pyvips.Image.new_from_buffer(data, "")
+                if decoded.bands != image.bands or decoded.format != image.format:
+                    return False
+                return (decoded - image).abs().max() == 0
+
+            if variants is None:
+                probes = [{}]
+                if image.format == "uchar":
+                    probes += [{"palette": True, "Q": 100, "dither": 0, "bitdepth": depth}
+                               for depth in level["bitdepths"]]
+                    if image.bands == 1:
+                        probes += [{"bitdepth": depth} for depth in level["bitdepths"][1:]]
+                variants = [
+                    options
+                    for options, lossless in zip(probes, executor.map(is_lossless, probes))
+                    if lossless
+                ]
+
+            trials = [
+                {**base, **variant, "filter": row_filter, "compression": compression}
+                for variant in variants
+                for row_filter in level["filters"]
+                for compression in level["compression"]
+            ]
+            results = list(executor.map(lambda options: image.pngsave_buffer(**options), trials))
+
+        data, self.last_trial = min(zip(results, trials), key=lambda result: len(result[0]))
+        return data
+
+    def _reduce_lossless(self, image):
+        """Drop a fully opaque alpha channel, equal color bands and unused 16-bit precision."""
+        maximum = 65535 if image.format == "ushort" else 255
+        if image.hasalpha() and image[image.bands - 1].min() == maximum:
+            image = image.extract_band(0, n=image.bands - 1)
+
+        # Graustufen in RGB: alle Farbkanäle identisch
+        if image.bands in (3, 4) and image.format in ("uchar", "ushort"):
+            if (image[0] == image[1]).min() == 255 and (image[0] == image[2]).min() == 255:
+                gray = image[0]
+                if image.bands == 4:
+                    gray = gray.bandjoin(image[3])
+                image = gray.copy(
+                    interpretation="grey16" if image.format == "ushort" else "b-w"
+                )
+
+        # 16 Bit ohne Mehrwert: jeder Wert ist ein Vielfaches von 257
+        if image.format == "ushort" and (image % 257).max() == 0:
+            interpretation = "b-w" if image.bands <= 2 else "srgb"
+            image = (image / 257).cast("uchar").copy(interpretation=interpretation)
+
+        return image.copy_memory()
 
     def _optimize_with_pil(self, image_path, output_path):
         """Fallback optimizer using Pillow."""
+        data = self._encode_with_pil(image_path)
+        if data is None:
+            return None
+        write_bytes(output_path, data, self.last_stats)
+        return output_path
+
+    def _encode_with_pil(self, source):
+        """Encode a path or file object as PNG with Pillow, returning bytes or None."""
+        timer = self.last_stats
+        timer.backend = "pil"
         try:
-            with Image.open(image_path) as img:
-                if not self.keep_alpha and img.mode in ("RGBA", "LA"):
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    if img.mode == "RGBA":
-                        background.paste(img, mask=img.split()[3])
-                    else:
-                        background.paste(img)
-                    img = background
-
-                if self.reduce_palette:
-                    img = img.convert("P", palette=Image.Palette.ADAPTIVE, colors=256)
+            with Image.open(source) as img:
+                with timer.stage("decode"):
+                    img.load()
+
+                with timer.stage("transform"):
+                    if not self.keep_alpha and img.mode in ("RGBA", "LA"):
+                        background = Image.new("RGB", img.size, (255, 255, 255))
+                        if img.mode == "RGBA":
+                            background.paste(img, mask=img.split()[3])
+                        else:
+                            background.paste(img)
+                        img = background
+
+                    truecolor = img
+                    if self.reduce_palette:
+                        # FASTOCTREE quantisiert RGBA samt Alpha-Kanal
+                        if img.mode not in ("RGB", "RGBA"):
+                            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                        img = img.quantize(
+                            2 ** self.palette_bitdepth,
+                            method=Image.Quantize.FASTOCTREE,
+                            dither=(
+                                Image.Dither.FLOYDSTEINBERG
+                                if self.palette_dither
+                                else Image.Dither.NONE
+                            ),
+                        )
 
                 save_kwargs = {
                     "format": "PNG",
@@ -79,11 +327,21 @@ class PNGOptimizer:
                 if self.interlaced:
                     save_kwargs["interlace"] = True
 
-                img.save(output_path, **save_kwargs)
-                return output_path
+                def encode(image):
+                    buffer = io.BytesIO()
+                    image.save(buffer, **save_kwargs)
+                    return buffer.getvalue()
+
+                with timer.stage("encode"):
+                    data = encode(img)
+                    if img is not truecolor:
+                        # Palette nur behalten, wenn sie kleiner ist als Truecolor
+                        data = min(encode(truecolor), data, key=len)
+                return data
 
         except Exception as e:
             print(f"PIL PNG optimization failed: {e}")
+            timer.error = str(e)
             return None
 
     def set_compression_level(self, level):
@@ -94,6 +352,32 @@ class PNGOptimizer:
         """Toggle palette reduction."""
         self.reduce_palette = bool(reduce)
 
+    def set_palette_quality(self, quality):
+        """Set the palette quantization quality (0-100)."""
+        self.palette_quality = max(0, min(100, int(quality)))
+
+    def set_palette_effort(self, effort):
+        """Set the palette quantization effort (1-10)."""
+        self.palette_effort = max(1, min(10, int(effort)))
+
+    def set_palette_dither(self, dither):
+        """Set the amount of palette dithering (0.0-1.0)."""
+        self.palette_dither = max(0.0, min(1.0, float(dither)))
+
+    def set_palette_bitdepth(self, bitdepth):
+        """Set the palette bit depth (1, 2, 4 or 8)."""
+        if bitdepth in PALETTE_BITDEPTHS:
+            self.palette_bitdepth = bitdepth
+
+    def set_palette_floor(self, min_ssim):
+        """
+        Set the quality floor of palette output.
+
+        Palette results whose SSIM against the original is below min_ssim
+        are written as truecolor instead; None disables the check.
+        """
+        self.palette_floor = max(0.0, min(1.0, float(min_ssim))) if min_ssim else None
+
     def set_keep_alpha(self, keep):
         """Toggle alpha preservation."""
         self.keep_alpha = bool(keep)
@@ -102,3 +386,17 @@ class PNGOptimizer:
         """Toggle interlaced encoding."""
         self.interlaced = bool(interlaced)
 
+    def set_effort(self, effort):
+        """
+        Set the multi-trial effort (0-3).
+
+        0 encodes once with compression_level. Higher levels try more
+        filter, zlib level, palette and bit-depth combinations concurrently
+        and keep the smallest lossless result.
+        """
+        self.effort = max(0, min(max(EFFORT_LEVELS), int(effort)))
+
+    def set_workers(self, workers):
+        """Set the number of threads for the encode trials (None = one per CPU)."""
+        self.workers = None if workers is None else max(1, int(workers))
+
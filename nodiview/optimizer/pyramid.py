@@ -0,0 +1,213 @@
+"""
+Deep-zoom tile pyramid export (DZI, IIIF, Zoomify) via libvips dzsave.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pyvips
+
+from ..utils.stats import StageTimer
+from .jpeg_optimizer import JPEGOptimizer
+
+# Layout name -> dzsave layout
+LAYOUTS = {
+    "dzi": "dz",
+    "iiif": "iiif",
+    "iiif3": "iiif3",
+    "zoomify": "zoomify",
+}
+
+# Tile format -> tile file suffix
+TILE_FORMATS = {
+    "JPEG": ".jpg",
+    "WebP": ".webp",
+}
+
+# Container name -> dzsave container
+CONTAINERS = {
+    "directory": "fs",
+    "zip": "zip",
+}
+
+# libvips' limit for tile size and overlap
+MAX_TILE_SIZE = 8192
+
+# dzsave legt für IIIF/Zoomify eine Eigenschaftsdatei neben die Pyramide
+PROPERTIES_FILE = "vips-properties.xml"
+
+
+def pyramid_suffix(layout, container):
+    """
+    Return the suffix of the path a pyramid export returns.
+
+    Args:
+        layout: Key of LAYOUTS.
+        container: Key of CONTAINERS.
+
+    Returns:
+        ".zip" for zip files, ".dzi" for DZI directories, "" otherwise
+        (IIIF and Zoomify pyramids are a directory named after the image).
+    """
+    if container == "zip":
+        return ".zip"
+    if layout == "dzi":
+        return ".dzi"
+    return ""
+
+
+def _option_string(options):
+    """Format saver options as a libvips option string, e.g. "[Q=85,strip=true]"."""
+    parts = []
+    for name, value in options.items():
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        parts.append(f"{name}={value}")
+    return "[" + ",".join(parts) + "]"
+
+
+class PyramidExporter:
+    """Write tiled zoom pyramids of large images for web viewers."""
+
+    def __init__(self):
+        self.layout = "dzi"
+        self.tile_size = 254
+        self.overlap = 1
+        self.tile_format = "JPEG"
+        self.container = "directory"
+        self.resource_id = None
+        self.last_stats = None
+
+        # Kachel-Qualität und Chroma kommen aus den JPEG-Einstellungen
+        self.jpeg_optimizer = JPEGOptimizer()
+
+    def export(self, image_path, output_dir, base_name=None):
+        """
+        Write the tile pyramid of an image.
+
+        The source is opened for sequential access: libvips reads it once
+        from top to bottom and builds every pyramid level from the strips
+        in flight, so memory use depends on the image width and tile size,
+        not on its height. Tiles are encoded on libvips' worker threads.
+
+        The pyramid is written to a temporary directory next to the output
+        and moved into place afterwards, replacing an earlier export.
+
+        Args:
+            image_path: Source path.
+            output_dir: Destination directory.
+            base_name: Output name (defaults to the source file stem).
+
+        Returns:
+            Path of the .dzi file, the .zip file or the pyramid directory,
+            or None on failure.
+        """
+        base_name = base_name or Path(image_path).stem
+        os.makedirs(output_dir, exist_ok=True)
+        timer = self.last_stats = StageTimer("pyvips")
+        staging = tempfile.mkdtemp(dir=output_dir, prefix=".")
+        try:
+            with timer.stage("decode"):
+                image = pyvips.Image.new_from_file(image_path, access="sequential")
+            with timer.stage("transform"):
+                image = self.jpeg_optimizer.process_image(image)
+                if self.tile_format == "JPEG" and image.hasalpha():
+                    image = image.flatten(background=[255, 255, 255])
+
+            name = base_name + (".zip" if self.container == "zip" else "")
+            with timer.stage("encode"):
+                image.dzsave(os.path.join(staging, name), **self.save_options())
+
+            with timer.stage("write"):
+                for entry in os.listdir(staging):
+                    if entry != PROPERTIES_FILE:
+                        self._replace(os.path.join(staging, entry), os.path.join(output_dir, entry))
+
+            output_path = os.path.join(
+                output_dir, base_name + pyramid_suffix(self.layout, self.container)
+            )
+            timer.bytes_written = self._size(output_dir, base_name)
+            return output_path
+
+        except (pyvips.Error, OSError) as e:
+            print(f"Pyramid export failed: {e}")
+            timer.error = str(e)
+            return None
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def save_options(self):
+        """Return the pyvips dzsave options for the current settings."""
+        if self.tile_format == "JPEG":
+            tile_options = self.jpeg_optimizer.save_options()
+        else:
+            tile_options = {"Q": self.jpeg_optimizer.quality}
+
+        options = {
+            "layout": LAYOUTS.get(self.layout, "dz"),
+            "container": CONTAINERS.get(self.container, "fs"),
+            "tile_size": self.tile_size,
+            # Überlappung darf die Kachelgröße nicht übersteigen
+            "overlap": min(self.overlap, self.tile_size),
+            "suffix": TILE_FORMATS.get(self.tile_format, ".jpg") + _option_string(tile_options),
+            "keep": "none",
+        }
+        if self.resource_id and self.layout.startswith("iiif"):
+            options["id"] = self.resource_id
+        return options
+
+    def _replace(self, source, target):
+        """Move a finished file or directory over an earlier export."""
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        os.replace(source, target)
+
+    def _size(self, output_dir, base_name):
+        """Return the total size of the files written for base_name."""
+        if self.container == "zip":
+            return os.path.getsize(os.path.join(output_dir, base_name + ".zip"))
+
+        paths = [os.path.join(output_dir, base_name)]
+        if self.layout == "dzi":
+            paths = [os.path.join(output_dir, base_name + ".dzi"), paths[0] + "_files"]
+
+        total = 0
+        for path in paths:
+            if os.path.isfile(path):
+                total += os.path.getsize(path)
+            for root, _dirs, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    def set_layout(self, layout):
+        """Set the pyramid layout ("dzi", "iiif", "iiif3" or "zoomify")."""
+        if layout in LAYOUTS:
+            self.layout = layout
+
+    def set_tile_size(self, tile_size):
+        """Set the tile edge length in pixels (1-8192)."""
+        self.tile_size = max(1, min(MAX_TILE_SIZE, int(tile_size)))
+
+    def set_overlap(self, overlap):
+        """Set the overlap between neighbouring tiles in pixels."""
+        self.overlap = max(0, min(MAX_TILE_SIZE, int(overlap)))
+
+    def set_tile_format(self, tile_format):
+        """Set the tile format ("JPEG" or "WebP")."""
+        if tile_format in TILE_FORMATS:
+            self.tile_format = tile_format
+
+    def set_container(self, container):
+        """Set the container ("directory" or "zip")."""
+        if container in CONTAINERS:
+            self.container = container
+
+    def set_resource_id(self, resource_id):
+        """Set the base URL written into IIIF info.json (None for the libvips default)."""
+        self.resource_id = resource_id or None
+
+    def set_quality(self, quality):
+        """Set the tile quality (1-100)."""
+        self.jpeg_optimizer.set_quality(quality)
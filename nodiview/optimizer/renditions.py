@@ -0,0 +1,230 @@
+"""
+Multi-rendition (responsive srcset) output from a single decode.
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+
+import pyvips
+from PIL import Image, ImageOps
+
+from ..converter.image_converter import ImageConverter
+from ..utils.stats import StageTimer, write_bytes
+from .jpeg_optimizer import JPEGOptimizer
+from .png_optimizer import PNGOptimizer
+from .resize import UNBOUNDED, ImageResizer
+
+MANIFEST_SUFFIX = ".renditions.json"
+
+
+def srcset(manifest, output_format):
+    """
+    Build an HTML srcset attribute value from a rendition manifest.
+
+    Args:
+        manifest: Manifest dict as written by RenditionGenerator.
+        output_format: Format whose renditions should be listed.
+
+    Returns:
+        String like "photo-320w.webp 320w, photo-640w.webp 640w".
+    """
+    entries = [
+        f"{rendition['file']} {rendition['width']}w"
+        for rendition in sorted(manifest["renditions"], key=lambda r: r["width"])
+        if rendition["format"] == output_format
+    ]
+    return ", ".join(entries)
+
+
+class RenditionGenerator:
+    """Write several widths and formats of an image from a single decode."""
+
+    def __init__(self):
+        self.widths = [320, 640, 960, 1280, 1920]
+        self.formats = ["JPEG", "WebP"]
+        self.quality = 85
+        self.filter = "lanczos3"
+        self.last_manifest = None
+        self.last_stats = None
+
+        self.jpeg_optimizer = JPEGOptimizer()
+        self.jpeg_optimizer.set_progressive(True)
+        self.png_optimizer = PNGOptimizer()
+        self.converter = ImageConverter()
+
+    def generate(self, image_path, output_dir, base_name=None):
+        """
+        Write all renditions of an image and a manifest describing them.
+
+        The source is decoded once with shrink-on-load to the largest
+        requested width; every smaller width is derived from the previous
+        rendition. Widths above the source width are clamped to it.
+
+        Args:
+            image_path: Source path.
+            output_dir: Destination directory.
+            base_name: Output name prefix (defaults to the source file stem).
+
+        Returns:
+            Path of the manifest file or None on failure.
+        """
+        if not self.widths or not self.formats:
+            return None
+
+        base_name = base_name or Path(image_path).stem
+        widths = sorted(set(self.widths), reverse=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+        timer = self.last_stats = StageTimer("pyvips")
+        try:
+            renditions = self._generate_with_vips(image_path, output_dir, base_name, widths)
+        except Exception as e:
+            print(f"pyvips rendition generation failed: {e}")
+            timer.error = str(e)
+            timer.backend = "pil"
+            renditions = self._generate_with_pil(image_path, output_dir, base_name, widths)
+            if renditions is None:
+                return None
+
+        manifest = {"source": os.path.abspath(image_path), "renditions": renditions}
+        manifest_path = os.path.join(output_dir, base_name + MANIFEST_SUFFIX)
+        try:
+            with open(manifest_path, "w", encoding="utf-8") as handle:
+                json.dump(manifest, handle, indent=2)
+        except OSError as e:
+            print(f"Writing rendition manifest failed: {e}")
+            timer.error = str(e)
+            return None
+
+        self.last_manifest = manifest
+        return manifest_path
+
+    def _generate_with_vips(self, image_path, output_dir, base_name, widths):
+        """Decode once via thumbnail (shrink-on-load) and derive every width from it."""
+        timer = self.last_stats
+        with timer.stage("decode"):
+            # Die größte Rendition bleibt im Speicher, alle kleineren leiten sich davon ab
+            current = pyvips.Image.thumbnail(
+                image_path, widths[0], height=UNBOUNDED, size="down"
+            ).copy_memory()
+
+        kernel = ImageResizer.VIPS_FILTERS.get(self.filter, "lanczos3")
+        renditions = []
+        written_widths = set()
+        for width in widths:
+            if width < current.width:
+                with timer.stage("transform"):
+                    current = current.resize(width / current.width, kernel=kernel).copy_memory()
+            if current.width in written_widths:
+                continue
+            written_widths.add(current.width)
+
+            for output_format in self.formats:
+                path = self._rendition_path(output_dir, base_name, current.width, output_format)
+                self._save_with_vips(current, path, output_format)
+                renditions.append(
+                    self._describe(path, current.width, current.height, output_format)
+                )
+
+        return renditions
+
+    def _save_with_vips(self, image, path, output_format):
+        """Encode one rendition with the optimizer matching its format."""
+        timer = self.last_stats
+        if output_format == "JPEG":
+            self.jpeg_optimizer.save_image(image, path, timer)
+        elif output_format == "PNG":
+            self.png_optimizer.save_image(image, path, timer)
+        else:
+            self.converter.save_image(image, path, output_format, timer)
+
+    def _generate_with_pil(self, image_path, output_dir, base_name, widths):
+        """Fallback using Pillow's draft mode (JPEG DCT scaling) and successive resizes."""
+        timer = self.last_stats
+        try:
+            with Image.open(image_path) as img:
+                with timer.stage("decode"):
+                    img.draft(None, (widths[0], widths[0]))
+                    current = ImageOps.exif_transpose(img)
+                    current.load()
+
+                resample = ImageResizer.PIL_FILTERS.get(self.filter, Image.Resampling.LANCZOS)
+                renditions = []
+                written_widths = set()
+                for width in widths:
+                    if width < current.width:
+                        height = max(1, round(current.height * width / current.width))
+                        with timer.stage("transform"):
+                            current = current.resize((width, height), resample=resample)
+                    if current.width in written_widths:
+                        continue
+                    written_widths.add(current.width)
+
+                    for output_format in self.formats:
+                        path = self._rendition_path(
+                            output_dir, base_name, current.width, output_format
+                        )
+                        self._save_with_pil(current, path, output_format)
+                        renditions.append(
+                            self._describe(path, current.width, current.height, output_format)
+                        )
+
+                return renditions
+
+        except Exception as e:
+            print(f"PIL rendition generation failed: {e}")
+            timer.error = str(e)
+            return None
+
+    def _save_with_pil(self, img, path, output_format):
+        """Encode one rendition with Pillow."""
+        timer = self.last_stats
+        save_kwargs = {"format": output_format}
+        if output_format in ImageConverter.LOSSY_FORMATS:
+            save_kwargs["quality"] = self.quality
+        if output_format == "JPEG":
+            save_kwargs["optimize"] = True
+            save_kwargs["progressive"] = True
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+        with timer.stage("encode"):
+            buffer = io.BytesIO()
+            img.save(buffer, **save_kwargs)
+        write_bytes(path, buffer.getvalue(), timer)
+
+    def _rendition_path(self, output_dir, base_name, width, output_format):
+        """Return the file path of one rendition."""
+        ext = ImageConverter.SUPPORTED_FORMATS.get(output_format, ["png"])[0]
+        return os.path.join(output_dir, f"{base_name}-{width}w.{ext}")
+
+    def _describe(self, path, width, height, output_format):
+        """Return the manifest entry of one written rendition."""
+        return {
+            "file": os.path.basename(path),
+            "width": width,
+            "height": height,
+            "format": output_format,
+            "bytes": os.path.getsize(path),
+        }
+
+    def set_widths(self, widths):
+        """Set the target widths in pixels."""
+        self.widths = sorted({int(width) for width in widths if int(width) > 0})
+
+    def set_formats(self, formats):
+        """Set the output formats (keys of ImageConverter.SUPPORTED_FORMATS)."""
+        self.formats = [fmt for fmt in formats if fmt in ImageConverter.SUPPORTED_FORMATS]
+
+    def set_quality(self, quality):
+        """Set quality for lossy formats (1-100)."""
+        self.quality = max(1, min(100, int(quality)))
+        self.jpeg_optimizer.set_quality(self.quality)
+        self.converter.set_quality(self.quality)
+
+    def set_filter(self, filter_name):
+        """Set the interpolation filter used between renditions."""
+        if filter_name in ImageResizer.VIPS_FILTERS:
+            self.filter = filter_name
@@ -2,9 +2,69 @@
 Image resizing helpers with several interpolation filters.
 """
 
+import io
+import os
+
 import pyvips
 from PIL import Image
 
+from ..utils.stats import StageTimer, write_bytes, write_image
+
+# Pillow reduce() only down to this multiple of the final size, the filter does the rest
+REDUCING_GAP = 2
+
+# Largest coordinate libvips accepts (VIPS_MAX_COORD); leaves one edge of a
+# thumbnail box open
+UNBOUNDED = 10000000
+
+# Largest image the Pillow fallback may decode in streaming mode; it holds
+# every pixel in memory
+MAX_FALLBACK_PIXELS = 100_000_000
+
+# Output suffixes whose libvips savers write every page as an animation frame
+ANIMATED_SUFFIXES = (".gif", ".webp")
+
+
+def loader_suffix(image):
+    """Return a file suffix for the format a pyvips image was loaded from."""
+    try:
+        loader = image.get("vips-loader")
+    except pyvips.Error:
+        return ".png"
+    # z.B. "jpegload_buffer" -> ".jpeg"
+    return "." + loader.split("load")[0]
+
+
+def page_height(image):
+    """Return the height of one frame of a multi-page pyvips image."""
+    if image.get_typeof("page-height"):
+        height = image.get("page-height")
+        if 0 < height <= image.height and image.height % height == 0:
+            return height
+    return image.height
+
+
+def is_animated(source, suffix=None):
+    """
+    Return True if source has several frames and suffix can store them.
+
+    Only the header of source is read.
+
+    Args:
+        source: Input path or encoded bytes.
+        suffix: Output file suffix (defaults to the input format).
+    """
+    try:
+        if isinstance(source, bytes):
+            header = pyvips.Image.new_from_buffer(source, "")
+        else:
+            header = pyvips.Image.new_from_file(source)
+    except pyvips.Error:
+        return False
+    if header.get_typeof("n-pages") == 0 or header.get("n-pages") < 2:
+        return False
+    return (suffix or loader_suffix(header)).lower() in ANIMATED_SUFFIXES
+
 
 class ImageResizer:
     """Resize images with multiple interpolation filters."""
@@ -27,14 +87,38 @@ class ImageResizer:
         "lanczos3": Image.Resampling.LANCZOS,
     }
 
+    # Fit modes of the thumbnail mode as pyvips thumbnail options
+    THUMBNAIL_FITS = {
+        "inside": {"size": "both"},
+        "cover": {"size": "both", "crop": "centre"},
+        "exact": {"size": "force"},
+        "down": {"size": "down"},
+    }
+
+    # Which part of the image cover keeps: the middle, the most detailed
+    # region or the most salient one (skin tones, saturation, edges; no
+    # face detection)
+    CROP_MODES = ("centre", "entropy", "attention")
+
     def __init__(self):
         self.filter = "lanczos3"
         self.maintain_aspect_ratio = True
+        self.thumbnail = False
+        self.fit = "inside"
+        self.crop = "centre"
+        self.streaming = False
+        self.max_fallback_pixels = MAX_FALLBACK_PIXELS
+        self.last_stats = None
 
     def resize(self, image_path, output_path, width=None, height=None, scale=None):
         """
         Resize an image while optionally preserving aspect ratio.
 
+        In thumbnail mode the image is shrunk while it is decoded and fitted
+        to the width x height box according to fit. In streaming mode the
+        source is read sequentially and the result is encoded straight into
+        the output file, so memory stays bounded by a few strips of pixels.
+
         Args:
             image_path: Input file path.
             output_path: Output path.
@@ -45,91 +129,330 @@ class ImageResizer:
         Returns:
             Output path or None on failure.
         """
+        timer = self.last_stats = StageTimer("pyvips")
         try:
-            image = pyvips.Image.new_from_file(image_path)
-            original_width = image.width
-            original_height = image.height
-
-            if scale is not None:
-                new_width = int(original_width * scale)
-                new_height = int(original_height * scale)
-            elif width is not None and height is not None:
-                new_width = width
-                new_height = height
-            elif width is not None:
-                if self.maintain_aspect_ratio:
-                    aspect = original_height / original_width
-                    new_width = width
-                    new_height = int(width * aspect)
-                else:
-                    new_width = width
-                    new_height = original_height
-            elif height is not None:
-                if self.maintain_aspect_ratio:
-                    aspect = original_width / original_height
-                    new_width = int(height * aspect)
-                    new_height = height
-                else:
-                    new_width = original_width
-                    new_height = height
-            else:
+            resized = self._load_resized(
+                image_path, os.path.splitext(output_path)[1], width, height, scale
+            )
+            if resized is None:
                 return None
 
-            vips_filter = self.VIPS_FILTERS.get(self.filter, "lanczos3")
-
-            resized = image.resize(new_width / original_width, vscale=new_height / original_height, kernel=vips_filter)
+            if self.streaming:
+                write_image(resized, output_path, image_path, timer)
+                return output_path
 
-            resized.write_to_file(output_path)
+            with timer.stage("encode"):
+                data = resized.write_to_buffer(os.path.splitext(output_path)[1])
+            write_bytes(output_path, data, timer)
 
             return output_path
 
         except Exception as e:
             print(f"pyvips resize failed: {e}")
+            timer.error = str(e)
             return self._resize_with_pil(image_path, output_path, width, height, scale)
 
+    def resize_bytes(self, data, width=None, height=None, scale=None, suffix=None):
+        """
+        Resize an encoded image held in memory.
+
+        Args:
+            data: Encoded input image.
+            width: New width in pixels.
+            height: New height in pixels.
+            scale: Scale factor (e.g. 0.5 for 50%).
+            suffix: Output format as file suffix (e.g. ".webp"); defaults to
+                the input format.
+
+        Returns:
+            Tuple of (encoded bytes or None on failure, StageTimer).
+        """
+        timer = self.last_stats = StageTimer("pyvips")
+        try:
+            resized = self._load_resized(data, suffix, width, height, scale)
+            if resized is None:
+                return None, timer
+
+            with timer.stage("encode"):
+                return resized.write_to_buffer(suffix or loader_suffix(resized)), timer
+
+        except Exception as e:
+            print(f"pyvips resize failed: {e}")
+            timer.error = str(e)
+            return self._encode_with_pil(io.BytesIO(data), width, height, scale, suffix), timer
+
+    def _load_resized(self, source, suffix, width, height, scale):
+        """
+        Decode and resize a path or buffer.
+
+        Animations are loaded with all frames if suffix can store them;
+        other images are shrunk on load in thumbnail mode.
+
+        Returns:
+            Resized pyvips image or None if no size was given.
+        """
+        timer = self.last_stats
+        with timer.stage("decode"):
+            if is_animated(source, suffix):
+                # n=-1 lädt alle Frames untereinander in ein hohes Bild
+                image = self._open(source, n=-1)
+            elif self.thumbnail:
+                return self.load_thumbnail(source, width, height, scale)
+            else:
+                image = self._open(source, **self._access())
+        with timer.stage("transform"):
+            return self.resize_image(image, width, height, scale)
+
+    def _open(self, source, **options):
+        """Open a path or buffer with libvips."""
+        if isinstance(source, bytes):
+            return pyvips.Image.new_from_buffer(source, "", **options)
+        return pyvips.Image.new_from_file(source, **options)
+
+    def resize_image(self, image, width=None, height=None, scale=None):
+        """
+        Resize a pyvips image lazily.
+
+        If both width and height are given and the aspect ratio is kept,
+        the image is fitted to the box like a thumbnail instead of being
+        stretched; cover crops the shrunk image with the crop mode. The
+        frames of a multi-page image are resized one by one.
+
+        Args:
+            image: pyvips image.
+            width: New width in pixels.
+            height: New height in pixels.
+            scale: Scale factor (e.g. 0.5 for 50%).
+
+        Returns:
+            Resized pyvips image or None if no size was given.
+        """
+        frame_height = page_height(image)
+        if frame_height != image.height:
+            return self._resize_frames(image, frame_height, width, height, scale)
+
+        if self.thumbnail:
+            options = self._thumbnail_options(image.width, image.height, width, height, scale)
+            if options is None:
+                return None
+            return image.thumbnail_image(options.pop("width"), **options)
+
+        target = self._target_size(image.width, image.height, width, height, scale)
+        if target is None:
+            return None
+        new_width, new_height = target
+
+        vips_filter = self.VIPS_FILTERS.get(self.filter, "lanczos3")
+
+        if self._fits_box(width, height, scale):
+            return self._fit_image(image, new_width, new_height, vips_filter)
+
+        return image.resize(
+            new_width / image.width, vscale=new_height / image.height, kernel=vips_filter
+        )
+
+    def _resize_frames(self, image, frame_height, width, height, scale):
+        """Resize every frame of a multi-page image and stack them again."""
+        frames = [
+            self.resize_image(image.crop(0, top, image.width, frame_height), width, height, scale)
+            for top in range(0, image.height, frame_height)
+        ]
+        if frames[0] is None:
+            return None
+        # Verzögerungen und Schleifenzahl übernimmt arrayjoin vom ersten Frame
+        resized = pyvips.Image.arrayjoin(frames, across=1).copy()
+        resized.set_type(pyvips.GValue.gint_type, "page-height", frames[0].height)
+        return resized
+
+    def _fits_box(self, width, height, scale):
+        """Return whether a resize fits a width x height box instead of stretching."""
+        return self._fit_mode() != "exact" and scale is None and None not in (width, height)
+
+    def _fit_image(self, image, width, height, vips_filter):
+        """Fit a pyvips image to a box, cropping the downscaled image for cover."""
+        fit = self._fit_mode()
+        if fit == "cover":
+            ratio = max(width / image.width, height / image.height)
+        else:
+            ratio = min(width / image.width, height / image.height)
+            if fit == "down":
+                ratio = min(ratio, 1.0)
+        resized = image.resize(ratio, kernel=vips_filter)
+        if fit != "cover":
+            return resized
+
+        width = min(width, resized.width)
+        height = min(height, resized.height)
+        if self.crop == "centre":
+            left = (resized.width - width) // 2
+            top = (resized.height - height) // 2
+            return resized.crop(left, top, width, height)
+        # Die Bewertung liest das verkleinerte Bild zweimal, daher im Speicher halten
+        return resized.copy_memory().smartcrop(width, height, interesting=self.crop)
+
+    def _access(self):
+        """Return the pyvips load options for the current access mode."""
+        return {"access": "sequential"} if self.streaming else {}
+
+    def load_thumbnail(self, source, width=None, height=None, scale=None):
+        """
+        Decode a path or buffer directly at the target size.
+
+        pyvips thumbnail decodes JPEG at a reduced DCT scale, lets WebP,
+        HEIF, PDF and SVG render at the target size and reads sequentially,
+        so large downscales never hold the full-size image.
+
+        Args:
+            source: Input path or encoded bytes.
+            width: Width of the target box in pixels.
+            height: Height of the target box in pixels.
+            scale: Scale factor (e.g. 0.5 for 50%).
+
+        Returns:
+            pyvips image or None if no size was given.
+        """
+        header = self._open(source)
+        options = self._thumbnail_options(header.width, header.height, width, height, scale)
+        if options is None:
+            return None
+        target_width = options.pop("width")
+        if isinstance(source, bytes):
+            return pyvips.Image.thumbnail_buffer(source, target_width, **options)
+        return pyvips.Image.thumbnail(source, target_width, **options)
+
+    def _fit_mode(self):
+        """Return the effective fit mode (exact if the aspect ratio is not kept)."""
+        return self.fit if self.maintain_aspect_ratio else "exact"
+
+    def _thumbnail_options(self, original_width, original_height, width, height, scale):
+        """Return pyvips thumbnail options including the target width, or None."""
+        target = self._target_size(original_width, original_height, width, height, scale)
+        if target is None:
+            return None
+        box_width, box_height = self._fit_box(target, width, height, scale)
+        options = dict(self.THUMBNAIL_FITS[self._fit_mode()])
+        if "crop" in options:
+            options["crop"] = self.crop
+        # Ausrichtung wie beim normalen Skalieren unverändert lassen
+        options.update(width=box_width, height=box_height, no_rotate=True)
+        return options
+
+    def _fit_box(self, target, width, height, scale):
+        """Return the thumbnail box for a target size, leaving derived edges open."""
+        box_width, box_height = target
+        if self._fit_mode() in ("inside", "down"):
+            # Abgeleitete Kante nicht begrenzen, sonst kostet das Abrunden ein Pixel
+            if scale is not None or height is None:
+                box_height = UNBOUNDED
+            elif width is None:
+                box_width = UNBOUNDED
+        return box_width, box_height
+
+    def _target_size(self, original_width, original_height, width, height, scale):
+        """Compute the output size or None if no size was given."""
+        if scale is not None:
+            return int(original_width * scale), int(original_height * scale)
+        if width is not None and height is not None:
+            return width, height
+        if width is not None:
+            if self.maintain_aspect_ratio:
+                aspect = original_height / original_width
+                return width, int(width * aspect)
+            return width, original_height
+        if height is not None:
+            if self.maintain_aspect_ratio:
+                aspect = original_width / original_height
+                return int(height * aspect), height
+            return original_width, height
+        return None
+
     def _resize_with_pil(self, image_path, output_path, width, height, scale):
         """Fallback that uses Pillow for resizing."""
+        data = self._encode_with_pil(
+            image_path, width, height, scale, os.path.splitext(output_path)[1]
+        )
+        if data is None:
+            return None
+        write_bytes(output_path, data, self.last_stats)
+        return output_path
+
+    def _encode_with_pil(self, source, width, height, scale, suffix=None):
+        """Resize a path or file object with Pillow, returning encoded bytes or None."""
+        timer = self.last_stats
+        timer.backend = "pil"
         try:
-            with Image.open(image_path) as img:
-                original_width, original_height = img.size
-
-                if scale is not None:
-                    new_width = int(original_width * scale)
-                    new_height = int(original_height * scale)
-                elif width is not None and height is not None:
-                    new_width = width
-                    new_height = height
-                elif width is not None:
-                    if self.maintain_aspect_ratio:
-                        aspect = original_height / original_width
-                        new_width = width
-                        new_height = int(width * aspect)
-                    else:
-                        new_width = width
-                        new_height = original_height
-                elif height is not None:
-                    if self.maintain_aspect_ratio:
-                        aspect = original_width / original_height
-                        new_width = int(height * aspect)
-                        new_height = height
-                    else:
-                        new_width = original_width
-                        new_height = height
-                else:
+            with Image.open(source) as img:
+                target = self._target_size(img.width, img.height, width, height, scale)
+                if target is None:
                     return None
 
+                with timer.stage("decode"):
+                    if self.thumbnail:
+                        # JPEG per DCT-Skalierung, aber nie kleiner als das Ziel
+                        img.draft(img.mode, target)
+                    limit = self.max_fallback_pixels if self.streaming else None
+                    if limit and img.width * img.height > limit:
+                        raise ValueError(
+                            f"{img.width}x{img.height} pixels exceed the Pillow fallback limit"
+                        )
+                    img.load()
+
                 pil_filter = self.PIL_FILTERS.get(self.filter, Image.Resampling.LANCZOS)
 
-                resized = img.resize((new_width, new_height), resample=pil_filter)
+                with timer.stage("transform"):
+                    if self.thumbnail or self._fits_box(width, height, scale):
+                        box = self._fit_box(target, width, height, scale)
+                        resized = self._fit_with_pil(img, box, pil_filter)
+                    else:
+                        resized = img.resize(target, resample=pil_filter)
 
-                resized.save(output_path)
+                extension = (suffix or "").lower()
+                pil_format = Image.registered_extensions().get(extension, img.format)
 
-                return output_path
+                with timer.stage("encode"):
+                    buffer = io.BytesIO()
+                    resized.save(buffer, format=pil_format)
+                return buffer.getvalue()
 
         except Exception as e:
             print(f"PIL resize failed: {e}")
+            timer.error = str(e)
             return None
 
+    def _fit_with_pil(self, img, box, resample):
+        """
+        Fit a Pillow image to a thumbnail box, reducing by integer factors first.
+
+        Pillow has no saliency analysis, so cover always keeps the centre.
+        """
+        target_width, target_height = box
+        fit = self._fit_mode()
+        crop = None
+        if fit in ("inside", "down"):
+            ratio = min(target_width / img.width, target_height / img.height)
+            if fit == "down":
+                ratio = min(ratio, 1.0)
+            size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+        elif fit == "cover":
+            ratio = max(target_width / img.width, target_height / img.height)
+            size = (
+                max(target_width, round(img.width * ratio)),
+                max(target_height, round(img.height * ratio)),
+            )
+            left = (size[0] - target_width) // 2
+            top = (size[1] - target_height) // 2
+            crop = (left, top, left + target_width, top + target_height)
+        else:
+            size = box
+
+        factor = int(min(img.width / size[0], img.height / size[1]) / REDUCING_GAP)
+        if factor > 1:
+            img = img.reduce(factor)
+        resized = img.resize(size, resample=resample)
+        if crop is not None:
+            resized = resized.crop(crop)
+        return resized
+
     def set_filter(self, filter_name):
         """Set interpolation filter."""
         if filter_name in self.VIPS_FILTERS:
@@ -139,3 +462,24 @@ class ImageResizer:
         """Toggle whether the aspect ratio should be preserved."""
         self.maintain_aspect_ratio = bool(maintain)
 
+    def set_thumbnail(self, thumbnail):
+        """Toggle the shrink-on-load thumbnail mode."""
+        self.thumbnail = bool(thumbnail)
+
+    def set_fit(self, fit):
+        """Set how images fit a width x height box (inside, cover, exact or down)."""
+        if fit in self.THUMBNAIL_FITS:
+            self.fit = fit
+
+    def set_crop(self, crop):
+        """Set the part of the image cover keeps (centre, entropy or attention)."""
+        if crop in self.CROP_MODES:
+            self.crop = crop
+
+    def set_streaming(self, streaming):
+        """Toggle sequential decoding with output written straight to disk."""
+        self.streaming = bool(streaming)
+
+    def set_max_fallback_pixels(self, max_pixels):
+        """Set the pixel limit of the Pillow fallback in streaming mode (None = no limit)."""
+        self.max_fallback_pixels = max(1, int(max_pixels)) if max_pixels else None
@@ -0,0 +1,53 @@
+"""
+Quality search for a target file size using in-memory encodes.
+"""
+
+
+def search_quality(encode, target_size, max_quality=100, tolerance=0.05, max_iterations=8):
+    """
+    Find the highest quality whose encode fits into target_size bytes.
+
+    The maximum quality is tried first, so images that already fit cost a
+    single encode. Otherwise the range below it is bisected until an encode
+    lands within tolerance below the target or the iteration cap is hit.
+    Only in-memory buffers are produced; nothing is written to disk.
+
+    Args:
+        encode: Callable(quality) returning the encoded bytes.
+        target_size: Maximum output size in bytes.
+        max_quality: Highest quality to consider (1-100).
+        tolerance: Accept an encode this fraction below the target (0.05 = 5%).
+        max_iterations: Maximum number of encodes.
+
+    Returns:
+        Tuple of (quality, encoded bytes). If not even quality 1 fits, the
+        smallest encode found is returned.
+    """
+    attempts = {}
+
+    def attempt(quality):
+        if quality not in attempts:
+            attempts[quality] = encode(quality)
+        return attempts[quality]
+
+    data = attempt(max_quality)
+    if len(data) <= target_size:
+        return max_quality, data
+
+    best = None
+    low, high = 1, max_quality - 1
+    while low <= high and len(attempts) < max_iterations:
+        quality = (low + high) // 2
+        data = attempt(quality)
+        if len(data) <= target_size:
+            best = quality
+            # Nah genug am Ziel, weitere Versuche lohnen nicht
+            if len(data) >= target_size * (1 - tolerance):
+                break
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        best = min(attempts, key=lambda q: len(attempts[q]))
+    return best, attempts[best]
@@ -5,13 +5,25 @@ Simple configuration helper for nodiView.
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
-from gi.repository import GLib
+try:
+    from gi.repository import GLib
+except ImportError:  # headless use without PyGObject
+    GLib = None
 
 DEFAULT_CONFIG = {"language": "en"}
 
-CONFIG_DIR = Path(GLib.get_user_config_dir()) / "nodiview"
+
+def _user_config_dir() -> str:
+    """Return the XDG config directory, via GLib when available."""
+    if GLib is not None:
+        return GLib.get_user_config_dir()
+    return os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+
+
+CONFIG_DIR = Path(_user_config_dir()) / "nodiview"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
 
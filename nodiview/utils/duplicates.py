@@ -0,0 +1,313 @@
+"""
+Perceptual-hash index for finding duplicate and near-duplicate images.
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pyvips
+from PIL import Image
+
+INDEX_VERSION = 1
+HASH_ALGORITHMS = ("dhash", "phash")
+
+# Side of the grayscale thumbnail both hashes are derived from
+_THUMB_SIZE = 32
+_PHASH_SIZE = 8
+
+# Cosinus-Tabelle für die DCT der pHash-Berechnung
+_DCT = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * _THUMB_SIZE)) for x in range(_THUMB_SIZE)]
+    for u in range(_PHASH_SIZE)
+]
+
+
+def default_index_path():
+    """Return the default location of the hash index in the user cache directory."""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_dir, "nodiview", "hashes.json")
+
+
+def hamming_distance(first, second):
+    """Return the number of differing bits of two hashes."""
+    return (first ^ second).bit_count()
+
+
+def _grayscale_thumbnails(image_path):
+    """
+    Return the pixels of a 32x32 and a 9x8 grayscale thumbnail as flat lists.
+
+    Both come from a single shrink-on-load decode.
+    """
+    try:
+        # Shrink-on-load: JPEG/WebP werden schon beim Dekodieren verkleinert
+        image = pyvips.Image.thumbnail(
+            image_path, _THUMB_SIZE, height=_THUMB_SIZE, size="force"
+        )
+        if image.hasalpha():
+            image = image.flatten(background=[255] * (image.bands - 1))
+        if image.bands >= 3:
+            image = image.colourspace("b-w")
+        image = image[0].cast("uchar").copy_memory()
+        grid = image.resize(9 / _THUMB_SIZE, vscale=8 / _THUMB_SIZE, kernel="linear")
+        grid = grid.cast("uchar")
+        return list(bytes(image.write_to_memory())), list(bytes(grid.write_to_memory()))
+    except Exception:
+        pass
+
+    with Image.open(image_path) as img:
+        img.draft("L", (_THUMB_SIZE, _THUMB_SIZE))
+        img = img.convert("L").resize((_THUMB_SIZE, _THUMB_SIZE), Image.Resampling.BOX)
+        grid = img.resize((9, 8), Image.Resampling.BOX)
+        return list(img.getdata()), list(grid.getdata())
+
+
+def _dhash(pixels):
+    """Difference hash: compare horizontally adjacent pixels of a 9x8 thumbnail."""
+    value = 0
+    for row in range(8):
+        cells = pixels[row * 9 : (row + 1) * 9]
+        for left, right in zip(cells, cells[1:]):
+            value = (value << 1) | (left < right)
+    return value
+
+
+def _phash(pixels):
+    """DCT hash: compare the 8x8 lowest frequencies against their median."""
+    rows = [pixels[y * _THUMB_SIZE : (y + 1) * _THUMB_SIZE] for y in range(_THUMB_SIZE)]
+    # Zeilen-DCT, danach Spalten-DCT (nur die 8 niedrigsten Frequenzen)
+    row_coefficients = [
+        [sum(value * cos for value, cos in zip(row, _DCT[u])) for u in range(_PHASH_SIZE)]
+        for row in rows
+    ]
+    coefficients = [
+        sum(row_coefficients[y][u] * _DCT[v][y] for y in range(_THUMB_SIZE))
+        for v in range(_PHASH_SIZE)
+        for u in range(_PHASH_SIZE)
+    ]
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def compute_hashes(image_path):
+    """
+    Compute the dHash and pHash of an image from one shrink-on-load thumbnail.
+
+    Args:
+        image_path: Image file path.
+
+    Returns:
+        Dict with "dhash" and "phash" as 64-bit integers, or None on failure.
+    """
+    try:
+        pixels, grid = _grayscale_thumbnails(image_path)
+    except Exception as e:
+        print(f"Hashing {image_path} failed: {e}")
+        return None
+    return {"dhash": _dhash(grid), "phash": _phash(pixels)}
+
+
+def image_signature(image_path):
+    """
+    Return (width, height, format) from an image header, or None if unreadable.
+
+    Two files can only share one output if their signatures are equal.
+    """
+    try:
+        with Image.open(image_path) as img:
+            return img.size + (img.format,)
+    except (OSError, ValueError):
+        return None
+
+
+class BKTree:
+    """Burkhard-Keller tree for Hamming-distance queries over 64-bit hashes."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        """Insert a hash with an arbitrary payload."""
+        self.size += 1
+        if self.root is None:
+            self.root = (value, item, {})
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, item, {})
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Return (distance, item) pairs within max_distance, closest first."""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                matches.append((distance, item))
+            # Dreiecksungleichung: nur Kinder im Band [d - N, d + N] können passen
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def nearest(self, value, max_distance):
+        """Return the closest item within max_distance, or None."""
+        matches = self.search(value, max_distance)
+        return matches[0][1] if matches else None
+
+
+class HashIndex:
+    """Persistent perceptual hashes keyed by absolute path, size and mtime."""
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        """Read the index from disk, starting empty if it is missing or invalid."""
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            self.entries = data.get("files", {})
+
+    def save(self):
+        """Write the index atomically if it changed."""
+        if not self.changed:
+            return
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"version": INDEX_VERSION, "files": self.entries}, handle)
+            os.replace(temp_path, self.path)
+            self.changed = False
+        except OSError as e:
+            print(f"Saving hash index failed: {e}")
+
+    def get(self, image_path, algorithm="dhash"):
+        """Return the cached hash of an image if the file is unchanged, else None."""
+        entry = self.entries.get(os.path.abspath(image_path))
+        if not entry:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        if stat.st_size != entry.get("size") or stat.st_mtime_ns != entry.get("mtime_ns"):
+            return None
+        value = entry.get(algorithm)
+        return int(value, 16) if value else None
+
+    def update(self, image_paths, workers=None):
+        """
+        Hash all new or modified images in parallel.
+
+        libvips decodes the thumbnails outside the GIL, so a thread pool
+        is enough to use several cores.
+
+        Args:
+            image_paths: Iterable of image paths.
+            workers: Number of threads (defaults to the CPU count).
+        """
+        missing = [path for path in image_paths if self.get(path) is None]
+        if not missing:
+            return
+
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(missing) == 1:
+            results = map(compute_hashes, missing)
+            self._store(missing, results)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self._store(missing, executor.map(compute_hashes, missing))
+
+    def _store(self, image_paths, results):
+        """Remember computed hashes together with size and mtime."""
+        for image_path, hashes in zip(image_paths, results):
+            if hashes is None:
+                continue
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                continue
+            self.entries[os.path.abspath(image_path)] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                **{name: f"{value:016x}" for name, value in hashes.items()},
+            }
+            self.changed = True
+
+
+def find_duplicate_groups(
+    image_paths, max_distance=4, algorithm="dhash", index=None, workers=None
+):
+    """
+    Group images whose perceptual hashes are within a Hamming distance.
+
+    Neighbours are looked up in a BK-tree instead of comparing every pair;
+    groups are the connected components of the "within distance" relation.
+
+    Args:
+        image_paths: Iterable of image paths.
+        max_distance: Maximum Hamming distance (0 finds visually identical images).
+        algorithm: "dhash" or "phash".
+        index: Optional HashIndex to reuse and update (saved by the caller).
+        workers: Number of hashing threads.
+
+    Returns:
+        List of groups (sorted lists of paths with at least two entries).
+    """
+    image_paths = list(image_paths)
+    if index is None:
+        index = HashIndex()
+    index.update(image_paths, workers)
+
+    tree = BKTree()
+    hashes = {}
+    for image_path in image_paths:
+        value = index.get(image_path, algorithm)
+        if value is not None:
+            hashes[image_path] = value
+            tree.add(value, image_path)
+
+    # Union-Find über alle Treffer innerhalb der Distanz
+    parents = {image_path: image_path for image_path in hashes}
+
+    def root(image_path):
+        while parents[image_path] != image_path:
+            parents[image_path] = parents[parents[image_path]]
+            image_path = parents[image_path]
+        return image_path
+
+    for image_path, value in hashes.items():
+        for _distance, other in tree.search(value, max_distance):
+            first, second = root(image_path), root(other)
+            if first != second:
+                parents[second] = first
+
+    groups = {}
+    for image_path in hashes:
+        groups.setdefault(root(image_path), []).append(image_path)
+    return sorted(
+        (sorted(group) for group in groups.values() if len(group) > 1), key=lambda g: g[0]
+    )
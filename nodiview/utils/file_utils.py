@@ -2,6 +2,7 @@
 File helper utilities.
 """
 
+import fnmatch
 import os
 
 
@@ -45,3 +46,41 @@ def get_image_files_in_directory(directory):
 
     return image_files
 
+
+def iter_image_files(directory, recursive=False, include=None, exclude=None):
+    """
+    Lazily yield image files below a directory in sorted order.
+
+    Args:
+        directory: Directory to scan.
+        recursive: Descend into subdirectories.
+        include: Optional glob patterns; a file must match at least one.
+        exclude: Optional glob patterns; matching files are skipped.
+
+    Patterns are matched against both the file name and the path relative
+    to directory.
+    """
+    if not directory or not os.path.isdir(directory):
+        return
+
+    def matches(relative_path, patterns):
+        name = os.path.basename(relative_path)
+        return any(
+            fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+            for pattern in patterns
+        )
+
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        if not recursive:
+            dirs.clear()
+        for filename in sorted(files):
+            filepath = os.path.join(root, filename)
+            if not is_image_file(filepath):
+                continue
+            relative_path = os.path.relpath(filepath, directory)
+            if include and not matches(relative_path, include):
+                continue
+            if exclude and matches(relative_path, exclude):
+                continue
+            yield filepath
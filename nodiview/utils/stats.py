@@ -0,0 +1,131 @@
+"""
+Per-stage timing and memory helpers for image operations.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+
+STAGES = ("decode", "transform", "encode", "write")
+
+
+class StageTimer:
+    """Collect stage timings, backend, chosen quality and last error of one operation."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.bytes_written = 0
+        self.quality = None
+        self.error = None
+
+    @contextmanager
+    def stage(self, name):
+        """Add the wall-clock time of the enclosed block to a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def merge(self, other):
+        """Add the timings of another timer (e.g. a fallback or earlier stage)."""
+        if other is None:
+            return
+        for name, value in other.times.items():
+            self.times[name] += value
+        self.bytes_written += other.bytes_written
+        if other.backend and other.backend != self.backend:
+            self.backend = f"{self.backend}+{other.backend}" if self.backend else other.backend
+        if other.quality is not None:
+            self.quality = other.quality
+        if other.error:
+            self.error = other.error
+
+    def as_dict(self):
+        """Return the timings as flat record fields."""
+        record = {"backend": self.backend, "quality": self.quality}
+        for name in STAGES:
+            record[f"{name}_time"] = self.times[name]
+        return record
+
+
+def measure(timer, name):
+    """Time a stage on timer, or do nothing if timer is None."""
+    if timer is None:
+        return nullcontext()
+    return timer.stage(name)
+
+
+def write_bytes(path, data, timer=None):
+    """Write an encoded buffer to disk, timing it as the write stage."""
+    with measure(timer, "write"):
+        with open(path, "wb") as handle:
+            handle.write(data)
+    if timer is not None:
+        timer.bytes_written += len(data)
+
+
+def write_image(image, path, source_path=None, timer=None):
+    """
+    Encode a pyvips image straight into a file, timing it as the encode stage.
+
+    libvips pulls the pixels strip by strip while it writes, so neither the
+    decoded nor the encoded image is held in memory. If path is the file the
+    image is still being read from, the output goes to a temporary file
+    next to it that replaces the source afterwards.
+
+    Args:
+        image: pyvips image.
+        path: Destination path; the suffix selects the saver.
+        source_path: Path the image is read from, if any.
+        timer: Optional StageTimer.
+    """
+    target = path
+    if source_path is not None and os.path.exists(path) and os.path.samefile(source_path, path):
+        directory, name = os.path.split(os.path.abspath(path))
+        handle, target = tempfile.mkstemp(
+            dir=directory, prefix=".", suffix=os.path.splitext(name)[1]
+        )
+        os.close(handle)
+
+    try:
+        with measure(timer, "encode"):
+            image.write_to_file(target)
+        if target != path:
+            shutil.copymode(path, target)
+            os.replace(target, path)
+    finally:
+        if target != path and os.path.exists(target):
+            os.remove(target)
+
+    if timer is not None:
+        timer.bytes_written += os.path.getsize(path)
+
+
+def reset_peak_memory():
+    """Reset the peak RSS counter of this process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory():
+    """Return the peak RSS of this process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
@@ -27,6 +27,7 @@ setup(
     entry_points={
         "console_scripts": [
             "nodiview=nodiview.main:main",
+            "nodiview-batch=nodiview.batch.cli:main",
         ],
     },
     package_data={
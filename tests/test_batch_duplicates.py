@@ -0,0 +1,78 @@
+"""
+Tests for duplicate handling in batch runs.
+"""
+
+import hashlib
+import os
+import shutil
+
+import pytest
+from PIL import Image, ImageDraw
+
+from nodiview.batch.batch_processor import BatchProcessor
+
+
+def _md5(path):
+    with open(path, "rb") as handle:
+        return hashlib.md5(handle.read()).hexdigest()
+
+
+def _photo(size=(1600, 1200)):
+    """Return an image with enough structure for stable perceptual hashes."""
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((200, 150, 900, 800), fill=(200, 40, 40))
+    draw.rectangle((1000, 500, 1500, 1100), fill=(30, 60, 180))
+    return img
+
+
+@pytest.fixture
+def near_duplicates(tmp_path):
+    """a.jpg, a re-encode of it at another quality and a downscaled copy."""
+    source = tmp_path / "src"
+    source.mkdir()
+    img = _photo()
+    img.save(source / "a.jpg", quality=95)
+    img.save(source / "b.jpg", quality=60)
+    img.resize((1200, 900)).save(source / "c.jpg", quality=95)
+    return source
+
+
+def _processor(tmp_path):
+    processor = BatchProcessor()
+    processor.set_duplicates("link", 4, "dhash", str(tmp_path / "hashes.json"))
+    return processor
+
+
+def test_link_in_place_is_refused_and_sources_stay_untouched(tmp_path, near_duplicates):
+    files = sorted(str(path) for path in near_duplicates.iterdir())
+    before = {path: _md5(path) for path in files}
+
+    with pytest.raises(ValueError):
+        _processor(tmp_path).optimize_batch(files, None)
+    with pytest.raises(ValueError):
+        list(_processor(tmp_path).iter_optimize(files, None))
+
+    assert {path: _md5(path) for path in files} == before
+
+
+def test_link_only_exact_duplicates(tmp_path, near_duplicates):
+    shutil.copy(near_duplicates / "a.jpg", near_duplicates / "d.jpg")
+    files = sorted(str(path) for path in near_duplicates.iterdir())
+    before = {path: _md5(path) for path in files}
+    output = tmp_path / "out"
+
+    records = {
+        os.path.basename(record["input"]): record
+        for record in _processor(tmp_path).iter_optimize(files, str(output))
+    }
+
+    assert {path: _md5(path) for path in files} == before
+    assert records["d.jpg"]["duplicate_of"] == str(near_duplicates / "a.jpg")
+    assert os.path.samefile(output / "a.jpg", output / "d.jpg")
+    # Near-duplicates are optimized on their own, never linked
+    for name in ("b.jpg", "c.jpg"):
+        assert records[name]["duplicate_of"] is None
+        assert not os.path.samefile(output / "a.jpg", output / name)
+    with Image.open(output / "c.jpg") as img:
+        assert img.size == (1200, 900)
@@ -0,0 +1,28 @@
+"""
+Tests for GIFOptimizer.
+"""
+
+import pytest
+from PIL import Image
+
+from nodiview.optimizer.gif_optimizer import GIFOptimizer
+
+
+def _animated_gif(path, **save_kwargs):
+    frames = [Image.new("RGB", (32, 32), (60 * index, 200 - 60 * index, 90)) for index in range(3)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=80, **save_kwargs)
+
+
+@pytest.mark.parametrize("save_kwargs", [{}, {"loop": 0}, {"loop": 3}])
+def test_loop_count_is_kept(tmp_path, save_kwargs):
+    source = tmp_path / "in.gif"
+    _animated_gif(source, **save_kwargs)
+    output = tmp_path / "out.gif"
+
+    assert GIFOptimizer().optimize(str(source), str(output))
+
+    with Image.open(output) as img:
+        assert img.n_frames == 3
+        assert img.info.get("loop") == save_kwargs.get("loop")
+    # Ohne Loop-Erweiterung wird die Animation nur einmal abgespielt
+    assert (b"NETSCAPE2.0" in output.read_bytes()) == ("loop" in save_kwargs)
@@ -0,0 +1,29 @@
+"""
+Tests for animated conversion in ImageConverter.
+"""
+
+import pytest
+from PIL import Image
+
+from nodiview.converter.image_converter import ImageConverter
+
+
+@pytest.fixture
+def animation(tmp_path):
+    path = tmp_path / "anim.gif"
+    frames = [Image.new("RGB", (32, 32), (index * 60, 0, 0)) for index in range(3)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=70, loop=0)
+    return path
+
+
+@pytest.mark.parametrize("engine", ImageConverter.ENGINES)
+@pytest.mark.parametrize("output_format", ["GIF", "WebP"])
+def test_animation_uses_the_configured_engine(tmp_path, animation, engine, output_format):
+    converter = ImageConverter()
+    converter.set_engine(engine)
+    output = tmp_path / f"out.{output_format.lower()}"
+
+    assert converter.convert(str(animation), str(output), output_format) == str(output)
+    assert converter.last_stats.backend == engine
+    with Image.open(output) as img:
+        assert img.n_frames == 3
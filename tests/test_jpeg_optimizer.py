@@ -0,0 +1,59 @@
+"""
+Tests for lossless JPEG recompression.
+"""
+
+from PIL import Image, ImageChops, ImageDraw
+
+from nodiview.optimizer.jpeg_optimizer import JPEGOptimizer
+
+
+def _photo(path):
+    img = Image.linear_gradient("L").resize((320, 240)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((40, 30, 200, 190), fill=(200, 40, 40))
+    draw.line((0, 0, 320, 240), fill=(20, 200, 60), width=5)
+    img.save(path, quality=90, optimize=False)
+
+
+def _pixels(path):
+    with Image.open(path) as img:
+        img.load()
+        return img.copy()
+
+
+def test_lossless_passes_keep_decoded_pixels(tmp_path):
+    source = tmp_path / "photo.jpg"
+    _photo(source)
+    original = _pixels(source)
+    optimizer = JPEGOptimizer()
+    optimizer.set_lossless(True)
+
+    # Wiederholte Durchläufe an Ort und Stelle dürfen nichts aufsummieren
+    for _run in range(3):
+        assert optimizer.optimize(str(source)) == str(source)
+        result = _pixels(source)
+        assert result.size == original.size
+        assert ImageChops.difference(result, original).getbbox() is None
+
+
+def test_lossless_uses_jpegtran_when_installed(tmp_path, monkeypatch):
+    source = tmp_path / "photo.jpg"
+    _photo(source)
+    data = source.read_bytes()
+    # Stellvertreter, der die Argumente festhält und den kleineren Strom liefert
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake = bin_dir / "jpegtran"
+    fake.write_text(
+        f'#!/bin/sh\necho "$@" > {tmp_path}/args\n/bin/cat > /dev/null\n/bin/cat {source}\n'
+    )
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+
+    optimizer = JPEGOptimizer()
+    optimizer.set_lossless(True)
+    optimizer.set_keep_exif(False)
+    result = optimizer.encode_lossless(data + b"\x00" * 64)
+
+    assert (tmp_path / "args").read_text().split() == ["-copy", "icc", "-optimize"]
+    assert result == data
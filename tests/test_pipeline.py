@@ -0,0 +1,114 @@
+"""
+Tests for the staged ImagePipeline path.
+"""
+
+import io
+
+from PIL import Image
+
+from nodiview.converter.image_converter import ImageConverter
+from nodiview.optimizer.gif_optimizer import GIFOptimizer
+from nodiview.optimizer.pipeline import ImagePipeline
+from nodiview.optimizer.resize import ImageResizer
+from nodiview.utils.stats import StageTimer
+
+
+def _gif_bytes():
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").convert("P").save(buffer, format="GIF")
+    return buffer.getvalue()
+
+
+def _animated_gif(path, frames=3):
+    images = [
+        Image.new("RGB", (120, 80), (80 * index, 255 - 80 * index, 40)) for index in range(frames)
+    ]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=100, loop=0)
+
+
+def _frames(source):
+    with Image.open(source) as img:
+        return img.size, getattr(img, "n_frames", 1)
+
+
+def _failing_resizer():
+    """Return a resizer whose resize steps fail like an undecodable input."""
+    resizer = ImageResizer()
+
+    def resize(image_path, output_path, width=None, height=None, scale=None):
+        resizer.last_stats = StageTimer("pyvips")
+        resizer.last_stats.error = "resize failed"
+        return None
+
+    def resize_bytes(data, width=None, height=None, scale=None, suffix=None):
+        resizer.last_stats = StageTimer("pyvips")
+        resizer.last_stats.error = "resize failed"
+        return None, resizer.last_stats
+
+    resizer.resize = resize
+    resizer.resize_bytes = resize_bytes
+    return resizer
+
+
+def test_failed_resize_fails_the_staged_pipeline(tmp_path):
+    source = tmp_path / "in.gif"
+    source.write_bytes(_gif_bytes())
+    output = tmp_path / "out.gif"
+
+    pipeline = ImagePipeline().resize(_failing_resizer(), width=64).optimize(GIFOptimizer())
+
+    assert pipeline.run(str(source), str(output)) is None
+    assert pipeline.last_stats.error
+    assert not output.exists()
+
+
+def test_failed_resize_fails_the_staged_bytes_pipeline():
+    pipeline = ImagePipeline().resize(_failing_resizer(), width=64).optimize(GIFOptimizer())
+
+    result, stats = pipeline.run_bytes(_gif_bytes())
+
+    assert result is None
+    assert stats.error
+
+
+def test_pipeline_without_target_size_still_optimizes(tmp_path):
+    source = tmp_path / "in.gif"
+    source.write_bytes(_gif_bytes())
+    output = tmp_path / "out.gif"
+
+    pipeline = ImagePipeline().resize(ImageResizer()).optimize(GIFOptimizer())
+
+    assert pipeline.run(str(source), str(output)) == str(output)
+    with Image.open(output) as img:
+        assert img.size == (256, 256)
+
+
+def test_resize_and_convert_keeps_every_frame(tmp_path):
+    source = tmp_path / "in.gif"
+    _animated_gif(source)
+    output = tmp_path / "out.webp"
+
+    pipeline = ImagePipeline().resize(ImageResizer(), width=60).convert(ImageConverter(), "WebP")
+
+    assert pipeline.run(str(source), str(output)) == str(output)
+    assert _frames(output) == ((60, 40), 3)
+
+    data, _stats = pipeline.run_bytes(source.read_bytes())
+    assert _frames(io.BytesIO(data)) == ((60, 40), 3)
+
+
+def test_thumbnail_cover_keeps_every_frame(tmp_path):
+    source = tmp_path / "in.gif"
+    _animated_gif(source)
+    output = tmp_path / "out.gif"
+    resizer = ImageResizer()
+    resizer.set_thumbnail(True)
+    resizer.set_fit("cover")
+
+    pipeline = ImagePipeline().resize(resizer, width=40, height=40)
+
+    assert pipeline.run(str(source), str(output)) == str(output)
+    assert _frames(output) == ((40, 40), 3)
+
+    assert resizer.resize(str(source), str(output), width=30, height=30) == str(output)
+    assert _frames(output) == ((30, 30), 3)
@@ -0,0 +1,44 @@
+"""
+Tests for lossy palette output of PNGOptimizer.
+"""
+
+import pyvips
+import pytest
+
+from nodiview.optimizer.png_optimizer import PNGOptimizer
+
+
+def _solid(size, colour=(10, 120, 200)):
+    image = pyvips.Image.black(size, size, bands=3) + list(colour)
+    return image.cast("uchar").copy(interpretation="srgb")
+
+
+def _is_palette(data):
+    return pyvips.Image.new_from_buffer(data, "").get_typeof("palette-bit-depth") != 0
+
+
+@pytest.mark.parametrize("effort", [0, 1])
+def test_palette_is_dropped_when_not_smaller(effort):
+    # Bei 2x2 Pixeln kostet die PLTE-Tabelle mehr, als die Indizes sparen
+    image = _solid(2)
+    optimizer = PNGOptimizer()
+    optimizer.set_reduce_palette(True)
+    optimizer.set_effort(effort)
+
+    palette = image.pngsave_buffer(**optimizer.save_options(), **optimizer.palette_options())
+    data = optimizer.encode_image(image)
+
+    assert optimizer.last_ssim >= optimizer.palette_floor
+    assert not _is_palette(data)
+    assert len(data) < len(palette)
+
+
+def test_palette_is_kept_when_smaller_and_above_floor():
+    image = _solid(64)
+    optimizer = PNGOptimizer()
+    optimizer.set_reduce_palette(True)
+
+    data = optimizer.encode_image(image)
+
+    assert _is_palette(data)
+    assert len(data) < len(image.pngsave_buffer(**optimizer.save_options()))
@@ -0,0 +1,35 @@
+"""
+Tests for ImageResizer.
+"""
+
+import pyvips
+from PIL import Image
+
+from nodiview.optimizer.resize import ImageResizer
+
+
+def _without_vips(monkeypatch):
+    """Make every pyvips load fail so that the Pillow fallback runs."""
+
+    def fail(*args, **kwargs):
+        raise pyvips.Error("loader disabled")
+
+    monkeypatch.setattr(pyvips.Image, "new_from_file", fail)
+
+
+def test_fallback_pixel_limit_only_applies_when_streaming(tmp_path, monkeypatch):
+    source = tmp_path / "in.png"
+    Image.linear_gradient("L").resize((400, 300)).save(source)
+    _without_vips(monkeypatch)
+    resizer = ImageResizer()
+    resizer.set_max_fallback_pixels(1000)
+
+    output = tmp_path / "out.png"
+    assert resizer.resize(str(source), str(output), width=200) == str(output)
+    assert resizer.last_stats.backend == "pil"
+    with Image.open(output) as img:
+        assert img.size == (200, 150)
+
+    resizer.set_streaming(True)
+    assert resizer.resize(str(source), str(tmp_path / "streamed.png"), width=200) is None
+    assert "limit" in resizer.last_stats.error